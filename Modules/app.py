@@ -2,19 +2,42 @@ import os
 import json
 import time
 import subprocess
+import sys
+import uuid
 from pathlib import Path
 
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
 
+import control_channel
+from csv_tail import CsvTail
+import telemetry
+import timeline
+
 PROJECT_ROOT = Path(".")
 MAIN_FILE = PROJECT_ROOT / "maintwo.py"
+CONTROL_KEY_FILE = PROJECT_ROOT / control_channel.CONTROL_KEY_FILE
 
-CONTROL_FILE = PROJECT_ROOT / "control.json"
 STATUS_FILE = PROJECT_ROOT / "status.json"
 SUMMARY_FILE = PROJECT_ROOT / "summary.json"
 
+# how often the page refreshes while a session is live (telemetry reads are shared memory, no file churn)
+LIVE_REFRESH_SECONDS = 0.5
+
+# rows of dashboard.csv kept in memory for the preview / chart, the file itself keeps growing
+CSV_PREVIEW_ROWS = 2000
+
+# start the backend daemon as soon as the dashboard opens, so the models are warm before "Start Session"
+AUTO_START_BACKEND = True
+
+# how long Kill Backend waits for the daemon to finish a running session before terminating it.
+# longer than the daemon's worst case: finish_session joins the inference stage (2s) and the
+# accounting stage (5s) before the summary is written, then the camera thread (1s)
+SHUTDOWN_TIMEOUT = 15.0
+
+# a daemon this server didn't start is PINGed at most this often, reruns in between reuse the answer
+PING_INTERVAL = 5.0
+
 
 def format_seconds(seconds: int) -> str:
     seconds = max(0, int(seconds or 0))
@@ -24,10 +47,18 @@ def format_seconds(seconds: int) -> str:
     return f"{h}h {m}m {s}s"
 
 
-def write_control(command: str):
-    payload = {"command": command, "ts": time.time()}
-    with open(CONTROL_FILE, "w") as f:
-        json.dump(payload, f, indent=2)
+def send_control(command: str):
+    # every click gets a new seq, so pressing the same button twice really sends it twice
+    st.session_state.control_seq += 1
+    return control_channel.send_command(command, st.session_state.control_client, st.session_state.control_seq,
+                                        authkey=control_channel.read_authkey(CONTROL_KEY_FILE))
+
+
+def toast_ack(ack, sent_text: str, icon: str):
+    if ack.get("ok"):
+        st.toast(f"{sent_text} → {ack.get('message', '')}", icon=icon)
+    else:
+        st.error(f"{sent_text} failed: {ack.get('message', 'no ack')}")
 
 
 def safe_read_json(path: Path):
@@ -40,14 +71,39 @@ def safe_read_json(path: Path):
         return None
 
 
-def safe_read_csv(path: Path):
-    if not path.exists():
-        return None
-    try:
-        return pd.read_csv(path)
-    except Exception:
+def csv_tail_for(path: Path):
+    # one incremental reader per file and browser session, survives reruns
+    tails = st.session_state.setdefault("csv_tails", {})
+    if str(path) not in tails:
+        tails[str(path)] = CsvTail(path, max_rows=CSV_PREVIEW_ROWS)
+    return tails[str(path)]
+
+
+def timeline_frame(session_id, path: Path):
+    # one row per state segment of the session, with the running per-state totals at its end
+    import pandas as pd
+
+    segments = timeline.load(session_id, str(path)).segments
+    if not segments:
         return None
 
+    totals = {"ATTENTIVE": 0.0, "DISTRACTED": 0.0, "AWAY": 0.0}
+    rows = []
+    for segment in segments:
+        totals[segment.final_state] = totals.get(segment.final_state, 0.0) + segment.seconds
+        rows.append({
+            "timestamp": segment.end.strftime("%Y-%m-%d %H:%M:%S"),
+            "presence_label": segment.presence_label,
+            "head_pose_label": segment.head_pose_label,
+            "eye_gaze_label": segment.eye_gaze_label,
+            "final_state": segment.final_state,
+            "seconds": round(segment.seconds, 2),
+            "attentive_seconds": round(totals["ATTENTIVE"], 2),
+            "distracted_seconds": round(totals["DISTRACTED"], 2),
+            "away_seconds": round(totals["AWAY"], 2),
+        })
+    return pd.DataFrame(rows)
+
 
 def donut_chart(attentive, distracted, away):
     labels = ["Attentive", "Distracted", "Away"]
@@ -71,9 +127,45 @@ def donut_chart(attentive, distracted, away):
     return fig
 
 
+def drop_telemetry_reader():
+    # a new backend creates a new block under the same name, the old mapping would go stale
+    reader = st.session_state.get("telemetry_reader")
+    if reader is not None:
+        reader.close()
+    st.session_state.telemetry_reader = None
+
+
+def read_telemetry():
+    # keep one reader per browser session, reopen it when a new backend started
+    reader = st.session_state.get("telemetry_reader")
+    if reader is None:
+        reader = telemetry.try_open_reader()
+        st.session_state.telemetry_reader = reader
+    if reader is None:
+        return None
+
+    values = reader.read()
+    if values is None or values["seq"] == 0:
+        return None
+    return values
+
+
+@st.cache_resource
+def backend():
+    # one backend daemon per Streamlit server, shared by every rerun and browser tab
+    return {"proc": None, "pinged_at": None, "ping_ok": False}
+
+
 def is_running():
-    proc = st.session_state.get("proc")
-    return proc is not None and proc.poll() is None
+    state = backend()
+    proc = state["proc"]
+    if proc is not None:
+        return proc.poll() is None
+    # a daemon this server didn't start (Streamlit was restarted) still answers on the control channel
+    if state["pinged_at"] is None or time.monotonic() - state["pinged_at"] >= PING_INTERVAL:
+        state["ping_ok"] = send_control("PING").get("ok", False)
+        state["pinged_at"] = time.monotonic()
+    return state["ping_ok"]
 
 
 def start_backend():
@@ -81,25 +173,49 @@ def start_backend():
         st.error("main.py not found. Put app.py in the same folder.")
         return
 
-    # Start main.py as subprocess
+    # Start main.py as subprocess, it stays up across sessions (same interpreter as Streamlit).
+    # a fresh control channel key for every launch, the backend gets it in its environment
+    authkey = control_channel.new_authkey(CONTROL_KEY_FILE)
     proc = subprocess.Popen(
-        ["python", str(MAIN_FILE)],
+        [sys.executable, str(MAIN_FILE)],
         cwd=str(PROJECT_ROOT),
+        env={**os.environ, control_channel.CONTROL_KEY_ENV: authkey.decode()},
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
-    st.session_state.proc = proc
+    backend()["proc"] = proc
+    backend()["pinged_at"] = None
+    drop_telemetry_reader()
 
 
 def kill_backend():
-    proc = st.session_state.get("proc")
+    # SHUTDOWN lets the daemon write the summary of a running session, terminate if it doesn't exit
+    send_control("SHUTDOWN")
+    proc = backend()["proc"]
     if proc and proc.poll() is None:
-        proc.terminate()
         try:
-            proc.wait(timeout=3)
+            proc.wait(timeout=SHUTDOWN_TIMEOUT)
         except Exception:
-            proc.kill()
-    st.session_state.proc = None
+            proc.terminate()
+            try:
+                proc.wait(timeout=3)
+            except Exception:
+                proc.kill()
+    backend()["proc"] = None
+    backend()["pinged_at"] = None
+    drop_telemetry_reader()
+
+
+def startup_caption(startup):
+    # the daemon's startup breakdown from status.json
+    parts = []
+    for key, label in (("imports_s", "imports"), ("model_load_s", "models"), ("camera_open_s", "camera"),
+                       ("ready_s", "ready")):
+        if key in startup:
+            parts.append(f"{label} {startup[key]:.2f}s")
+    if "first_decision_ms" in startup:
+        parts.append(f"first decision {startup['first_decision_ms']:.0f} ms after Start Session")
+    return "Startup: " + " | ".join(parts) if parts else None
 
 
 # ----------------------------
@@ -130,8 +246,15 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-if "proc" not in st.session_state:
-    st.session_state.proc = None
+if "control_client" not in st.session_state:
+    st.session_state.control_client = uuid.uuid4().hex
+    st.session_state.control_seq = 0
+
+# once per Streamlit server, so Kill Backend really leaves it stopped
+if AUTO_START_BACKEND and not backend().get("auto_started"):
+    backend()["auto_started"] = True
+    if not is_running():
+        start_backend()
 
 
 # ----------------------------
@@ -163,24 +286,21 @@ with c2:
         if not backend_running:
             st.error("Start backend first.")
         else:
-            write_control("START_SESSION")
-            st.toast("Sent START_SESSION ✅", icon="✅")
+            toast_ack(send_control("START_SESSION"), "START_SESSION", "✅")
 
 with c3:
     if st.button("🎯 Calibrate", use_container_width=True):
         if not backend_running:
             st.error("Start backend first.")
         else:
-            write_control("CALIBRATE")
-            st.toast("Sent CALIBRATE 🎯", icon="🎯")
+            toast_ack(send_control("CALIBRATE"), "CALIBRATE", "🎯")
 
 with c4:
     if st.button("⛔ End Session", use_container_width=True):
         if not backend_running:
             st.error("Start backend first.")
         else:
-            write_control("END_SESSION")
-            st.toast("Sent END_SESSION 🏁", icon="🏁")
+            toast_ack(send_control("END_SESSION"), "END_SESSION", "🏁")
 
 with c5:
     if st.button("🧨 Kill Backend", use_container_width=True):
@@ -197,12 +317,50 @@ else:
 
 if status:
     st.caption(f"State: `{status.get('state','?')}` | {status.get('message','')}")
+    startup = startup_caption(status.get("startup") or {})
+    if startup:
+        st.caption(startup)
 else:
     st.caption("No status.json yet (backend hasn’t written it).")
 
 st.divider()
 
 
+# ----------------------------
+# Live Session
+# ----------------------------
+live = read_telemetry() if backend_running else None
+live_session = live is not None and live["session_state"] in ("RUNNING", "CALIBRATING")
+
+if live_session:
+    st.header("Live Session")
+    st.caption(
+        f"Now: `{live['final_state']}` | presence `{live['presence_label']}` | "
+        f"head `{live['head_pose_label']}` | eyes `{live['eye_gaze_label']}`"
+    )
+
+    l1, l2, l3, l4 = st.columns(4)
+    l1.metric("✅ Attentive", format_seconds(live["attentive_seconds"]))
+    l2.metric("❌ Distracted", format_seconds(live["distracted_seconds"]))
+    l3.metric("🚫 Away", format_seconds(live["away_seconds"]))
+    live_total = live["attentive_seconds"] + live["distracted_seconds"] + live["away_seconds"]
+    l4.metric("🎯 Focus %", f"{(live['attentive_seconds'] / live_total * 100) if live_total > 0 else 0.0:.1f}%")
+
+    p1, p2, p3, p4 = st.columns(4)
+    p1.metric("FPS", f"{live['fps']:.1f}")
+    p2.metric("Latency", f"{live['latency_ms']:.0f} ms")
+    p3.metric("Inference", f"{live['inference_ms']:.1f} ms @ {live['inference_rate']:.1f}/s")
+    p4.metric("Dropped frames", f"{live['dropped']} / {live['frames']}")
+
+    if live["last_transition_ts"]:
+        st.caption(
+            f"Last transition: {live['last_transition_from'] or '—'} → {live['last_transition_to']} "
+            f"{time.time() - live['last_transition_ts']:.0f}s ago"
+        )
+
+    st.divider()
+
+
 # ----------------------------
 # Summary Section
 # ----------------------------
@@ -216,7 +374,7 @@ if summary is None:
 
     # Auto refresh while backend running
     if backend_running:
-        time.sleep(1.2)
+        time.sleep(LIVE_REFRESH_SECONDS if live_session else 1.2)
         st.rerun()
 
     st.stop()
@@ -233,8 +391,10 @@ away = int(summary.get("away_seconds", 0))
 focus_percent = float(summary.get("focus_percent", 0.0))
 focus_percent = max(0.0, min(100.0, focus_percent))
 
-csv_path = summary.get("csv_path", "dashboard.csv")
-csv_path = Path(csv_path)
+# dashboard.csv only exists when the backend writes per-second rows, the state timeline always does
+csv_path = Path(summary["csv_path"]) if summary.get("csv_path") else None
+timeline_path = Path(summary.get("timeline_path") or "timeline.csv")
+export_path = csv_path or timeline_path
 
 # Cards
 st.subheader("Session Timing")
@@ -307,7 +467,7 @@ with left:
     st.subheader("Focus Score")
     st.metric("Focus %", f"{focus_percent:.1f}%")
     st.progress(focus_percent / 100.0)
-    st.caption(f"Dashboard saved to: `{csv_path}`")
+    st.caption(f"Dashboard saved to: `{export_path}`")
 
 with right:
     st.subheader("Distribution")
@@ -317,21 +477,41 @@ st.divider()
 
 st.subheader("Export")
 
-# Download CSV
-if csv_path.exists():
-    with open(csv_path, "rb") as f:
+# Download CSV (reads the whole file, so not on every live refresh)
+if live_session:
+    st.caption("Download is available once the session ends.")
+elif export_path.exists():
+    with open(export_path, "rb") as f:
         st.download_button(
             "⬇️ Download CSV",
             data=f,
-            file_name=csv_path.name,
+            file_name=export_path.name,
             mime="text/csv",
             use_container_width=True,
         )
 else:
     st.warning("CSV not found. main.py didn’t save it.")
 
-# Preview
-df = safe_read_csv(csv_path)
+# Preview: per-second rows (only the ones appended since the last rerun get parsed) or the timeline segments
+try:
+    if csv_path is not None:
+        df = csv_tail_for(csv_path).refresh()
+    elif not live_session:
+        df = timeline_frame(summary.get("session_id"), timeline_path)
+    else:
+        df = None
+except Exception:
+    df = None
+
 if df is not None:
-    st.markdown("**CSV Preview**")
+    st.markdown(f"**{'CSV' if csv_path is not None else 'Timeline'} Preview** (last {len(df)} rows)")
     st.dataframe(df, use_container_width=True, height=260)
+
+    seconds_columns = [c for c in ("attentive_seconds", "distracted_seconds", "away_seconds") if c in df.columns]
+    if seconds_columns and "timestamp" in df.columns:
+        st.line_chart(df.set_index("timestamp")[seconds_columns], height=220)
+
+# keep following a live session
+if live_session:
+    time.sleep(LIVE_REFRESH_SECONDS)
+    st.rerun()
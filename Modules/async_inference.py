@@ -0,0 +1,94 @@
+import threading
+import logging
+
+import log_config
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+class AsyncResults:
+    '''
+    Collects the results of a MediaPipe Tasks model running in LIVE_STREAM mode.
+
+    submit() remembers what was sent for every timestamp, the model's
+    result_callback (on_result) matches the result back to that frame.
+    MediaPipe skips frames when it is busy and a result can come back after
+    a newer one was already delivered, so:
+      - a result older than the newest one delivered is counted as late and dropped
+      - submitted frames older than the newest result never got one, they are dropped too
+      - a result for a frame submit() already evicted (more than max_pending in flight,
+        the model is slow on its first frames) has no frame info, it counts as late
+    latest() always returns the newest completed result and the info of the frame it belongs to.
+    '''
+
+    def __init__(self , name , max_pending = 16):
+        self.name = name
+        self.max_pending = max_pending
+
+        self.submitted = 0
+        self.completed = 0
+        self.late = 0
+        self.skipped = 0
+
+        self._pending = {}           # timestamp_ms -> frame info given to submit()
+        self._last_timestamp_ms = -1
+        self._latest = (None , None , -1)   # (result, frame info, timestamp_ms)
+        self._lock = threading.Lock()
+
+    def next_timestamp_ms(self , captured_at):
+        # LIVE_STREAM wants strictly increasing timestamps in ms
+        timestamp_ms = max(int(captured_at * 1000) , self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    def submit(self , timestamp_ms , frame_info):
+        with self._lock:
+            self._pending[timestamp_ms] = frame_info
+            self.submitted += 1
+
+            # model fell behind and silently skipped some frames
+            while len(self._pending) > self.max_pending:
+                del self._pending[min(self._pending)]
+                self.skipped += 1
+
+    def on_result(self , result , output_image , timestamp_ms):
+        with self._lock:
+            if timestamp_ms not in self._pending:
+                # evicted by submit(), nothing to match it to (already counted as skipped there)
+                self.late += 1
+                return
+            frame_info = self._pending.pop(timestamp_ms)
+
+            if timestamp_ms <= self._latest[2]:
+                self.late += 1
+                return
+
+            for ts in [ts for ts in self._pending if ts < timestamp_ms]:
+                del self._pending[ts]
+                self.skipped += 1
+
+            self.completed += 1
+            self._latest = (result , frame_info , timestamp_ms)
+
+    def reset(self):
+        # a new session: nothing pending, no result yet. the timestamps keep increasing (the model
+        # still runs), results of the old session still in flight arrive unmatched and count as late
+        with self._lock:
+            self.submitted = self.completed = self.late = self.skipped = 0
+            self._pending.clear()
+            self._latest = (None , None , -1)
+
+    def latest(self):
+        # (result, frame info, timestamp_ms), result is None until the first one arrives
+        with self._lock:
+            return self._latest
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "late": self.late,
+                "skipped": self.skipped,
+                "pending": len(self._pending),
+            }
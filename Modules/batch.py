@@ -0,0 +1,248 @@
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import log_config
+import frame_sources
+import session_accounting
+
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# PARALLEL CHUNKED REPLAY
+# -----------------------------
+# a long recording is cut into time chunks, each chunk runs in a worker process with its own
+# detector models. the detectors carry state from frame to frame (debounce, eye_smooth EMA,
+# calibration), so a chunk doesn't start cold at its first frame:
+#
+#   calibration scan   a first task replays from frame 0 until the calibration can't change any
+#                      more (eye gaze took C, or without C the head pose reference is set). its
+#                      decisions are kept, the first chunk goes on from its full detector state and
+#                      the others get the calibration (head pose reference, ref eye score). a
+#                      recording that never gets there is done by the scan alone, no second pass
+#   warm-up overlap    every other chunk starts WARMUP_SECONDS before its boundary (calibration
+#                      restored) and throws those decisions away. the longest debounce is 2s and
+#                      the EMA is down to <1% after a second, so by the boundary the state is the
+#                      serial one
+#
+# the parent feeds the decisions of all chunks into one SessionAccounting in order, so the
+# CSV / timeline / summary.json come out like the ones of a serial replay.
+WARMUP_SECONDS = 5.0
+
+# workers send back one (position_ms, presence, head pose, eye gaze, final state) tuple per frame
+
+
+def _detectors():
+    # imported in the worker, so the parent process never loads a model
+    import detectors
+    import inference_size
+    inference_size.apply()    # same model input sizes as the live backend
+    return detectors
+
+
+def _reset_detectors(state = None):
+    detectors = _detectors()
+    import landmark_module
+
+    detectors.reset()
+    # the full frame mesh tracks the face from frame to frame, a worker gets several chunks
+    # and one mustn't start from where the previous one (somewhere else in the recording) ended
+    if landmark_module.face_mesh is not None:
+        landmark_module.face_mesh.close()
+    landmark_module.face_mesh = landmark_module.new_face_mesh()
+    if state is not None:
+        detectors.restore(state)
+    return detectors
+
+
+def _frame_time(started_at , position_ms):
+    return started_at + timedelta(milliseconds=position_ms)
+
+
+def calibration_scan(spec , started_at , calibrate_at):
+    '''
+    Replays from the first frame the way replay.replay does (C from calibrate_at
+    on, on the first frame eye gaze takes it) until the calibration is final. Returns (index of the first frame
+    after it, full detector state, calibration state, decisions so far, seconds);
+    index and states are None when the recording never gets there, the decisions
+    then cover all of it.
+    '''
+    from frame_context import FrameContext
+    import head_pose_module
+    import eye_gaze_module
+
+    detectors = _reset_detectors()
+
+    source = frame_sources.open_source(spec)
+    decisions = []
+    labels = ("AWAY" , "NO_FACE" , "NOT_CALIBRATED")
+    t0 = time.perf_counter()
+    try:
+        for frame , position_ms in source:
+            now = _frame_time(started_at , position_ms)
+
+            key = 0
+            if (calibrate_at is not None and detectors.calibration_ready(labels)
+                    and (now - started_at).total_seconds() >= calibrate_at):
+                key = ord("c")
+
+            labels = detectors.run(FrameContext(frame , now) , now , key)
+            decisions.append((position_ms , *labels , detectors.final_state_for(*labels)))
+
+            # with C: done once eye gaze has its reference, nothing presses C after that.
+            # without: the head pose reference (the first pose solved) is all the calibration there is
+            if calibrate_at is None:
+                final = head_pose_module.yaw_current is not None
+            else:
+                final = key and eye_gaze_module.ref_eye_down_score is not None
+            if final:
+                return (source.index , detectors.snapshot() , detectors.snapshot(detectors.CALIBRATION_NAMES) ,
+                        decisions , time.perf_counter() - t0)
+    finally:
+        source.release()
+    return None , None , None , decisions , time.perf_counter() - t0
+
+
+def process_chunk(spec , start , end , warmup_start , started_at , state):
+    '''
+    Decisions for frames [start, end), from the detector state (or calibration)
+    restored. Frames [warmup_start, start) only warm the rest of the state up.
+    '''
+    from frame_context import FrameContext
+
+    detectors = _reset_detectors(state)
+    source = frame_sources.open_source(spec)
+    source.seek(warmup_start)
+
+    decisions = []
+    t0 = time.perf_counter()
+    try:
+        for index in range(warmup_start , end):
+            ok , frame = source.read()
+            if not ok:
+                break
+            now = _frame_time(started_at , source.position_ms)
+
+            labels = detectors.run(FrameContext(frame , now) , now , 0)
+            if index >= start:
+                decisions.append((source.position_ms , *labels , detectors.final_state_for(*labels)))
+    finally:
+        source.release()
+
+    return start , decisions , time.perf_counter() - t0
+
+
+def plan_chunks(first , frame_count , chunks , warmup_frames):
+    # [(start, end, warmup_start)] over [first, frame_count). the first chunk carries on from the
+    # scan's state, no warm-up. the others warm up from before their boundary, even if that's
+    # before the calibration frame (the calibration is restored, the debounce state is what's warmed)
+    size = max(1 , math.ceil((frame_count - first) / chunks))
+    plan = []
+    start = first
+    while start < frame_count:
+        end = min(frame_count , start + size)
+        warmup_start = start if start == first else max(0 , start - warmup_frames)
+        plan.append((start , end , warmup_start))
+        start = end
+    return plan
+
+
+def run_batch(spec , started_at = None , calibrate_at = 0.0 , accounting = None , workers = None ,
+              chunks = None , warmup_seconds = WARMUP_SECONDS , show_summary = True):
+    '''
+    Parallel version of replay.replay for recordings with a known frame count
+    (video files, image directories, memmaps, synthetic). Returns (summary, stats).
+    '''
+    if started_at is None:
+        started_at = datetime.now()
+    if accounting is None:
+        accounting = session_accounting.SessionAccounting()
+    workers = workers or os.cpu_count() or 1
+    chunks = chunks or workers
+
+    probe = frame_sources.open_source(spec)
+    frame_count , fps = probe.frame_count , probe.fps
+    probe.release()
+    if not frame_count:
+        raise ValueError(f"{spec!r} has no known frame count, use replay.py for it")
+
+    t0 = time.perf_counter()
+    # spawn: every worker imports mediapipe / builds its models itself, nothing is forked mid-inference
+    with ProcessPoolExecutor(max_workers=workers , mp_context=multiprocessing.get_context("spawn")) as pool:
+        calibration_end , state , calibration , scanned , busy = pool.submit(
+            calibration_scan , spec , started_at , calibrate_at).result()
+
+        # never calibrated: the scan went through the whole recording, its decisions are all there is
+        plan = []
+        futures = []
+        if calibration_end is not None:
+            plan = plan_chunks(calibration_end , frame_count , chunks , int(warmup_seconds * fps))
+            futures = [pool.submit(process_chunk , spec , start , end , warmup_start , started_at ,
+                                   state if start == calibration_end else calibration)
+                       for start , end , warmup_start in plan]
+
+        # accounting has to see the decisions in order (the scan's first), chunks finish in any order
+        accounting.start(started_at)
+        now = started_at
+        frames = 0
+        for future in [None] + futures:
+            decisions = scanned
+            if future is not None:
+                _ , decisions , seconds = future.result()
+                busy += seconds
+            for position_ms , presence_label , head_pose_label , eye_gaze_label , final_state in decisions:
+                now = _frame_time(started_at , position_ms)
+                accounting.add(now , presence_label , head_pose_label , eye_gaze_label , final_state)
+            frames += len(decisions)
+        accounting.close(now)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "frames": frames,
+        "chunks": len(plan) + 1,
+        "workers": workers,
+        "seconds": round(elapsed , 3),
+        "fps": round(frames / elapsed , 1) if elapsed > 0 else 0.0,
+        "worker_seconds": round(busy , 3),
+        "calibration_frame": calibration_end,
+    }
+    debug_log.info("Batch processed %d frames in %d chunks on %d workers in %.1fs (%.1f fps)" ,
+                   frames , stats["chunks"] , workers , elapsed , stats["fps"])
+
+    return accounting.write_summary(show=show_summary) , stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a long recording in parallel chunks.")
+    parser.add_argument("source" , help="video file, image directory, .npy/.raw memmap or synthetic[:N]")
+    parser.add_argument("--start" , help="wall time of the first frame, YYYY-mm-dd HH:MM:SS (default: now)")
+    parser.add_argument("--calibrate-at" , type=float , default=0.0 ,
+                        help="seconds into the recording to calibrate at, negative = never (default 0)")
+    parser.add_argument("--workers" , type=int , help="worker processes (default: one per core)")
+    parser.add_argument("--chunks" , type=int , help="number of chunks (default: one per worker)")
+    parser.add_argument("--warmup" , type=float , default=WARMUP_SECONDS , help="warm-up overlap in seconds")
+    parser.add_argument("--csv" , default=session_accounting.DASHBOARD_CSV)
+    parser.add_argument("--summary" , default=session_accounting.SUMMARY_FILE)
+    parser.add_argument("--per-second-rows" , action="store_true" , help="also write the 1 row/sec dashboard.csv")
+    parser.add_argument("--no-store" , action="store_true" , help="don't write the Parquet session store")
+    args = parser.parse_args()
+
+    started_at = datetime.strptime(args.start , "%Y-%m-%d %H:%M:%S") if args.start else None
+    accounting = session_accounting.SessionAccounting(args.csv , args.summary , store_sessions=not args.no_store ,
+                                                      per_second_rows=args.per_second_rows)
+
+    _ , stats = run_batch(args.source , started_at , None if args.calibrate_at < 0 else args.calibrate_at ,
+                          accounting , args.workers , args.chunks , args.warmup)
+    print(f"{stats['frames']} frames in {stats['seconds']}s ({stats['fps']} fps) "
+          f"on {stats['workers']} workers, {stats['chunks']} chunks")
+
+
+if __name__ == "__main__":
+    main()
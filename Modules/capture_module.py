@@ -0,0 +1,156 @@
+import cv2 as cv
+import threading
+import time
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+import log_config
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# LOW LATENCY CAMERA SETUP
+# -----------------------------
+CAMERA_INDEX = 0
+CAMERA_WIDTH = 1280
+CAMERA_HEIGHT = 720
+CAMERA_FPS = 30
+CAMERA_FOURCC = "MJPG"   # most webcams only reach full fps at 720p with MJPG
+CAMERA_BUFFER_SIZE = 1   # don't let the driver queue up stale frames
+
+
+# frame_id counts every frame grabbed from the camera (including dropped ones),
+# captured_at is time.monotonic() right after the grab, wall_time is the datetime used by the debounce logic
+Frame = namedtuple("Frame" , ["frame" , "frame_id" , "captured_at" , "wall_time"])
+
+
+def open_camera(index = CAMERA_INDEX , width = CAMERA_WIDTH , height = CAMERA_HEIGHT ,
+                fps = CAMERA_FPS , fourcc = CAMERA_FOURCC , buffer_size = CAMERA_BUFFER_SIZE):
+    capture = cv.VideoCapture(index)
+
+    # not every backend supports every property, set() just returns False then
+    capture.set(cv.CAP_PROP_BUFFERSIZE , buffer_size)
+    if fourcc:
+        capture.set(cv.CAP_PROP_FOURCC , cv.VideoWriter_fourcc(*fourcc))
+    if width and height:
+        capture.set(cv.CAP_PROP_FRAME_WIDTH , width)
+        capture.set(cv.CAP_PROP_FRAME_HEIGHT , height)
+    if fps:
+        capture.set(cv.CAP_PROP_FPS , fps)
+
+    debug_log.info("Camera %s opened at %.0fx%.0f %.0ffps buffer=%.0f" , index ,
+                   capture.get(cv.CAP_PROP_FRAME_WIDTH) , capture.get(cv.CAP_PROP_FRAME_HEIGHT) ,
+                   capture.get(cv.CAP_PROP_FPS) , capture.get(cv.CAP_PROP_BUFFERSIZE))
+    return capture
+
+
+class LatestFrameCapture:
+    '''
+    Grabs frames on its own thread and keeps only the newest one.
+
+    read() always hands out the most recent frame, older frames that nobody
+    picked up in time are dropped, so a slow inference frame never makes the
+    next decision run on a stale image.
+
+    pause() stops grabbing (and decoding) while nobody reads, the device stays
+    open. resume() starts again with the counters at zero, so frames_captured /
+    frames_dropped always count since the last resume.
+    '''
+
+    def __init__(self , capture = None):
+        self.capture = capture if capture is not None else open_camera()
+        self.latest = None
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.failed = False
+
+        self._last_read_id = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._paused = False
+        self._thread = None
+
+    def start(self , paused = False):
+        self._running = True
+        self._paused = paused
+        self._thread = threading.Thread(target=self._run , name="capture" , daemon=True)
+        self._thread.start()
+        return self
+
+    def pause(self):
+        with self._cond:
+            self._paused = True
+
+    def resume(self):
+        # a frame grabbed before the pause is stale, the next read() waits for a new one
+        with self._cond:
+            self.latest = None
+            self.frames_captured = 0
+            self.frames_dropped = 0
+            self._last_read_id = 0
+            self._paused = False
+            self._cond.notify_all()
+
+    def _run(self):
+        was_paused = False
+        while self._running:
+            with self._cond:
+                if self._paused:
+                    # woken by resume() / stop()
+                    self._cond.wait(timeout=0.5)
+                    was_paused = True
+                    continue
+
+            if was_paused and hasattr(self.capture , "resync"):
+                # frame_sources: drops the frame the webcam buffered during the pause, a recording
+                # goes on at its recorded rate from here instead of racing to catch up
+                self.capture.resync()
+            was_paused = False
+
+            ret , frame = self.capture.read()
+            captured_at = time.monotonic()
+
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._cond.notify_all()
+                    break
+
+                if self._paused:
+                    continue  # grabbed while pause() came in, nobody wants it
+
+                self.frames_captured += 1
+                if self.latest is not None and self.latest.frame_id > self._last_read_id:
+                    self.frames_dropped += 1  # overwritten before anyone read it
+
+                self.latest = Frame(frame , self.frames_captured , captured_at , datetime.now())
+                self._cond.notify_all()
+
+    def read(self , timeout = 1.0):
+        # waits for a frame newer than the last one handed out. None if the camera failed or nothing
+        # came within timeout: only self.failed ends the stream, a timeout is a stall worth retrying
+        with self._cond:
+            got_new = self._cond.wait_for(
+                lambda: self.failed or (self.latest is not None and self.latest.frame_id > self._last_read_id),
+                timeout=timeout
+            )
+            if not got_new or self.failed:
+                return None
+
+            self._last_read_id = self.latest.frame_id
+            return self.latest
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.capture.release()
+
+
+def latency_ms(captured_frame):
+    # glass-to-decision latency, from the grab returning to now (sensor exposure / driver time not included)
+    return (time.monotonic() - captured_frame.captured_at) * 1000
@@ -0,0 +1,198 @@
+import os
+import threading
+import queue
+import logging
+import secrets
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import log_config
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# LOCAL IPC BETWEEN app.py AND THE BACKEND
+# -----------------------------
+# localhost TCP through multiprocessing.connection (works the same on Windows, no unix sockets needed)
+CONTROL_ADDRESS = ("127.0.0.1" , 47711)
+ACK_TIMEOUT = 2.0
+
+# recv() unpickles, so only someone holding the key may connect. app.py makes a new key every time it
+# launches the backend and hands it over in CONTROL_KEY_ENV; it also goes to CONTROL_KEY_FILE (owner
+# only) so a restarted dashboard can still reach its daemon. a backend started by hand without the
+# variable makes its own key and writes the file
+CONTROL_KEY_ENV = "FOCUSOS_CONTROL_KEY"
+CONTROL_KEY_FILE = "control.key"
+
+
+def new_authkey(path = CONTROL_KEY_FILE):
+    key = secrets.token_hex(16)
+    fd = os.open(path , os.O_WRONLY | os.O_CREAT | os.O_TRUNC , 0o600)
+    with os.fdopen(fd , "w") as f:
+        f.write(key)
+    return key.encode()
+
+
+def read_authkey(path = CONTROL_KEY_FILE):
+    # None when no backend made a key yet
+    try:
+        with open(path) as f:
+            return f.read().strip().encode() or None
+    except OSError:
+        return None
+
+
+def backend_authkey(path = CONTROL_KEY_FILE):
+    key = os.environ.get(CONTROL_KEY_ENV)
+    if key:
+        return key.encode()
+    return new_authkey(path)
+
+
+class Command:
+    # one command from a client, the backend answers it with ack().
+    # taken: the main loop got it from poll(), cancelled: its ack timed out before that, it never runs
+    def __init__(self , client_id , seq , command):
+        self.client_id = client_id
+        self.seq = seq
+        self.command = command
+        self.reply = None
+        self.done = threading.Event()
+        self.taken = False
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.taken = True
+            return True
+
+    def cancel(self):
+        # False when the main loop already has it (it will run, the reply is only late)
+        with self._lock:
+            if self.taken:
+                return False
+            self.cancelled = True
+            return True
+
+
+class ControlServer:
+    '''
+    Backend side of the control channel.
+
+    Every message is {"client": id, "seq": n, "command": "START_SESSION" | ...}.
+    A new (client, seq) is queued for the main loop, which handles it and calls
+    ack(); the client gets the reply on the same connection. A (client, seq)
+    that was already handled (the client retried) is not run again, it just
+    gets the old reply. Sending the same command twice with two seqs runs it twice.
+
+    When the main loop doesn't ack within ACK_TIMEOUT: a command it hasn't
+    picked up yet is cancelled (poll() skips it) and fails, one it is still
+    running gets a "pending" reply (ok True, pending True); a retry of that
+    seq gets the real reply once there is one.
+    '''
+
+    def __init__(self , address = CONTROL_ADDRESS , authkey = None):
+        self.address = address
+        self.authkey = authkey if authkey is not None else backend_authkey()
+        self.commands = queue.Queue()
+
+        self._last_seq = {}       # client id -> (seq, Command) of the last handled command
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def start(self):
+        self._listener = Listener(self.address , authkey=self.authkey)
+        threading.Thread(target=self._accept_loop , name="control" , daemon=True).start()
+        debug_log.info("Control channel listening on %s" , self.address)
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break  # listener closed
+            except Exception as e:
+                debug_log.info("Control channel rejected a connection: %r" , e)
+                continue
+            threading.Thread(target=self._serve , args=(conn ,) , daemon=True).start()
+
+    def _serve(self , conn):
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError , OSError):
+                    return
+                except Exception as e:
+                    # unpicklable garbage, the connection can't be trusted to be in sync any more
+                    debug_log.info("Control channel dropped a connection: %r" , e)
+                    return
+
+                if not isinstance(msg , dict) or not isinstance(msg.get("seq") , int):
+                    conn.send({"seq": None , "ok": False , "message": "malformed command"})
+                    continue
+
+                client_id , seq = msg.get("client") , msg["seq"]
+
+                with self._lock:
+                    last = self._last_seq.get(client_id)
+                if last is not None and seq <= last[0]:
+                    conn.send(self._reply(last[1]) if seq == last[0] else
+                              {"seq": seq , "ok": False , "message": "stale command"})
+                    continue
+
+                command = Command(client_id , seq , msg.get("command"))
+                with self._lock:
+                    self._last_seq[client_id] = (seq , command)
+                self.commands.put(command)
+
+                if not command.done.wait(ACK_TIMEOUT) and command.cancel():
+                    command.reply = {"seq": seq , "ok": False , "message": "backend busy, command not run"}
+                    command.done.set()
+                conn.send(self._reply(command))
+
+    def _reply(self , command):
+        if command.done.is_set():
+            return command.reply
+        return {"seq": command.seq , "ok": True , "pending": True , "message": "accepted, still running"}
+
+    def poll(self , timeout = 0):
+        # next pending command or None, never touches the disk. cancelled ones are skipped
+        while True:
+            try:
+                if timeout:
+                    command = self.commands.get(timeout=timeout)
+                else:
+                    command = self.commands.get_nowait()
+            except queue.Empty:
+                return None
+            if command.take():
+                return command
+
+    def ack(self , command , state , message = "" , ok = True):
+        command.reply = {"seq": command.seq , "ok": ok , "state": state , "message": message}
+        command.done.set()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+
+
+def send_command(command , client_id , seq , address = CONTROL_ADDRESS , authkey = None , timeout = ACK_TIMEOUT + 1.0):
+    # client side (app.py), returns the backend's ack or {"ok": False, ...} when it can't be reached
+    authkey = authkey if authkey is not None else read_authkey()
+    if authkey is None:
+        return {"seq": seq , "ok": False , "message": "backend not reachable (no control key)"}
+    try:
+        with Client(address , authkey=authkey) as conn:
+            conn.send({"client": client_id , "seq": seq , "command": command})
+            if conn.poll(timeout):
+                return conn.recv()
+            return {"seq": seq , "ok": False , "message": "no ack from backend"}
+    except (ConnectionRefusedError , OSError , EOFError , AuthenticationError) as e:
+        return {"seq": seq , "ok": False , "message": f"backend not reachable ({e.__class__.__name__})"}
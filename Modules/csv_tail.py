@@ -0,0 +1,85 @@
+import csv
+import io
+import os
+from collections import deque
+
+import pandas as pd
+
+
+class CsvTail:
+    '''
+    Incremental reader for an append-only CSV like dashboard.csv.
+
+    Remembers the byte offset it read up to and only parses rows appended
+    since the last refresh(). A half-written last line is left for the next
+    refresh. If the file shrank (truncated) or was replaced (different inode,
+    rotated) it starts over from the top. Only the last max_rows rows are kept,
+    so the frame for the preview / charts stays the same size however big the
+    file gets.
+    '''
+
+    def __init__(self , path , max_rows = 2000):
+        self.path = str(path)
+        self.max_rows = max_rows
+        self.frame = None
+        self.rows_read = 0
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.header = None
+        self.file_id = None
+        self.rows = deque(maxlen=self.max_rows)
+        self.frame = None
+        self.rows_read = 0
+
+    def refresh(self):
+        # returns the bounded DataFrame (None while the file doesn't exist / has no header)
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return None
+
+        file_id = (st.st_dev , st.st_ino)
+        if self.file_id is not None and (file_id != self.file_id or st.st_size < self.offset):
+            self._reset()   # rotated or truncated
+        self.file_id = file_id
+
+        if st.st_size == self.offset:
+            return self.frame
+
+        with open(self.path , "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+
+        # only consume complete lines, the writer may be in the middle of one
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return self.frame
+        self.offset += end + 1
+
+        new_rows = list(csv.reader(io.StringIO(chunk[:end + 1].decode("utf-8" , errors="replace"))))
+        if self.header is None and new_rows:
+            self.header = new_rows.pop(0)
+
+        if not new_rows:
+            return self.frame
+
+        width = len(self.header)
+        for row in new_rows:
+            if not row:
+                continue
+            # older sessions wrote fewer columns into the same file
+            self.rows.append((row + [None] * width)[:width])
+            self.rows_read += 1
+
+        self.frame = self._to_frame()
+        return self.frame
+
+    def _to_frame(self):
+        frame = pd.DataFrame(list(self.rows) , columns=self.header)
+        for column in frame.columns:
+            if column.endswith("_seconds"):
+                frame[column] = pd.to_numeric(frame[column] , errors="coerce")
+        return frame
@@ -0,0 +1,124 @@
+import time
+
+import metrics
+
+import face_prescence_module
+import landmark_module
+import head_pose_module
+import eye_gaze_module
+from landmark_tracker import LandmarkTracker
+
+
+# -----------------------------
+# PRESENCE -> HEAD POSE -> EYE GAZE
+# -----------------------------
+# the synchronous detector chain, shared by the live backend (maintwo) and replay
+
+def run(ctx , now , key = 0):
+    # -----------------------------
+    # DEFAULT STATES
+    # -----------------------------
+    presence_label = "AWAY"
+    head_pose_label = "NO_FACE"
+    eye_gaze_label = "NOT_CALIBRATED"
+
+    # -----------------------------
+    # 1) FACE PRESENCE
+    # -----------------------------
+    with metrics.span("presence"):
+        presence_label = face_prescence_module.update(ctx , now)
+
+    if presence_label == "PRESENT":
+        # one mesh pass shared by head pose and eye gaze
+        with metrics.span("landmarks"):
+            landmarks = landmark_module.update(ctx , face_prescence_module.face_box)
+
+        # -----------------------------
+        # 2) HEAD POSE
+        # -----------------------------
+        with metrics.span("head_pose"):
+            head_pose_label = head_pose_module.update(ctx , now , key , landmarks)
+
+        if "ATTENTIVE" in head_pose_label:
+            # -----------------------------
+            # 3) EYE GAZE
+            # -----------------------------
+            with metrics.span("eye_gaze"):
+                eye_gaze_label = eye_gaze_module.update(ctx , key , now , landmarks)
+
+    return presence_label , head_pose_label , eye_gaze_label
+
+
+def final_state_for(presence_label , head_pose_label , eye_gaze_label):
+    if presence_label != "PRESENT":
+        return "AWAY"
+    if "ATTENTIVE" not in head_pose_label:
+        return "DISTRACTED"
+    if "attentive" in eye_gaze_label.lower():
+        return "ATTENTIVE"
+    return "DISTRACTED"
+
+
+def calibration_ready(labels):
+    # an automatic C (replay, batch, streams, people) goes on the frame after one with these labels:
+    # eye gaze only runs, and only takes the key, while present with head pose settled on ATTENTIVE
+    return labels[0] == "PRESENT" and labels[1] == "ATTENTIVE"
+
+
+# -----------------------------
+# DETECTOR STATE
+# -----------------------------
+# the module globals that carry over from one frame to the next (debounce, calibration,
+# smoothing, PnP warm start). snapshot() / restore() move them between runs, e.g. to start
+# a chunk of a recording from a known state (see batch)
+STATE_NAMES = {
+    face_prescence_module: ["current_state" , "candidate_state" , "candidate_since" , "face_box"],
+    head_pose_module: ["current_state" , "candidate_state" , "candidate_since" , "yaw_current" , "pitch_current" ,
+                       "calibrate_warning" , "last_rvec" , "last_tvec"],
+    eye_gaze_module: ["ref_eye_down_score" , "eye_smooth" , "eye_smooth_at" , "recalibrate_warning"],
+}
+
+# the part of the state a calibration produces
+CALIBRATION_NAMES = {
+    head_pose_module: ["yaw_current" , "pitch_current" , "calibrate_warning"],
+    eye_gaze_module: ["ref_eye_down_score" , "recalibrate_warning"],
+}
+
+
+def snapshot(names = STATE_NAMES):
+    # {"module.name": value}, plain values so it can be pickled to another process
+    return {f"{module.__name__}.{name}": getattr(module , name) for module , module_names in names.items()
+            for name in module_names}
+
+
+def restore(state):
+    modules = {module.__name__: module for module in STATE_NAMES}
+    for key , value in state.items():
+        module_name , name = key.rsplit("." , 1)
+        setattr(modules[module_name] , name , value)
+
+
+# state of a freshly imported process, before any frame
+INITIAL_STATE = snapshot()
+
+
+def reset():
+    # back to INITIAL_STATE (uncalibrated, nothing debounced), the models stay loaded
+    restore(INITIAL_STATE)
+    landmark_module.tracker = LandmarkTracker()
+
+
+def load():
+    # builds the models now instead of on the first frame, {model: seconds it took}
+    timings = {}
+    for name , module in (("blazeface" , face_prescence_module) , ("facemesh" , landmark_module)):
+        t0 = time.perf_counter()
+        module.load()
+        timings[name] = time.perf_counter() - t0
+    return timings
+
+
+def marks():
+    # what the overlay draws for the frame the detectors just ran on
+    import overlay
+    return overlay.Marks(list(face_prescence_module.face_boxes) , head_pose_module.pose_points)
@@ -2,6 +2,7 @@ import cv2 as cv
 import mediapipe as mp
 import numpy as np 
 import logging 
+import math
 from datetime import datetime
 
 import log_config
@@ -9,10 +10,6 @@ import log_config
 debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
 
 
-
-mp_faceMesh = mp.solutions.face_mesh
-face_mesh = mp_faceMesh.FaceMesh(refine_landmarks = True)
-
 iris_points_left_eye = [474, 475 , 476 , 477]
 iris_points_right_eye = [469 , 470 , 471 , 472]
 
@@ -29,94 +26,89 @@ recalibrate_warning = "Press C to Recalibrate"
 ref_eye_down_score = None
 eye_smooth = 0
 
-result = None
+# eye_smooth is an EMA over time, not over calls: the scheduler runs this at 5 Hz while stable and at
+# the camera rate otherwise, a per call factor would change the smoothing with it. tau = 0.2 s is the
+# old 0.85 / 0.15 per frame at 30 fps. eye_smooth_at is the frame time of the last sample
+EYE_SMOOTH_TAU = 0.2
+NOMINAL_FRAME_SECONDS = 1 / 30.0   # the step the first sample after a calibration counts as
+eye_smooth_at = None
 
+distracted_eye_threshold = -0.18  # smoothed, calibrated eye down score below this = looking down / away
 
+# (N, 3) float32 landmark array of the current frame, set by update() from landmark_module
+landmarks = None
 
-def center_eye_avg(iris_points : list):
-    sum_y = 0
-    if result.multi_face_landmarks:
-        for FacialLandmarks in result.multi_face_landmarks:
-            for i in iris_points:
-                pt_i_y = (FacialLandmarks.landmark[i].y)
-                sum_y += pt_i_y
 
-            center_eye_avg_pt = sum_y /4
-            # x_cor = int(center_eye_avg_pt.x * width)
-            # y_cor = int(center_eye_avg.y * height)
-            debug_log.info(f"The averaged out centere eye point was {center_eye_avg_pt}")
-            return center_eye_avg_pt # already a y co-ordinate
-        
 
-def calc_eye_down_score(height  , top_eye , bottom_eye , centre_eye):
-    
-    if result.multi_face_landmarks:
-        for FacialLandmarks in result.multi_face_landmarks:
+# same points as arrays so both eyes come out of one fancy-indexing op, row 0 = left eye, row 1 = right eye
+iris_points = np.array([iris_points_left_eye , iris_points_right_eye])
+eyelid_top_points = np.array([159 , 386])
+eyelid_bottom_points = np.array([145 , 374])
+
+
+def center_eye_avg():
+    # mean iris y of both eyes, shape (2,), already a y co-ordinate
+    return landmarks[iris_points , 1].mean(axis=1)
+
 
-            pt_top_eye = FacialLandmarks.landmark[int(top_eye)]
-            pt_bottom_eye = FacialLandmarks.landmark[int(bottom_eye)]
-            
+def calc_eye_down_scores(centre_eye):
+    top_y = landmarks[eyelid_top_points , 1]
+    bottom_y = landmarks[eyelid_bottom_points , 1]
 
-            iris_offset = (   (centre_eye * height)   ) - (   (pt_top_eye.y * height)  )
-            eye_height =  (  (pt_bottom_eye.y * height)  ) - (  (pt_top_eye.y * height) )
+    iris_offset = centre_eye - top_y
+    eye_height = bottom_y - top_y
 
-            if eye_height != 0 :
-                eye_down_score = iris_offset / eye_height
-                debug_log.info(f"calculated eye down score was {eye_down_score}")
-                return eye_down_score
+    if np.any(eye_height == 0):
+        return None
+    return iris_offset / eye_height
 
 # Eye down Score = iris_offset / eye_height 
 # iris_offset = iris_y - top_y
+# (both are in normalized y, multiplying by the frame height cancels out)
 
 
-def update(frame , key , now ):
-    global ref_eye_down_score, eye_smooth, recalibrate_warning, result
+# face_landmarks comes from landmark_module.update(ctx), shared with head_pose_module
+def update(ctx , key , now , face_landmarks):
+    global ref_eye_down_score, eye_smooth, eye_smooth_at, recalibrate_warning, landmarks
 
-    height , width , channel = frame.shape
-    frame_rgb = cv.cvtColor(frame , cv.COLOR_BGR2RGB)
-    result = face_mesh.process(frame_rgb)
+    landmarks = face_landmarks
 
-    if not result.multi_face_landmarks:
+    if landmarks is None:
         return "NO_FACE"
         
     
-    left_eye_y_co_centre = center_eye_avg(iris_points_left_eye)
-    right_eye_y_co_centre = center_eye_avg(iris_points_right_eye)
-    if left_eye_y_co_centre is None or right_eye_y_co_centre is None:
-        return "NO_EYE_CENTER"
-    left_eye_score = calc_eye_down_score(height , 159 , 145 , left_eye_y_co_centre)
-    right_eye_score = calc_eye_down_score(height , 386 , 374 , right_eye_y_co_centre )
+    eye_y_co_centres = center_eye_avg()
+    eye_scores = calc_eye_down_scores(eye_y_co_centres)
+    debug_log.debug("Eye centres were %s and eye down scores were %s" , eye_y_co_centres , eye_scores)
 
     if key == ord('c') or key == ord('C'):
 
 
         eye_smooth = 0
+        eye_smooth_at = None
 
 
-        if left_eye_score is not None and right_eye_score is not None:
-            ref_eye_down_score = ((calc_eye_down_score(height , 159 , 145 , left_eye_y_co_centre)) + (calc_eye_down_score(height , 386 , 374 , right_eye_y_co_centre )))/2
+        if eye_scores is not None:
+            ref_eye_down_score = float(eye_scores.mean())
             recalibrate_warning = ""
 
-    # if left_eye_score is not None and right_eye_score is not None:
-    if ref_eye_down_score is not None and left_eye_score is not None and right_eye_score is not None:
-        final_eye_score = (left_eye_score + right_eye_score) / 2
+    if ref_eye_down_score is not None and eye_scores is not None:
+        final_eye_score = float(eye_scores.mean())
         callibrated_eye_down_score = final_eye_score - ref_eye_down_score
-        eye_smooth = 0.85 * eye_smooth + 0.15*callibrated_eye_down_score
-        print(callibrated_eye_down_score)
-        print(eye_smooth)
+        dt = (now - eye_smooth_at).total_seconds() if eye_smooth_at is not None else NOMINAL_FRAME_SECONDS
+        alpha = 1.0 - math.exp(-max(dt , 0.0) / EYE_SMOOTH_TAU)
+        eye_smooth = (1.0 - alpha) * eye_smooth + alpha * callibrated_eye_down_score
+        eye_smooth_at = now
+        debug_log.debug("Calibrated eye down score %.3f, smoothed %.3f" , callibrated_eye_down_score , eye_smooth)
 
-        if  eye_smooth < -0.18: 
-            cv.putText(frame, "Distracted Eyes", (20, 110), cv.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-            debug_log.info(f"Distracted eyes at {now}")
+        if  eye_smooth < distracted_eye_threshold: 
+            debug_log.info("Distracted eyes at %s" , now)
 
             return("Distracted Eyes")
         else:
-            cv.putText(frame, "Attentive Eyes", (20, 110), cv.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-            debug_log.info(f"Attentive Eyes at {now}")
+            debug_log.info("Attentive Eyes at %s" , now)
 
             return("attentive Eyes")
-    else:
-        cv.putText(frame, "Press C to calibrate", (20, 110), cv.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
     return "NOT_CALIBRATED"
     # print(left_eye_score)
     # print(right_eye_score)
@@ -1,14 +1,16 @@
 from datetime import datetime
+import os
 import cv2 as cv
 import mediapipe as mp
 import logging
 import log_config
+from async_inference import AsyncResults
 
 debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
 
 
 
-MODEL_PATH = "blaze_face_short_range.tflite"
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)) , "blaze_face_short_range.tflite")
 
 BaseOptions = mp.tasks.BaseOptions
 FaceDetector = mp.tasks.vision.FaceDetector
@@ -20,7 +22,45 @@ options = FaceDetectorOptions(
     running_mode=VisionRunningMode.IMAGE
 )
 
-detector = FaceDetector.create_from_options(options)
+# built by load(), not at import: the backend imports everything first and builds the models
+# on a background thread while the camera opens (see maintwo / detectors.load)
+detector = None
+
+
+def load():
+    global detector
+    if detector is None:
+        detector = FaceDetector.create_from_options(options)
+    return detector
+
+
+# BlazeFace only looks at 128 x 128 (short range model), so it gets a downscaled copy of this width
+# and the boxes are scaled back to frame pixels. None = the full camera frame
+detect_width = 320
+
+# LIVE_STREAM detector for the async backend mode, created by start_live_stream()
+live_detector = None
+live_results = None
+
+
+def start_live_stream():
+    global live_detector , live_results
+    if live_detector is not None:
+        return
+
+    live_results = AsyncResults("presence")
+    live_options = FaceDetectorOptions(
+        base_options=BaseOptions(model_asset_path=MODEL_PATH),
+        running_mode=VisionRunningMode.LIVE_STREAM,
+        result_callback=live_results.on_result
+    )
+    live_detector = FaceDetector.create_from_options(live_options)
+
+
+def submit_async(ctx , timestamp_ms , frame_info):
+    # never blocks, the result shows up in live_results.latest()
+    live_results.submit(timestamp_ms , frame_info)
+    live_detector.detect_async(ctx.mp_image_at(detect_width) , timestamp_ms)
 
 current_state = False
 candidate_state = None
@@ -29,27 +69,66 @@ candidate_since = None
 present_to_away_time = 2
 away_to_present_time = 0.7
 
+# padded box (x0, y0, x1, y1) around the biggest detected face in the last frame, None if no face.
+# landmark_module crops the mesh input to it so the mesh doesn't have to look at the whole frame.
+face_box = None
+face_boxes = []   # (x, y, w, h) of every detection of the last frame, for the overlay
+face_box_padding = 0.4  # fraction of the box width / height added on every side, the mesh needs forehead and chin
 
-def update(frame , now) -> str:
-    
-    global current_state, candidate_state, candidate_since
-    frame_rgb = cv.cvtColor(frame , cv.COLOR_BGR2RGB)
 
-    mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+def detection_boxes(result , scale = 1.0):
+    # (x, y, w, h) of every detection in frame pixels, scale = ctx.scale_at(detect_width)
+    boxes = []
+    for detection in result.detections:
+        bbox = detection.bounding_box
+        boxes.append((int(bbox.origin_x * scale) , int(bbox.origin_y * scale) ,
+                      int(bbox.width * scale) , int(bbox.height * scale)))
+    return boxes
 
-    result = detector.detect(mp_image)
-    if result.detections:
+
+def padded_box(box , frame_width , frame_height , padding = face_box_padding):
+    x , y , w , h = box
+    pad_x = int(w * padding)
+    pad_y = int(h * padding)
+
+    x0 = max(0 , x - pad_x)
+    y0 = max(0 , y - pad_y)
+    x1 = min(frame_width , x + w + pad_x)
+    y1 = min(frame_height , y + h + pad_y)
+
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0 , y0 , x1 , y1)
+
+
+# ctx is a frame_context.FrameContext, the RGB / mp.Image conversion is shared with the other stages.
+# result: a detection result that already came back from the LIVE_STREAM detector, detect synchronously if None
+def update(ctx , now , result = None) -> str:
+    
+    global face_box, face_boxes
+
+    if result is None:
+        result = load().detect(ctx.mp_image_at(detect_width))
+    face_box = None
+    face_boxes = detection_boxes(result , ctx.scale_at(detect_width))
+    if face_boxes:
         detected_state = True  # Detected_state = True if face is detected and false if not detected
-        for detection in result.detections:
-            bbox = detection.bounding_box
-            x, y, w, h = bbox.origin_x, bbox.origin_y, bbox.width, bbox.height
-            cv.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        biggest_area = 0
+        for x, y, w, h in face_boxes:
+            if w * h > biggest_area:
+                biggest_area = w * h
+                face_box = padded_box((x , y , w , h) , ctx.width , ctx.height)
             
     else:
         # print("Face Not Detected ")
         detected_state = False
-    
 
+    return debounce(detected_state , now)
+
+
+def debounce(detected_state , now):
+    # hysteresis over the per-frame detection, also used per person by multi_face
+    global current_state, candidate_state, candidate_since
 
     if detected_state == current_state:
         # stable -> cancel any pending switch
@@ -79,7 +158,7 @@ def update(frame , now) -> str:
                 if elapsed >= threshold:
                     current_state = candidate_state
                     log_label = "PRESENT" if current_state else "AWAY"
-                    debug_log.info(f"Person's state changed to {log_label} at time {now}")
+                    debug_log.info("Person's state changed to %s at time %s" , log_label , now)
 
                     candidate_state = None
                     candidate_since = None
@@ -0,0 +1,102 @@
+import cv2 as cv
+import mediapipe as mp
+
+
+# width of the downscaled copy used by the cheap per-frame checks
+SMALL_WIDTH = 320
+
+
+class FrameContext:
+    '''
+    One webcam frame plus the images derived from it.
+
+    Every stage gets the same FrameContext instead of the raw BGR frame.
+    The derived images are only computed the first time a stage asks for
+    them and then cached for the rest of the frame, so no conversion runs
+    twice and none runs at all when nothing needs it.
+    '''
+
+    def __init__(self , frame , now = None):
+        self.frame = frame          # raw BGR frame from the camera
+        self.now = now
+        self.height , self.width = frame.shape[:2]
+        self._cache = {}
+
+    def _cached(self , name , make):
+        if name not in self._cache:
+            self._cache[name] = make()
+        return self._cache[name]
+
+    @property
+    def rgb(self):
+        return self._cached("rgb" , lambda: cv.cvtColor(self.frame , cv.COLOR_BGR2RGB))
+
+    @property
+    def mp_image(self):
+        return self._cached("mp_image" , lambda: mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb))
+
+    @property
+    def mirrored(self):
+        return self._cached("mirrored" , lambda: cv.flip(self.frame , 1))
+
+    @property
+    def gray(self):
+        return self._cached("gray" , lambda: cv.cvtColor(self.frame , cv.COLOR_BGR2GRAY))
+
+    @property
+    def small(self):
+        return self._cached("small" , lambda: self.downscaled(SMALL_WIDTH))
+
+    @property
+    def small_gray(self):
+        return self.downscaled_gray(SMALL_WIDTH)
+
+    def downscaled(self , width):
+        # keeps the aspect ratio, never upscales
+        if width >= self.width:
+            return self.frame
+
+        def make():
+            height = int(round(self.height * width / self.width))
+            return cv.resize(self.frame , (width , height) , interpolation=cv.INTER_AREA)
+
+        return self._cached(("downscaled" , width) , make)
+
+    def downscaled_gray(self , width):
+        if width >= self.width:
+            return self.gray
+        return self._cached(("downscaled_gray" , width) , lambda: cv.cvtColor(self.downscaled(width) , cv.COLOR_BGR2GRAY))
+
+    # -----------------------------
+    # MODEL INPUTS
+    # -----------------------------
+    # inference runs at its own resolution, the display / accounting keep the camera's. the
+    # downscaled copy is converted, never the full frame, so a 1080p camera costs a 1080p resize
+    # and a small colour conversion instead of a 1080p one. width None = full resolution.
+    def rgb_at(self , width):
+        if width is None or width >= self.width:
+            return self.rgb
+        return self._cached(("rgb" , width) , lambda: cv.cvtColor(self.downscaled(width) , cv.COLOR_BGR2RGB))
+
+    def mp_image_at(self , width):
+        if width is None or width >= self.width:
+            return self.mp_image
+        return self._cached(("mp_image" , width) , lambda: mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb_at(width)))
+
+    def scale_at(self , width):
+        # multiply pixel coordinates of an image made at this width to get frame pixels
+        if width is None or width >= self.width:
+            return 1.0
+        return self.width / float(self.downscaled(width).shape[1])
+
+    def rgb_crop(self , box , max_size = None):
+        # (x0, y0, x1, y1) of the full frame, cut from the BGR frame, shrunk so the longer side is at most
+        # max_size and only then converted. landmarks normalized to the crop don't change with its size
+        x0 , y0 , x1 , y1 = box
+        crop = self.frame[y0:y1 , x0:x1]
+        longer = max(x1 - x0 , y1 - y0)
+        if max_size is not None and longer > max_size:
+            scale = max_size / float(longer)
+            size = (max(1 , int(round((x1 - x0) * scale))) , max(1 , int(round((y1 - y0) * scale))))
+            crop = cv.resize(crop , size , interpolation=cv.INTER_AREA)
+        return cv.cvtColor(crop , cv.COLOR_BGR2RGB)
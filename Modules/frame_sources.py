@@ -0,0 +1,247 @@
+import abc
+import glob
+import os
+import time
+
+import cv2 as cv
+import numpy as np
+
+import capture_module
+
+
+# -----------------------------
+# FRAME SOURCES
+# -----------------------------
+# everything the pipeline can read frames from. every source behaves like cv.VideoCapture
+# (read() -> (ok, frame), release()), so capture_module.LatestFrameCapture takes any of them,
+# and adds position_ms: the recorded time of the frame read last (None for a live camera).
+DEFAULT_FPS = 30.0
+IMAGE_EXTENSIONS = (".png" , ".jpg" , ".jpeg" , ".bmp")
+MEMMAP_EXTENSIONS = (".npy" , ".raw" , ".bin")
+
+
+class FrameSource(abc.ABC):
+    '''
+    Base class of the recorded sources. Subclasses implement _read_frame(index)
+    and set frame_count / fps. realtime = True sleeps so frames come out at the
+    recorded rate (a recording standing in for the webcam), False hands them out
+    as fast as they can be decoded (replay, benchmarks).
+    '''
+
+    live = False
+
+    def __init__(self , fps = DEFAULT_FPS , realtime = False):
+        self.fps = fps or DEFAULT_FPS
+        self.realtime = realtime
+        self.frame_count = None
+        self.index = 0              # index of the next frame
+        self.position_ms = None
+        self._started_at = None
+
+    @abc.abstractmethod
+    def _read_frame(self , index):
+        # the frame at index, None once the source runs out
+        ...
+
+    def _timestamp_ms(self , index):
+        return index * 1000.0 / self.fps
+
+    def read(self):
+        if self.frame_count is not None and self.index >= self.frame_count:
+            return False , None
+
+        frame = self._read_frame(self.index)
+        if frame is None:
+            return False , None
+
+        self.position_ms = self._timestamp_ms(self.index)
+        self.index += 1
+
+        if self.realtime:
+            self._pace()
+        return True , frame
+
+    def _pace(self):
+        if self._started_at is None:
+            self._started_at = time.monotonic() - self.position_ms / 1000.0
+        delay = self._started_at + self.position_ms / 1000.0 - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def seek(self , index):
+        self.index = index
+        self._started_at = None
+
+    def resync(self):
+        # after a pause (LatestFrameCapture.pause) the next frame comes out right away
+        self._started_at = None
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        # (frame, position_ms) until the source runs out
+        while True:
+            ok , frame = self.read()
+            if not ok:
+                return
+            yield frame , self.position_ms
+
+
+class WebcamSource:
+    # the low latency camera from capture_module, no recorded time
+    live = True
+
+    def __init__(self , index = capture_module.CAMERA_INDEX , **camera_options):
+        self.capture = capture_module.open_camera(index , **camera_options)
+        self.fps = self.capture.get(cv.CAP_PROP_FPS) or DEFAULT_FPS
+        self.frame_count = None
+        self.position_ms = None
+
+    def read(self):
+        return self.capture.read()
+
+    def resync(self):
+        # the driver kept a frame from before the pause (CAMERA_BUFFER_SIZE), throw it away
+        self.capture.grab()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def release(self):
+        self.capture.release()
+
+    def __iter__(self):
+        while True:
+            ok , frame = self.read()
+            if not ok:
+                return
+            yield frame , None
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self , path , realtime = False):
+        self.capture = cv.VideoCapture(str(path))
+        if not self.capture.isOpened():
+            raise FileNotFoundError(f"Can't open video {path}")
+
+        super().__init__(self.capture.get(cv.CAP_PROP_FPS) , realtime)
+        count = int(self.capture.get(cv.CAP_PROP_FRAME_COUNT))
+        self.frame_count = count if count > 0 else None
+        self._last_ms = -1.0
+
+    def _read_frame(self , index):
+        ok , frame = self.capture.read()
+        return frame if ok else None
+
+    def _timestamp_ms(self , index):
+        # the container's timestamp (variable frame rate recordings), index / fps if the backend has none
+        ms = self.capture.get(cv.CAP_PROP_POS_MSEC)
+        if ms <= self._last_ms or (ms == 0 and index > 0):
+            ms = index * 1000.0 / self.fps
+        self._last_ms = ms
+        return ms
+
+    def seek(self , index):
+        self.capture.set(cv.CAP_PROP_POS_FRAMES , index)
+        self._last_ms = -1.0
+        super().seek(index)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageDirectorySource(FrameSource):
+    # frame_00000.png, frame_00001.png, ... in name order, fps gives the time between them
+    def __init__(self , path , fps = DEFAULT_FPS , realtime = False):
+        super().__init__(fps , realtime)
+        self.files = sorted(f for f in glob.glob(os.path.join(str(path) , "*"))
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.frame_count = len(self.files)
+
+    def _read_frame(self , index):
+        return cv.imread(self.files[index])
+
+
+class SyntheticSource(FrameSource):
+    '''
+    Frames made in memory, no files or camera. generate(index, width, height)
+    returns a BGR frame; the default is a gray frame with a bright square
+    moving across it (no face in it, the detectors report AWAY).
+    '''
+
+    def __init__(self , frame_count = 300 , width = 640 , height = 480 , fps = DEFAULT_FPS ,
+                 generate = None , realtime = False):
+        super().__init__(fps , realtime)
+        self.frame_count = frame_count
+        self.width = width
+        self.height = height
+        self.generate = generate or moving_square
+
+    def _read_frame(self , index):
+        return self.generate(index , self.width , self.height)
+
+
+def moving_square(index , width , height):
+    frame = np.full((height , width , 3) , 96 , dtype=np.uint8)
+    size = height // 4
+    x = (index * 8) % max(1 , width - size)
+    frame[height // 2 - size // 2 : height // 2 + size // 2 , x : x + size] = 230
+    return frame
+
+
+class MemmapSource(FrameSource):
+    '''
+    Raw frames in one file, mapped instead of read: a .npy array of shape
+    (N, H, W, 3) uint8, or a headerless .raw / .bin file of H x W x 3 frames
+    (pass shape=(H, W)). Only the pages of the frames actually read are touched.
+    '''
+
+    def __init__(self , path , shape = None , dtype = np.uint8 , fps = DEFAULT_FPS , realtime = False):
+        super().__init__(fps , realtime)
+        path = str(path)
+        if path.endswith(".npy"):
+            self.frames = np.load(path , mmap_mode="r")
+        else:
+            if shape is None:
+                raise ValueError("MemmapSource needs shape=(height, width) for a raw file")
+            height , width = shape[:2]
+            frame_size = height * width * 3 * np.dtype(dtype).itemsize
+            count = os.path.getsize(path) // frame_size
+            self.frames = np.memmap(path , dtype=dtype , mode="r" , shape=(count , height , width , 3))
+        self.frame_count = len(self.frames)
+
+    def _read_frame(self , index):
+        # a plain ndarray view of the mapped pages, nothing downstream writes to the frame
+        return np.asarray(self.frames[index])
+
+    def release(self):
+        self.frames = None
+
+
+def open_source(spec = None , realtime = False , **options):
+    '''
+    None / 0 / "1"           -> webcam
+    "synthetic[:N]"          -> SyntheticSource with N frames
+    a directory              -> ImageDirectorySource
+    *.npy / *.raw / *.bin    -> MemmapSource
+    anything else            -> VideoFileSource
+    '''
+    if spec is None or isinstance(spec , int) or (isinstance(spec , str) and spec.isdigit()):
+        return WebcamSource(int(spec or capture_module.CAMERA_INDEX) , **options)
+
+    spec = str(spec)
+    if spec == "synthetic" or spec.startswith("synthetic:"):
+        count = int(spec.split(":" , 1)[1]) if ":" in spec else 300
+        return SyntheticSource(count , realtime=realtime , **options)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec , realtime=realtime , **options)
+    if spec.lower().endswith(MEMMAP_EXTENSIONS):
+        return MemmapSource(spec , realtime=realtime , **options)
+    return VideoFileSource(spec , realtime=realtime , **options)
@@ -5,9 +5,6 @@ from datetime import datetime
 import logging
 import log_config
 
-mp_faceMesh = mp.solutions.face_mesh
-face_mesh = mp_faceMesh.FaceMesh()
-
 landmark_points = [1, 152 , 33 , 263 , 61 , 291]
 calibrate_warning = "Please Press C to calibrate"
 
@@ -28,6 +25,88 @@ pitch_current = None
 
 # calibration is to set the current pitch and yaw as baseline and then substract from it later.
 
+# -----------------------------
+# PnP SETUP (built once, not per frame)
+# -----------------------------
+# 3D model points (approx face model), same order as landmark_points
+model_points = np.array([
+    (0.0, 0.0, 0.0),          # Nose tip (1)
+    (0.0, -330.0, -65.0),     # Chin (152)
+    (-225.0, 170.0, -135.0),  # Left eye outer corner (33)
+    (225.0, 170.0, -135.0),   # Right eye outer corner (263)
+    (-150.0, -150.0, -125.0), # Left mouth corner (61)
+    (150.0, -150.0, -125.0)   # Right mouth corner (291)
+], dtype=np.float64)
+
+dist_coeffs = np.zeros((4, 1))
+
+# "iterative_warm" = SOLVEPNP_ITERATIVE starting from the last frame's rvec / tvec,
+# "iterative" = SOLVEPNP_ITERATIVE from scratch (old behaviour), "sqpnp", "epnp".
+# benchmarks/bench_head_pose.py compares them.
+pnp_solver = "iterative_warm"
+
+pnp_flags = {
+    "iterative": cv.SOLVEPNP_ITERATIVE,
+    "iterative_warm": cv.SOLVEPNP_ITERATIVE,
+    "sqpnp": cv.SOLVEPNP_SQPNP,
+    "epnp": cv.SOLVEPNP_EPNP,
+}
+
+camera_matrices = {}  # (width, height) -> camera matrix, the intrinsics only change with the resolution
+
+last_rvec = None
+last_tvec = None
+
+# pixel positions of the six PnP points of the last frame (None without a face), for the overlay
+pose_points = None
+
+
+def camera_matrix_for(width , height):
+    camera_matrix = camera_matrices.get((width , height))
+    if camera_matrix is None:
+        focal_length = width
+        center = (width / 2, height / 2)
+
+        camera_matrix = np.array([
+            [focal_length, 0, center[0]],
+            [0, focal_length, center[1]],
+            [0, 0, 1]
+        ], dtype=np.float64)
+        camera_matrices[(width , height)] = camera_matrix
+    return camera_matrix
+
+
+def solve_pose(image_points , width , height , solver = None):
+    global last_rvec , last_tvec
+    solver = solver or pnp_solver
+    camera_matrix = camera_matrix_for(width , height)
+
+    if solver == "iterative_warm" and last_rvec is not None:
+        success, rvec, tvec = cv.solvePnP(
+            model_points, image_points, camera_matrix, dist_coeffs,
+            rvec=last_rvec.copy(), tvec=last_tvec.copy(), useExtrinsicGuess=True,
+            flags=cv.SOLVEPNP_ITERATIVE
+        )
+    else:
+        success, rvec, tvec = cv.solvePnP(
+            model_points, image_points, camera_matrix, dist_coeffs,
+            flags=pnp_flags[solver]
+        )
+
+    if success:
+        last_rvec , last_tvec = rvec , tvec
+    else:
+        last_rvec , last_tvec = None , None
+    return success, rvec, tvec
+
+
+def angles_from_rvec(rvec):
+    # (pitch, yaw, roll) in degrees
+    rmat, _ = cv.Rodrigues(rvec)
+    angles, _, _, _, _, _ = cv.RQDecomp3x3(rmat)
+    return angles[0], angles[1], angles[2]
+
+
 distracted_to_attentive_time = 0.5
 attentive_to_distracted_time = 1
 
@@ -38,110 +117,74 @@ candidate_since = None
 debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
 
 
-def update(frame , now , key):
-    global yaw_current , pitch_current , current_state , candidate_state , candidate_since , calibrate_warning
-    height , width , _ = frame.shape
-    rgb_frame = cv.cvtColor(frame , cv.COLOR_BGR2RGB)
-
-    result = face_mesh.process(rgb_frame)
+# landmarks comes from landmark_module.update(ctx), the mesh runs once per frame for both modules
+def update(ctx , now , key , landmarks):
+    global yaw_current , pitch_current , current_state , candidate_state , candidate_since , calibrate_warning , last_rvec , last_tvec , pose_points
+    height , width = ctx.height , ctx.width
 
     
-    if result.multi_face_landmarks:
-        for FacialLandmarks in result.multi_face_landmarks:
-
-            image_points = []
-
-            for i in landmark_points:
-                pt_i = FacialLandmarks.landmark[i]
-                x = int(pt_i.x * width)
-                y = int(pt_i.y * height)
-
-                image_points.append((x, y))
-                cv.circle(frame, (x, y), 2, (0, 0, 255), -1)
-
-            image_points = np.array(image_points, dtype=np.float64)
-
-            # 3D model points (approx face model)
-            model_points = np.array([
-                (0.0, 0.0, 0.0),          # Nose tip (1)
-                (0.0, -330.0, -65.0),     # Chin (152)
-                (-225.0, 170.0, -135.0),  # Left eye outer corner (33)
-                (225.0, 170.0, -135.0),   # Right eye outer corner (263)
-                (-150.0, -150.0, -125.0), # Left mouth corner (61)
-                (150.0, -150.0, -125.0)   # Right mouth corner (291)
-            ], dtype=np.float64)
-
-            focal_length = width
-            center = (width / 2, height / 2)
-
-            camera_matrix = np.array([
-                [focal_length, 0, center[0]],
-                [0, focal_length, center[1]],
-                [0, 0, 1]
-            ], dtype=np.float64)
-
-            dist_coeffs = np.zeros((4, 1))
-
-            success, rvec, tvec = cv.solvePnP(
-                model_points, image_points, camera_matrix, dist_coeffs,
-                flags=cv.SOLVEPNP_ITERATIVE
-            )
-
-            if success:
-                rmat, _ = cv.Rodrigues(rvec)
-                angles, _, _, _, _, _ = cv.RQDecomp3x3(rmat)
-
-                pitch = angles[0]
-                yaw = angles[1]
-                roll = angles[2]
-
-                if(key == ord('c') or key == ord('C')):
-                    pitch_current = pitch
-                    yaw_current = yaw
-                    calibrate_warning = " "
-                    debug_log.info(f"Head Pose Calibration done Sucessfully with pitch: {pitch_current} and yaw: {yaw_current}")
-
-                if yaw_current is None:
-                    yaw_current = yaw
-                    pitch_current = pitch
-
-                yaw_corr = yaw - yaw_current
-                pitch_corr = pitch - pitch_current
-                debug_log.info(f"yaw_corr: {yaw_corr} and pitch_corr is {pitch_corr}")
-
-                # detector suggestion for this frame
-                detected_state = (abs(yaw_corr) < 20) and (abs(pitch_corr) < 20)  # True = attentive, False = distracted
-
-                # --- Debounce state switching like your face detection ---
-                if detected_state == current_state:
-                    candidate_state = None
-                    candidate_since = None
+    if landmarks is not None:
+        # landmarks is the (N, 3) array from landmark_module, pick the six PnP points in one go
+        image_points = (landmarks[landmark_points , :2] * (width , height)).astype(np.float64)
+
+        pose_points = image_points
+
+        success, rvec, tvec = solve_pose(image_points, width, height)
+
+        if success:
+            pitch, yaw, roll = angles_from_rvec(rvec)
+
+            if(key == ord('c') or key == ord('C')):
+                pitch_current = pitch
+                yaw_current = yaw
+                calibrate_warning = " "
+                debug_log.info("Head Pose Calibration done Sucessfully with pitch: %s and yaw: %s" , pitch_current , yaw_current)
+
+            if yaw_current is None:
+                yaw_current = yaw
+                pitch_current = pitch
+
+            yaw_corr = yaw - yaw_current
+            pitch_corr = pitch - pitch_current
+            debug_log.info("yaw_corr: %s and pitch_corr is %s" , yaw_corr , pitch_corr)
+
+            # detector suggestion for this frame
+            detected_state = (abs(yaw_corr) < 20) and (abs(pitch_corr) < 20)  # True = attentive, False = distracted
+
+            # --- Debounce state switching like your face detection ---
+            if detected_state == current_state:
+                candidate_state = None
+                candidate_since = None
+            else:
+                if candidate_state is None:
+                    candidate_state = detected_state
+                    candidate_since = now
                 else:
-                    if candidate_state is None:
-                        candidate_state = detected_state
-                        candidate_since = now
+                    if detected_state != candidate_state:
+                        # noisy flip, restart candidate
+                        candidate_state = None
+                        candidate_since = None
                     else:
-                        if detected_state != candidate_state:
-                            # noisy flip, restart candidate
-                            candidate_state = None
-                            candidate_since = None
-                        else:
-                            elapsed = (now - candidate_since).total_seconds()
+                        elapsed = (now - candidate_since).total_seconds()
 
-                            # choose threshold based on direction
-                            if current_state is True and candidate_state is False:
-                                threshold = attentive_to_distracted_time
-                            else:
-                                threshold = distracted_to_attentive_time
+                        # choose threshold based on direction
+                        if current_state is True and candidate_state is False:
+                            threshold = attentive_to_distracted_time
+                        else:
+                            threshold = distracted_to_attentive_time
 
-                            if elapsed >= threshold:
-                                current_state = candidate_state
-                                candidate_state = None
-                                candidate_since = None
+                        if elapsed >= threshold:
+                            current_state = candidate_state
+                            candidate_state = None
+                            candidate_since = None
 
-                # show debounced state
+            # show debounced state
 
-                return "ATTENTIVE" if current_state else "DISTRACTED"
+            return "ATTENTIVE" if current_state else "DISTRACTED"
+    else:
+        # face lost, don't warm start the next face from an old pose
+        last_rvec , last_tvec = None , None
+        pose_points = None
     return "NO_FACE"         
 
 
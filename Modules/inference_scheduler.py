@@ -0,0 +1,110 @@
+import time
+import logging
+from collections import deque
+
+import cv2 as cv
+
+import log_config
+import face_prescence_module
+import head_pose_module
+import eye_gaze_module
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# SCHEDULER SETTINGS
+# -----------------------------
+stable_interval = 0.2          # seconds between heavy inference runs while nothing is going on (5 Hz)
+motion_threshold = 6.0         # mean abs pixel change on the small gray frame that counts as "something moved"
+eye_margin = 0.05              # eye_smooth this close to the distracted threshold counts as unstable
+rate_window = 2.0              # seconds the effective inference rate is averaged over
+
+
+class InferenceScheduler:
+    '''
+    Decides per frame whether the heavy stages (presence / mesh / head pose / eye gaze) run.
+
+    While the debounced states are stable they run every stable_interval seconds,
+    the frames in between reuse the last labels. They run on every frame as soon as:
+      - a candidate_state is pending in face_prescence_module, or in head_pose_module while present,
+        so the debounce timers see every frame and present_to_away_time,
+        attentive_to_distracted_time etc. are measured at full frame rate
+      - eye_smooth is close to the distracted threshold (while present)
+      - the cheap signal changes: the downscaled gray frame moved since the last run
+      - a calibration was requested
+    A change that starts while running slowly is seen at most stable_interval late,
+    after that the debounce runs at full rate like before.
+    '''
+
+    def __init__(self):
+        self.frames = 0
+        self.runs = 0
+        self.last_reason = None
+
+        self._last_run_at = None
+        self._last_run_gray = None
+        self._recent_runs = deque()
+
+    def pending_transition(self):
+        # head pose doesn't run while nobody is there, a candidate it left pending when the
+        # person walked away stays frozen, only the presence one counts then
+        if face_prescence_module.candidate_state is not None:
+            return True
+        return face_prescence_module.current_state is True and head_pose_module.candidate_state is not None
+
+    def eyes_near_threshold(self):
+        # same for eye_smooth, frozen at its last value while AWAY
+        if face_prescence_module.current_state is not True or eye_gaze_module.ref_eye_down_score is None:
+            return False
+        return abs(eye_gaze_module.eye_smooth - eye_gaze_module.distracted_eye_threshold) < eye_margin
+
+    def motion(self , ctx):
+        if self._last_run_gray is None or self._last_run_gray.shape != ctx.small_gray.shape:
+            return True
+        return float(cv.absdiff(ctx.small_gray , self._last_run_gray).mean()) > motion_threshold
+
+    def should_run(self , ctx , force = False):
+        self.frames += 1
+        t = time.monotonic()
+
+        if force:
+            reason = "forced"
+        elif self._last_run_at is None:
+            reason = "first frame"
+        elif self.pending_transition():
+            reason = "pending transition"
+        elif self.eyes_near_threshold():
+            reason = "eyes near threshold"
+        elif self.motion(ctx):
+            reason = "motion"
+        elif t - self._last_run_at >= stable_interval:
+            reason = "stable interval"
+        else:
+            return False
+
+        self.runs += 1
+        self.last_reason = reason
+        self._last_run_at = t
+        self._last_run_gray = ctx.small_gray
+        self._recent_runs.append(t)
+        self._drop_old_runs(t)
+        return True
+
+    def _drop_old_runs(self , t):
+        while self._recent_runs and t - self._recent_runs[0] > rate_window:
+            self._recent_runs.popleft()
+
+    def effective_rate(self):
+        # heavy inference runs per second over the last rate_window seconds
+        self._drop_old_runs(time.monotonic())
+        return len(self._recent_runs) / rate_window
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "runs": self.runs,
+            "skipped": self.frames - self.runs,
+            "effective_rate": round(self.effective_rate() , 1),
+            "last_reason": self.last_reason,
+        }
@@ -0,0 +1,189 @@
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import log_config
+import frame_sources
+from frame_context import FrameContext
+
+import face_prescence_module
+import landmark_module
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# INFERENCE SIZE
+# -----------------------------
+# picks the smallest BlazeFace input width (face_prescence_module.detect_width), mesh crop size
+# (landmark_module.mesh_crop_size) and full frame mesh width (landmark_module.mesh_width, the fallback
+# when the crop has no face and the LIVE_STREAM landmarker's input) whose landmarks stay within a
+# tolerance of the full resolution ones on a reference recording. error = mean landmark distance / distance between the outer eye
+# corners, per frame, averaged; a frame where the candidate loses a face the reference found counts 1.0.
+# the choice goes to INFERENCE_SIZE_FILE, maintwo and the batch / multi_stream workers apply it at startup.
+INFERENCE_SIZE_FILE = "inference_size.json"
+DETECT_WIDTHS = [160 , 192 , 256 , 320 , 480 , 640]
+MESH_CROP_SIZES = [128 , 160 , 192 , 256 , 320]
+MESH_WIDTHS = [320 , 480 , 640 , 960]
+TOLERANCE = 0.02         # 2 % of the eye corner distance, well below the eye score noise
+MAX_FRAMES = 300
+EYE_CORNERS = (33 , 263)
+
+
+def landmarks_for(source_spec , detect_width , mesh_crop_size , max_frames = MAX_FRAMES , mesh_width = None ,
+                  full_frame = False):
+    # [(N, 3) landmarks in frame coordinates or None] for the first max_frames frames at these sizes.
+    # full_frame: the mesh runs on the whole frame (the fallback path) on every frame BlazeFace found a face in
+    saved = (face_prescence_module.detect_width , landmark_module.mesh_crop_size ,
+             landmark_module.mesh_width , landmark_module.face_mesh)
+    face_prescence_module.detect_width = detect_width
+    landmark_module.mesh_crop_size = mesh_crop_size
+    landmark_module.mesh_width = mesh_width
+    # fresh mesh per run, it tracks the face between frames
+    landmark_module.face_mesh = landmark_module.new_face_mesh()
+
+    source = frame_sources.open_source(source_spec)
+    out = []
+    try:
+        for index , (frame , _) in enumerate(source):
+            if index >= max_frames:
+                break
+            ctx = FrameContext(frame)
+            # debounce needs a time, the face box doesn't depend on it
+            face_prescence_module.update(ctx , datetime(2026 , 1 , 1) + timedelta(seconds=index / 30.0))
+            face_box = face_prescence_module.face_box
+            if face_box is None:
+                out.append(None)
+            else:
+                out.append(landmark_module.run_mesh(ctx , None if full_frame else face_box))
+    finally:
+        source.release()
+        landmark_module.face_mesh.close()
+        (face_prescence_module.detect_width , landmark_module.mesh_crop_size ,
+         landmark_module.mesh_width , landmark_module.face_mesh) = saved
+    return out
+
+
+def landmark_error(reference , candidate , width , height):
+    errors = []
+    for ref , cand in zip(reference , candidate):
+        if ref is None:
+            continue
+        if cand is None:
+            errors.append(1.0)
+            continue
+        ref_px = ref[: , :2] * (width , height)
+        cand_px = cand[: , :2] * (width , height)
+        eye_distance = np.linalg.norm(ref_px[EYE_CORNERS[0]] - ref_px[EYE_CORNERS[1]])
+        if eye_distance <= 0:
+            continue
+        errors.append(float(np.linalg.norm(ref_px - cand_px , axis=1).mean() / eye_distance))
+    return float(np.mean(errors)) if errors else None
+
+
+def choose(source_spec , tolerance = TOLERANCE , max_frames = MAX_FRAMES ,
+           detect_widths = DETECT_WIDTHS , mesh_crop_sizes = MESH_CROP_SIZES , mesh_widths = MESH_WIDTHS):
+    '''
+    Smallest detect_width (mesh crop at full resolution), then the smallest
+    mesh_crop_size with that detect_width, each within tolerance of the full
+    resolution landmarks. Then the smallest mesh_width whose full frame mesh
+    stays within tolerance of the full frame mesh at full resolution.
+    Returns the choice plus every measured error.
+    '''
+    source = frame_sources.open_source(source_spec)
+    ok , frame = source.read()
+    source.release()
+    if not ok:
+        raise ValueError(f"No frames in {source_spec}")
+    height , width = frame.shape[:2]
+
+    reference = landmarks_for(source_spec , None , None , max_frames)
+    if not any(lm is not None for lm in reference):
+        raise ValueError(f"No face found in {source_spec}, it can't be a reference recording")
+
+    errors = {"detect_width": {} , "mesh_crop_size": {} , "mesh_width": {}}
+
+    chosen_detect = None
+    for detect_width in sorted(w for w in detect_widths if w < width):
+        error = landmark_error(reference , landmarks_for(source_spec , detect_width , None , max_frames) , width , height)
+        errors["detect_width"][detect_width] = error
+        debug_log.info("detect_width %d: landmark error %s" , detect_width , error)
+        if error is not None and error <= tolerance:
+            chosen_detect = detect_width
+            break
+
+    chosen_crop = None
+    for crop_size in sorted(mesh_crop_sizes):
+        error = landmark_error(reference , landmarks_for(source_spec , chosen_detect , crop_size , max_frames) , width , height)
+        errors["mesh_crop_size"][crop_size] = error
+        debug_log.info("mesh_crop_size %d: landmark error %s" , crop_size , error)
+        if error is not None and error <= tolerance:
+            chosen_crop = crop_size
+            break
+
+    # the full frame path against itself at full resolution, the crop reference would count the
+    # crop / full frame difference in at every width
+    full_reference = landmarks_for(source_spec , chosen_detect , chosen_crop , max_frames , None , full_frame=True)
+    chosen_mesh_width = None
+    for mesh_width in sorted(w for w in mesh_widths if w < width):
+        error = landmark_error(full_reference ,
+                               landmarks_for(source_spec , chosen_detect , chosen_crop , max_frames , mesh_width ,
+                                             full_frame=True) ,
+                               width , height)
+        errors["mesh_width"][mesh_width] = error
+        debug_log.info("mesh_width %d: landmark error %s" , mesh_width , error)
+        if error is not None and error <= tolerance:
+            chosen_mesh_width = mesh_width
+            break
+
+    return {
+        "source": str(source_spec),
+        "resolution": [width , height],
+        "tolerance": tolerance,
+        "detect_width": chosen_detect,
+        "mesh_crop_size": chosen_crop,
+        "mesh_width": chosen_mesh_width,
+        "errors": errors,
+    }
+
+
+def apply(path = INFERENCE_SIZE_FILE):
+    # use the sizes saved by choose(), nothing changes if the file isn't there
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        choice = json.load(f)
+    face_prescence_module.detect_width = choice.get("detect_width")
+    landmark_module.mesh_crop_size = choice.get("mesh_crop_size")
+    # files saved before mesh_width was tuned keep the default
+    landmark_module.mesh_width = choice.get("mesh_width" , landmark_module.mesh_width)
+    debug_log.info("Inference sizes from %s: detect_width %s, mesh_crop_size %s, mesh_width %s" ,
+                   path , choice.get("detect_width") , choice.get("mesh_crop_size") , landmark_module.mesh_width)
+    return choice
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the smallest inference sizes within a landmark error tolerance.")
+    parser.add_argument("source" , help="reference recording with a face in it (anything frame_sources opens)")
+    parser.add_argument("--tolerance" , type=float , default=TOLERANCE , help="mean landmark error / eye corner distance")
+    parser.add_argument("--frames" , type=int , default=MAX_FRAMES , help="frames of the recording to compare")
+    parser.add_argument("--out" , default=INFERENCE_SIZE_FILE , help="where to save the choice")
+    args = parser.parse_args()
+
+    choice = choose(args.source , args.tolerance , args.frames)
+    with open(args.out , "w") as f:
+        json.dump(choice , f , indent=2)
+
+    print(f"{choice['resolution'][0]}x{choice['resolution'][1]}, tolerance {choice['tolerance']:.3f}")
+    print(f"detect_width   {choice['detect_width'] or 'full frame'}")
+    print(f"mesh_crop_size {choice['mesh_crop_size'] or 'full crop'}")
+    print(f"mesh_width     {choice['mesh_width'] or 'full frame'}")
+    print(f"saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import cv2 as cv
+import mediapipe as mp
+import numpy as np
+import logging
+import os
+
+import log_config
+from async_inference import AsyncResults
+from landmark_tracker import LandmarkTracker
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# one FaceMesh pass per frame, shared by head_pose_module and eye_gaze_module.
+# refine_landmarks = True adds the iris points (468 - 477) eye gaze needs,
+# the first 468 points are the same ones head pose uses.
+mp_faceMesh = mp.solutions.face_mesh
+
+
+def new_face_mesh(max_num_faces = 1 , static_image_mode = False):
+    # the tracking mesh follows the face between frames, every camera needs its own (see stream_tracker).
+    # a static image mesh finds the face again on every call and keeps nothing between them
+    return mp_faceMesh.FaceMesh(static_image_mode = static_image_mode , refine_landmarks = True ,
+                                max_num_faces = max_num_faces)
+
+
+# built by load() (or the first frame), not at import, see face_prescence_module.load.
+# the ROI crop moves and changes size every frame, the tracking mesh's own ROI from the last frame
+# would point at the wrong part of it: crops go to crop_mesh (static image mode, its detector only
+# sees the small crop, no state so every stream can share it), the full frame fallback to face_mesh.
+# the price: static image mode runs FaceMesh's own face detector on every crop, where the tracking
+# mesh only runs it when it loses the face. it's a detector pass over ~256 px instead of the frame,
+# compare "facemesh_crop" with "facemesh" in benchmarks/bench_stages.py on a clip with a face.
+# legacy FaceMesh has no way to hand it a ROI and skip that pass
+face_mesh = None
+crop_mesh = None
+
+
+def load():
+    global face_mesh , crop_mesh
+    if face_mesh is None:
+        face_mesh = new_face_mesh()
+    if crop_mesh is None:
+        crop_mesh = new_face_mesh(static_image_mode = True)
+    return face_mesh
+
+
+# cascade mode: run the mesh only on the padded BlazeFace box from face_prescence_module
+# instead of the whole webcam frame. landmarks are mapped back to full frame coordinates
+# so head pose / eye gaze don't care which mode ran.
+use_face_roi = True
+
+# inference resolution of the mesh, independent of the camera's: the face crop is shrunk to at most
+# mesh_crop_size on its longer side (the landmark model runs at 192 x 192 anyway) and the full frame
+# fallback / LIVE_STREAM landmarker get a copy mesh_width wide. the output is normalized, so nothing
+# downstream changes. None = full resolution (see inference_size for picking them on a recording)
+mesh_crop_size = 256
+mesh_width = 640
+
+# tracking mode: full mesh every landmark_tracker.full_mesh_every frames, the points head pose and
+# eye gaze need are tracked with optical flow in between (see landmark_tracker)
+use_tracking = False
+tracker = LandmarkTracker()
+
+result = None
+landmarks = None
+
+# -----------------------------
+# ASYNC (LIVE_STREAM) MODE
+# -----------------------------
+# FaceLandmarker from the Tasks API, same model mesh_draw.py uses. it has its own face detector
+# so it always gets the full frame, results come back through live_results.
+LANDMARKER_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)) , ".." , "face_landmarker.task")
+
+live_landmarker = None
+live_results = None
+
+
+def start_live_stream():
+    global live_landmarker , live_results
+    if live_landmarker is not None:
+        return
+
+    live_results = AsyncResults("landmarks")
+    options = mp.tasks.vision.FaceLandmarkerOptions(
+        base_options=mp.tasks.BaseOptions(model_asset_path=LANDMARKER_MODEL_PATH),
+        running_mode=mp.tasks.vision.RunningMode.LIVE_STREAM,
+        num_faces=1,
+        result_callback=live_results.on_result,
+        output_face_blendshapes=False,
+        output_facial_transformation_matrixes=False
+    )
+    live_landmarker = mp.tasks.vision.FaceLandmarker.create_from_options(options)
+
+
+def submit_async(ctx , timestamp_ms , frame_info):
+    # never blocks, the result shows up in live_results.latest()
+    live_results.submit(timestamp_ms , frame_info)
+    live_landmarker.detect_async(ctx.mp_image_at(mesh_width) , timestamp_ms)
+
+
+def landmarks_from_live_result(live_result):
+    # Tasks API result -> the same (N, 3) array update() returns
+    if live_result is None or not live_result.face_landmarks:
+        return None
+    return to_array(live_result.face_landmarks[0])
+
+
+def to_array(face_landmarks):
+    # one pass over the protobuf / Tasks landmark list per frame, everything after that is
+    # numpy indexing: landmarks[idx, 0] = x, landmarks[idx, 1] = y, landmarks[idx, 2] = z (normalized)
+    return np.array([(pt.x , pt.y , pt.z) for pt in face_landmarks] , dtype=np.float32)
+
+
+def map_to_frame(face_landmarks , face_box , frame_width , frame_height):
+    # mesh output is normalized to the crop, make it normalized to the full frame again (in place)
+    x0 , y0 , x1 , y1 = face_box
+    crop_width = x1 - x0
+    crop_height = y1 - y0
+
+    face_landmarks[: , 0] = (face_landmarks[: , 0] * crop_width + x0) / frame_width
+    face_landmarks[: , 1] = (face_landmarks[: , 1] * crop_height + y0) / frame_height
+    face_landmarks[: , 2] *= crop_width / frame_width  # z uses the same scale as x
+
+
+# ctx is a frame_context.FrameContext, reuses the RGB frame the presence detector already made.
+# face_box is face_prescence_module.face_box (or None to use the full frame)
+def update(ctx , face_box = None):
+    global landmarks
+
+    if use_tracking:
+        landmarks = tracker.track(ctx)
+        if landmarks is not None:
+            return landmarks
+
+    landmarks = run_mesh(ctx , face_box)
+
+    if use_tracking:
+        tracker.reset(ctx , landmarks)
+
+    return landmarks
+
+
+def run_mesh(ctx , face_box):
+    global result
+    load()
+
+    if use_face_roi and face_box is not None:
+        result = crop_mesh.process(ctx.rgb_crop(face_box , mesh_crop_size))
+
+        if result.multi_face_landmarks:
+            face_landmarks = to_array(result.multi_face_landmarks[0].landmark)
+            map_to_frame(face_landmarks , face_box , ctx.width , ctx.height)
+            return face_landmarks
+
+        # box was off (fast movement, presence still debouncing), try the full frame
+        debug_log.info("No face in the ROI crop, falling back to the full frame")
+
+    result = face_mesh.process(ctx.rgb_at(mesh_width))
+
+    if result.multi_face_landmarks:
+        return to_array(result.multi_face_landmarks[0].landmark)
+    return None
@@ -0,0 +1,107 @@
+import logging
+import cv2 as cv
+import numpy as np
+
+import log_config
+import head_pose_module
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# TRACKED POINTS
+# -----------------------------
+# head pose only needs its six PnP points, eye gaze the eyelids and the irises
+EYELID_POINTS = [159 , 145 , 386 , 374]
+IRIS_POINTS = list(range(469 , 478))
+TRACKED_POINTS = np.array(list(head_pose_module.landmark_points) + EYELID_POINTS + IRIS_POINTS)
+
+# -----------------------------
+# TRACKER SETTINGS
+# -----------------------------
+full_mesh_every = 5           # run the real mesh at least every Nth frame
+track_width = 640             # LK runs on a gray copy downscaled to this width
+max_fb_error = 1.0            # px (at track_width), median forward-backward error before we give up
+max_drift = 25.0              # px (at track_width), how far the points may wander from the last mesh before we re-run it
+lk_params = dict(
+    winSize = (21 , 21),
+    maxLevel = 3,
+    criteria = (cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT , 20 , 0.03),
+)
+
+
+class LandmarkTracker:
+    '''
+    Tracks TRACKED_POINTS with pyramidal Lucas-Kanade between full mesh runs.
+
+    track(ctx) returns a landmark array like the mesh one (tracked rows updated,
+    the rest copied from the last full mesh), or None when the mesh has to run:
+    no keyframe yet, full_mesh_every reached, a point got lost, the
+    forward-backward error or the drift since the keyframe is too big.
+    After every full mesh run call reset(ctx, landmarks).
+    '''
+
+    def __init__(self):
+        self.base_landmarks = None
+        self.frames_since_mesh = 0
+        self.tracked_frames = 0
+        self.fallbacks = 0
+
+        self._prev_gray = None
+        self._prev_points = None
+        self._key_points = None
+
+    def reset(self , ctx , landmarks):
+        if landmarks is None:
+            self.base_landmarks = None
+            self._prev_gray = None
+            return
+
+        gray = ctx.downscaled_gray(track_width)
+        height , width = gray.shape[:2]
+
+        self.base_landmarks = landmarks
+        self.frames_since_mesh = 0
+        self._prev_gray = gray
+        self._prev_points = (landmarks[TRACKED_POINTS , :2] * (width , height)).astype(np.float32).reshape(-1 , 1 , 2)
+        self._key_points = self._prev_points.copy()
+
+    def track(self , ctx):
+        if self.base_landmarks is None:
+            return None
+        if self.frames_since_mesh + 1 >= full_mesh_every:
+            return None
+
+        gray = ctx.downscaled_gray(track_width)
+        if gray.shape != self._prev_gray.shape:
+            return None
+
+        points , status , _ = cv.calcOpticalFlowPyrLK(self._prev_gray , gray , self._prev_points , None , **lk_params)
+        back , back_status , _ = cv.calcOpticalFlowPyrLK(gray , self._prev_gray , points , None , **lk_params)
+
+        if not status.all() or not back_status.all():
+            return self._fallback("lost a point")
+
+        fb_error = float(np.median(np.linalg.norm((back - self._prev_points).reshape(-1 , 2) , axis=1)))
+        if fb_error > max_fb_error:
+            return self._fallback(f"forward-backward error {fb_error:.2f}px")
+
+        drift = float(np.max(np.linalg.norm((points - self._key_points).reshape(-1 , 2) , axis=1)))
+        if drift > max_drift:
+            return self._fallback(f"drift {drift:.1f}px")
+
+        self._prev_gray = gray
+        self._prev_points = points
+        self.frames_since_mesh += 1
+        self.tracked_frames += 1
+
+        height , width = gray.shape[:2]
+        tracked = self.base_landmarks.copy()
+        tracked[TRACKED_POINTS , :2] = points.reshape(-1 , 2) / (width , height)
+
+        return tracked
+
+    def _fallback(self , reason):
+        self.fallbacks += 1
+        debug_log.info("Landmark tracking fell back to the mesh: %s" , reason)
+        return None
@@ -1,16 +1,158 @@
+import atexit
+import collections
 import logging
+import logging.handlers
+import multiprocessing
+import multiprocessing.util
+import os
+import queue
+import threading
+import time
 
-def setup_logger(filename: str, log_level=logging.INFO):
+# -----------------------------
+# LOG SETTINGS
+# -----------------------------
+# QUEUE_LOGGING: the calling thread only puts the record on a queue, a background
+# listener thread formats it and writes the file. False = old synchronous FileHandler.
+QUEUE_LOGGING = True
+
+# microscope.log rotates at LOG_MAX_BYTES and keeps LOG_BACKUP_COUNT old files (~40 MB worst case)
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# per message template: RATE_LIMIT_BURST messages right away, then RATE_LIMIT_PER_SECOND.
+# per-frame messages ("Attentive Eyes at ...") end up at about one line a second,
+# rare ones (state changes, calibration) are never dropped. None disables the limit.
+RATE_LIMIT_PER_SECOND = 1.0
+RATE_LIMIT_BURST = 5
+# templates tracked at most, the least recently logged one is forgotten past this
+# (a template built with an f-string is a new one every call, this keeps those from growing the filter)
+RATE_LIMIT_MAX_TEMPLATES = 512
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+# spawned worker processes (batch chunks, multi_stream workers) write microscope-<pid>.log instead
+# of the parent's file: the rotating handler isn't safe across processes, a rollover in one would
+# rename the file under the others
+PER_PROCESS_FILES = True
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+class RateLimitFilter(logging.Filter):
+    '''
+    Token bucket per message template (record.msg before the % args are merged),
+    so "Attentive Eyes at %s" is limited as one kind of message whatever the time
+    in it is. The first record let through after some were dropped says how many.
+    '''
+
+    def __init__(self , per_second = RATE_LIMIT_PER_SECOND , burst = RATE_LIMIT_BURST ,
+                 max_templates = RATE_LIMIT_MAX_TEMPLATES):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self.max_templates = max_templates
+        self._buckets = collections.OrderedDict()      # template -> [tokens, last refill, suppressed], oldest first
+        self._lock = threading.Lock()
+
+    def filter(self , record):
+        now = time.monotonic()
+        key = record.msg if isinstance(record.msg , str) else repr(type(record.msg))
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst) , now , 0]
+                while len(self._buckets) > self.max_templates:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+
+            bucket[0] = min(self.burst , bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+
+            bucket[0] -= 1.0
+            suppressed , bucket[2] = bucket[2] , 0
+
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # the stock QueueHandler formats the message in the calling thread, leave that to the listener.
+    # args are kept as they are, so don't log objects that get mutated right after the call.
+    def prepare(self , record):
+        return record
+
+
+def process_filename(filename):
+    # the file this process logs filename's records to
+    if not PER_PROCESS_FILES or multiprocessing.parent_process() is None:
+        return filename
+    root , ext = os.path.splitext(filename)
+    return f"{root}-{os.getpid()}{ext}"
+
+
+def _file_handler(filename , log_level):
+    handler = logging.handlers.RotatingFileHandler(filename , maxBytes=LOG_MAX_BYTES , backupCount=LOG_BACKUP_COUNT ,
+                                                   delay=True)
+    handler.setLevel(log_level)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def _queue_handler(filename , log_level):
+    # one listener thread per file, shared by every logger that writes to it
+    with _listeners_lock:
+        entry = _listeners.get(filename)
+        if entry is None:
+            records = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(records , _file_handler(filename , log_level) ,
+                                                      respect_handler_level=True)
+            listener.start()
+            entry = _listeners[filename] = (records , listener)
+
+    handler = DeferredQueueHandler(entry[0])
+    handler.setLevel(log_level)
+    return handler
+
+
+def stop_listeners():
+    # drains the queues into the files, registered with atexit
+    with _listeners_lock:
+        for _ , listener in _listeners.values():
+            listener.stop()
+        _listeners.clear()
+
+
+atexit.register(stop_listeners)
+if multiprocessing.parent_process() is not None:
+    # worker processes exit without running atexit, multiprocessing's finalizers do run
+    multiprocessing.util.Finalize(None , stop_listeners , exitpriority=0)
+
+
+def setup_logger(filename: str, log_level=logging.INFO, rate_limited=True):
     logger = logging.getLogger(filename)
     logger.setLevel(log_level)
 
     if not logger.handlers:
-        file_handler = logging.FileHandler(filename)
-        file_handler.setLevel(log_level)
-
-        formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
-        file_handler.setFormatter(formatter)
+        path = process_filename(filename)
+        if QUEUE_LOGGING:
+            logger.addHandler(_queue_handler(path , log_level))
+        else:
+            file_handler = logging.FileHandler(path)
+            file_handler.setLevel(log_level)
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            logger.addHandler(file_handler)
 
-        logger.addHandler(file_handler)
+        # on the logger, not the handler: a dropped record never reaches the queue
+        if rate_limited and RATE_LIMIT_PER_SECOND is not None:
+            logger.addFilter(RateLimitFilter())
 
     return logger
@@ -4,10 +4,14 @@ import numpy as np
 from datetime import datetime
 import logging 
 import  log_config
+import sys
+import frame_sources
+from frame_context import FrameContext
 
 
 
 import face_prescence_module
+import landmark_module
 import head_pose_module
 import eye_gaze_module
 
@@ -15,40 +19,42 @@ import eye_gaze_module
 debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
 stats_log = log_config.setup_logger('dashboard.log' , logging.INFO)
 
-capture = cv.VideoCapture(0)
+# python main.py [video / image dir / .npy ...], webcam without an argument
+capture = frame_sources.open_source(sys.argv[1] if len(sys.argv) > 1 else None , realtime=True)
 
 while True:
     ret , frame  = capture.read()
     now = datetime.now()
-    flipped_frame = cv.flip(frame , 1)
-    cv.imshow("FocusOS V1", flipped_frame)
     if not ret:
         break
+    ctx = FrameContext(frame , now)
+    cv.imshow("FocusOS V1", ctx.mirrored)
 
     key = cv.waitKey(1) & 0xFF
     
-    presence_label = face_prescence_module.update(frame , now)
+    presence_label = face_prescence_module.update(ctx , now)
     if presence_label == "PRESENT":
-        head_pose_label = head_pose_module.update(frame , now , key)
+        landmarks = landmark_module.update(ctx , face_prescence_module.face_box)
+        head_pose_label = head_pose_module.update(ctx , now , key , landmarks)
         if head_pose_label == "ATTENTIVE":
-            eye_gaze_label = eye_gaze_module.update(frame , key , now)
+            eye_gaze_label = eye_gaze_module.update(ctx , key , now , landmarks)
             if eye_gaze_label == "attentive Eyes":
                 print("User is really active and doing some productive work")
-                debug_log.info(f"Doing Productive work at:{now}")
-                stats_log.info(f"Doing Productive work at:{now}")
+                debug_log.info("Doing Productive work at:%s" , now)
+                stats_log.info("Doing Productive work at:%s" , now)
                 # some logging here 
                 # some maths here to find the time user was productive and shit
             else:
-                debug_log.info(f"Doing UNProductive work at:{now}")
-                stats_log.info(f"Doing UNProductive work at:{now}")
+                debug_log.info("Doing UNProductive work at:%s" , now)
+                stats_log.info("Doing UNProductive work at:%s" , now)
                 continue
         else:
-            debug_log.info(f"Doing UNProductive work at:{now}")
-            stats_log.info(f"Doing UNProductive work at:{now}")
+            debug_log.info("Doing UNProductive work at:%s" , now)
+            stats_log.info("Doing UNProductive work at:%s" , now)
             continue
     else:
-        debug_log.info(f"Doing UNProductive work at:{now}")
-        stats_log.info(f"Doing UNProductive work at:{now}")
+        debug_log.info("Doing UNProductive work at:%s" , now)
+        stats_log.info("Doing UNProductive work at:%s" , now)
         continue
     
     if ( key == ord('q')):
@@ -1,53 +1,115 @@
+import time
+# before the heavy imports (cv2, mediapipe), for the startup breakdown in status.json
+PROCESS_STARTED = time.perf_counter()
+
 import cv2 as cv
 from datetime import datetime
 import logging
-import csv
 import os
 import json
-import time
+import threading
+from collections import namedtuple
 
 import log_config
+import capture_module
+import pipeline
+import control_channel
+import telemetry
+import overlay
+import metrics
+import frame_sources
+import session_accounting
+import detectors
+import multi_face
+import inference_size
+from inference_scheduler import InferenceScheduler
+from frame_context import FrameContext
 
 import face_prescence_module
+import landmark_module
 import head_pose_module
 import eye_gaze_module
 
+IMPORT_SECONDS = time.perf_counter() - PROCESS_STARTED
+
 
 # -----------------------------
 # FILES FOR STREAMLIT CONTROL
 # -----------------------------
-CONTROL_FILE = "control.json"
+# commands come in over control_channel (local socket), not a file
 STATUS_FILE = "status.json"
-SUMMARY_FILE = "summary.json"
-DASHBOARD_CSV = "dashboard.csv"
+SUMMARY_FILE = session_accounting.SUMMARY_FILE
+DASHBOARD_CSV = session_accounting.DASHBOARD_CSV
+
+# where frames come from, see frame_sources.open_source: None = webcam, or a video file,
+# an image directory, a .npy memmap... (recordings are played back at their recorded rate)
+FRAME_SOURCE = os.environ.get("FOCUSOS_SOURCE")
+
+# the session is recorded as state segments (timeline.csv). PER_SECOND_ROWS also writes the old 1 row/sec
+# dashboard.csv (the dashboard's live CSV preview reads it, without it the preview shows the timeline),
+# STORE_SESSIONS writes 1 row/sec to the Parquet session store either way (needs pyarrow, see session_store)
+PER_SECOND_ROWS = session_accounting.PER_SECOND_ROWS
+STORE_SESSIONS = True
+
+# False = headless (unattended / server): no window, no GUI event loop, nothing is mirrored or drawn.
+# FOCUSOS_HEADLESS=1 does the same without editing the file
+SHOW_UI = os.environ.get("FOCUSOS_HEADLESS", "0") == "0"
+
+# the window is redrawn at most this often, decisions in between aren't rendered at all
+RENDER_FPS = overlay.RENDER_FPS
 
+# submit frames to LIVE_STREAM models (Tasks API) and decide on the newest completed results,
+# inference never blocks the pipeline. False = the synchronous IMAGE / FaceMesh.process path
+ASYNC_INFERENCE = False
+
+# run the heavy stages at a low rate while the debounced states are stable (see inference_scheduler).
+# single face path only: the scheduler reads the module level detector state, with MULTI_FACE that's
+# whoever was updated last, so a change for anyone else would be skipped
+ADAPTIVE_INFERENCE = True
+
+# several people in front of one camera (shared desk / meeting room): every face gets its own debounce,
+# calibration and accounting (see multi_face, written to people_summary.json at the end) and the biggest
+# face drives this session. synchronous path only. FOCUSOS_MULTI_FACE=1 does the same
+MULTI_FACE = os.environ.get("FOCUSOS_MULTI_FACE", "0") == "1"
+
+# how often the pipeline queue depths / throughput go to status.json and the debug log
+PIPELINE_STATS_INTERVAL = 5.0
+
+# stage latency histograms and counters (see metrics), served as OpenMetrics on
+# http://127.0.0.1:9464/metrics and written to metrics.prom every PIPELINE_STATS_INTERVAL.
+# FOCUSOS_METRICS=0 switches the instrumentation off
+METRICS_HTTP = True
+
+last_status = ("IDLE", "")
+# imports / model load / camera open / ready seconds of this daemon and the time from the last
+# START_SESSION to its first decision, goes into every status.json
+startup_timing = {"imports_s": round(IMPORT_SECONDS, 3)}
+live_telemetry = None   # telemetry.TelemetryWriter, created at startup
+status_lock = threading.Lock()  # the main thread and the inference stage both write status
+
+
+def write_status(state: str, message: str = "", pipeline_stats=None):
+    # called from the main loop and the inference stage, status.json / last_status / the telemetry
+    # session state change together under status_lock
+    global last_status
 
-def write_status(state: str, message: str = ""):
     payload = {
         "state": state,
         "message": message,
         "ts": time.time()
     }
-    with open(STATUS_FILE, "w") as f:
-        json.dump(payload, f, indent=2)
-
-
-def read_command():
-    if not os.path.exists(CONTROL_FILE):
-        return None
-    try:
-        with open(CONTROL_FILE, "r") as f:
-            return json.load(f).get("command")
-    except Exception:
-        return None
+    if pipeline_stats is not None:
+        payload["pipeline"] = pipeline_stats
+    payload["startup"] = dict(startup_timing)
 
+    with status_lock:
+        last_status = (state, message)
+        with open(STATUS_FILE, "w") as f:
+            json.dump(payload, f, indent=2)
 
-def format_time(seconds: float) -> str:
-    seconds = int(seconds)
-    h = seconds // 3600
-    m = (seconds % 3600) // 60
-    s = seconds % 60
-    return f"{h}h {m}m {s}s"
+        if live_telemetry is not None:
+            live_telemetry.publish(session_state=state)
+    return state, message
 
 
 # -----------------------------
@@ -65,296 +127,586 @@ session_start = None
 session_end = None
 
 # -----------------------------
-# TIME COUNTERS
+# SESSION ACCOUNTING
 # -----------------------------
-attentive_seconds = 0.0
-distracted_seconds = 0.0
-away_seconds = 0.0
+# time counters, state timeline, dashboard.csv / session store rows and summary.json
+session = session_accounting.SessionAccounting(DASHBOARD_CSV, SUMMARY_FILE, store_sessions=STORE_SESSIONS,
+                                               per_second_rows=PER_SECOND_ROWS)
 
-last_frame_time = None
 
 # -----------------------------
-# CSV LOGGING SETUP (created only when session starts)
+# PIPELINE STAGES
 # -----------------------------
-csv_file = None
-csv_writer = None
-last_csv_write_time = None
-
-
-def start_csv():
-    global csv_file, csv_writer, last_csv_write_time
-
-    csv_exists = os.path.exists(DASHBOARD_CSV)
-    csv_file = open(DASHBOARD_CSV, mode="a", newline="")
-    csv_writer = csv.writer(csv_file)
-
-    if not csv_exists:
-        csv_writer.writerow([
-            "timestamp",
-            "presence_label",
-            "head_pose_label",
-            "eye_gaze_label",
-            "final_state",
-            "attentive_seconds",
-            "distracted_seconds",
-            "away_seconds"
-        ])
-
-    last_csv_write_time = None
-
-
-def close_csv():
-    global csv_file
-    if csv_file:
-        csv_file.close()
-        csv_file = None
-
-
-def write_summary():
-    global session_start, session_end
-    total_seconds = attentive_seconds + distracted_seconds + away_seconds
-    focus_percent = (attentive_seconds / total_seconds * 100) if total_seconds > 0 else 0.0
-
-    summary = {
-        "session_start": session_start.strftime("%Y-%m-%d %H:%M:%S") if session_start else "N/A",
-        "session_end": session_end.strftime("%Y-%m-%d %H:%M:%S") if session_end else "N/A",
-        "total_seconds": int(total_seconds),
-        "attentive_seconds": int(attentive_seconds),
-        "distracted_seconds": int(distracted_seconds),
-        "away_seconds": int(away_seconds),
-        "focus_percent": round(focus_percent, 2),
-        "csv_path": DASHBOARD_CSV
-    }
+# capture (capture_module thread, keeps only the newest frame)
+#   -> inference (presence / landmarks / head pose / eye gaze, runs as fast as it can)
+#   -> decisions queue (blocking, every decision is counted)
+#   -> accounting (time counters, debug log, CSV)
+#   -> render queue (size 1, drops old renders, only fed at RENDER_FPS)
+#   -> main thread (overlay + imshow, OpenCV windows want the main thread)
+
+# one decision per processed frame, handed from the inference stage to the accounting stage.
+# captured has its frame stripped and display_frame is only set when a render is due, so a full
+# decisions queue holds a few frames, not one per decision
+Decision = namedtuple("Decision", [
+    "captured", "now", "presence_label", "head_pose_label", "eye_gaze_label",
+    "final_state", "latency_ms", "display_frame", "marks"
+])
+
+# set by the main thread on CALIBRATE, consumed by the next inference frame
+calibrate_requested = threading.Event()
+
+
+def take_calibration_key():
+    # Fake key input for calibration
+    if calibrate_requested.is_set():
+        calibrate_requested.clear()
+        write_status("RUNNING", "Calibration triggered ✅")
+        return ord("c")  # one-shot calibration trigger
+    return 0
+
+
+def sync_detectors(ctx, now):
+    if MULTI_FACE:
+        return multi_face_detectors(ctx, now)
+    return detectors.run(ctx, now, take_calibration_key())
+
+
+people = None   # multi_face.MultiFaceTracker, built with the other models (load_models)
+
+
+def multi_face_detectors(ctx, now):
+    # everyone is updated (and calibrated by C), the session follows the primary person
+    people.update(ctx, now, take_calibration_key())
+    primary = people.primary()
+    if primary is None:
+        return "AWAY", "NO_FACE", "NOT_CALIBRATED"
+    return primary.labels
+
+
+# labels from the newest completed async results and the timestamps they came from,
+# a result is only fed to the debounce / smoothing logic once
+INITIAL_ASYNC_LABELS = {
+    "presence": "AWAY",
+    "head_pose": "NO_FACE",
+    "eye_gaze": "NOT_CALIBRATED",
+    "presence_ts": -1,
+    "landmarks_ts": -1,
+}
+async_labels = dict(INITIAL_ASYNC_LABELS)
+
+
+def async_detectors(ctx, captured):
+    # submit this frame without waiting, then decide on the newest results that already came back
+    timestamp_ms = face_prescence_module.live_results.next_timestamp_ms(captured.captured_at)
+    frame_info = (captured.frame_id, captured.wall_time)
+
+    face_prescence_module.submit_async(ctx, timestamp_ms, frame_info)
+
+    presence_result, presence_info, presence_ts = face_prescence_module.live_results.latest()
+    if presence_result is not None and presence_ts > async_labels["presence_ts"]:
+        async_labels["presence_ts"] = presence_ts
+        # debounce on the time of the frame the result belongs to, not the current one
+        async_labels["presence"] = face_prescence_module.update(ctx, presence_info[1], presence_result)
+
+    if async_labels["presence"] != "PRESENT":
+        async_labels["head_pose"] = "NO_FACE"
+        async_labels["eye_gaze"] = "NOT_CALIBRATED"
+        return async_labels["presence"], async_labels["head_pose"], async_labels["eye_gaze"]
+
+    landmark_module.submit_async(ctx, timestamp_ms, frame_info)
+
+    live_result, landmarks_info, landmarks_ts = landmark_module.live_results.latest()
+    if live_result is not None and landmarks_ts > async_labels["landmarks_ts"]:
+        async_labels["landmarks_ts"] = landmarks_ts
+        landmarks = landmark_module.landmarks_from_live_result(live_result)
+        result_time = landmarks_info[1]
+
+        # calibration waits for a fresh landmark result so it is never spent on a stale one
+        key = take_calibration_key()
+
+        async_labels["head_pose"] = head_pose_module.update(ctx, result_time, key, landmarks)
+        if "ATTENTIVE" in async_labels["head_pose"]:
+            async_labels["eye_gaze"] = eye_gaze_module.update(ctx, key, result_time, landmarks)
+        else:
+            async_labels["eye_gaze"] = "NOT_CALIBRATED"
+
+    return async_labels["presence"], async_labels["head_pose"], async_labels["eye_gaze"]
+
+
+scheduler = InferenceScheduler()
+last_labels = ("AWAY", "NO_FACE", "NOT_CALIBRATED")
+last_marks = overlay.NO_MARKS
+
+
+def inference_step():
+    global last_labels, last_marks
+
+    with metrics.span("capture"):
+        captured = camera.read()
+
+    if captured is None:
+        if not camera.failed:
+            # driver stall, nothing new within the read timeout. the stage calls again
+            debug_log.warning("No camera frame within the read timeout, waiting")
+            return None
+        write_status("ERROR", "Camera read failed.")
+        return pipeline.STOP
+
+    frame = captured.frame
+    now = captured.wall_time
+
+    ctx = FrameContext(frame, now)
+
+    run_heavy = True
+    if ADAPTIVE_INFERENCE and not MULTI_FACE:
+        run_heavy = scheduler.should_run(ctx, force=calibrate_requested.is_set())
+
+    if not run_heavy:
+        # states are stable, reuse the last labels for this frame
+        presence_label, head_pose_label, eye_gaze_label = last_labels
+    elif ASYNC_INFERENCE and not MULTI_FACE:
+        presence_label, head_pose_label, eye_gaze_label = async_detectors(ctx, captured)
+    else:
+        presence_label, head_pose_label, eye_gaze_label = sync_detectors(ctx, now)
+
+    last_labels = (presence_label, head_pose_label, eye_gaze_label)
+    if SHOW_UI and run_heavy:
+        # boxes / PnP points as plain data, the detectors don't draw on the frame any more
+        last_marks = people.marks() if MULTI_FACE else detectors.marks()
+
+    final_state = detectors.final_state_for(presence_label, head_pose_label, eye_gaze_label)
+
+    # glass-to-decision latency for this frame
+    decision_latency = capture_module.latency_ms(captured)
+    metrics.observe("glass_to_decision", decision_latency / 1000)
+
+    # the raw frame, untouched by the detectors. the overlay mirrors / draws on its own copy
+    display_frame = frame if SHOW_UI and renderer.due() else None
+    return Decision(captured._replace(frame=None), now, presence_label, head_pose_label, eye_gaze_label,
+                    final_state, decision_latency, display_frame, last_marks)
+
+
+# live numbers that only go to the telemetry block
+decisions_per_second = 0.0
+last_final_state = None
+
+# perf_counter of the START_SESSION that started this session, cleared by its first decision
+session_requested_at = None
+
+
+def publish_telemetry(decision, dt):
+    global decisions_per_second, last_final_state
+
+    if dt > 0:
+        decisions_per_second = 0.9 * decisions_per_second + 0.1 * (1.0 / dt)
+
+    transition = {}
+    if decision.final_state != last_final_state:
+        transition = {
+            "last_transition_ts": time.time(),
+            "last_transition_from": last_final_state or "",
+            "last_transition_to": decision.final_state,
+        }
+        metrics.inc("state_transitions", to=decision.final_state)
+        last_final_state = decision.final_state
+
+    inference = inference_stage.stats()
+    accounting = accounting_stage.stats()
+    live_telemetry.publish(
+        final_state=decision.final_state,
+        presence_label=decision.presence_label,
+        head_pose_label=decision.head_pose_label,
+        eye_gaze_label=decision.eye_gaze_label,
+        attentive_seconds=session.attentive_seconds,
+        distracted_seconds=session.distracted_seconds,
+        away_seconds=session.away_seconds,
+        fps=decisions_per_second,
+        latency_ms=decision.latency_ms,
+        inference_ms=inference["busy_ms"],
+        accounting_ms=accounting["busy_ms"],
+        inference_rate=scheduler.effective_rate() if ADAPTIVE_INFERENCE and not MULTI_FACE else decisions_per_second,
+        frames=camera.frames_captured,
+        dropped=camera.frames_dropped,
+        **transition
+    )
+
+
+def accounting_step(decision):
+    global session_requested_at
+    final_state = decision.final_state
+
+    if session_requested_at is not None:
+        startup_timing["first_decision_ms"] = round((time.perf_counter() - session_requested_at) * 1000, 1)
+        debug_log.info("First decision %.0f ms after START_SESSION", startup_timing["first_decision_ms"])
+        session_requested_at = None
+
+    # -----------------------------
+    # TIME COUNTING + CSV LOGGING (1 row/sec)
+    # -----------------------------
+    dt = session.add(decision.now, decision.presence_label, decision.head_pose_label,
+                     decision.eye_gaze_label, final_state)
+
+    publish_telemetry(decision, dt)
+    metrics.inc("frames_processed")
+
+    # -----------------------------
+    # DEBUG LOG
+    # -----------------------------
+    # lazy %-formatting: when the rate limit drops the line nothing is formatted at all
+    debug_log.info(
+        "[%s] presence=%s head=%s eyes=%s t_att=%.1fs t_dis=%.1fs t_away=%.1fs frame=%d dropped=%d latency=%.0fms",
+        final_state, decision.presence_label, decision.head_pose_label, decision.eye_gaze_label,
+        session.attentive_seconds, session.distracted_seconds, session.away_seconds,
+        decision.captured.frame_id, camera.frames_dropped, decision.latency_ms
+    )
+
+    if decision.display_frame is not None:
+        # counters are read here so the render shows the totals this decision produced
+        return (decision, session.attentive_seconds, session.distracted_seconds, session.away_seconds)
+    return None
+
+
+def render(decision, att_seconds, dis_seconds, away_secs):
+    labels = (decision.presence_label, decision.head_pose_label, decision.eye_gaze_label, decision.final_state)
+
+    with metrics.span("put_text"):
+        image = overlay.draw(decision.display_frame, labels, (att_seconds, dis_seconds, away_secs), decision.marks)
+
+    with metrics.span("imshow"):
+        renderer.show(image)
+
+
+renderer = overlay.OverlayRenderer(RENDER_FPS)
+
+# queues and stage threads of the running session, every session gets new ones (new_session)
+decisions_queue = render_queue = None
+inference_stage = accounting_stage = None
+stages = []
+
+
+def new_session():
+    # everything a session starts from. models, camera, control channel and telemetry block stay warm
+    global scheduler, last_labels, last_marks, decisions_per_second, last_final_state, session_requested_at
+    global decisions_queue, render_queue, inference_stage, accounting_stage, stages
+
+    detectors.reset()
+    async_labels.update(INITIAL_ASYNC_LABELS)
+    for live_results in (face_prescence_module.live_results, landmark_module.live_results):
+        if live_results is not None:
+            live_results.reset()
+    if people is not None:
+        people.reset()
+    calibrate_requested.clear()
+
+    scheduler = InferenceScheduler()
+    last_labels = ("AWAY", "NO_FACE", "NOT_CALIBRATED")
+    last_marks = overlay.NO_MARKS
+    decisions_per_second = 0.0
+    last_final_state = None
+    session_requested_at = time.perf_counter()
+
+    decisions_queue = pipeline.BoundedQueue("decisions", maxsize=64)
+    render_queue = pipeline.BoundedQueue("render", maxsize=1, drop_oldest=True)
+
+    inference_stage = pipeline.Stage("inference", inference_step, outbox=decisions_queue)
+    accounting_stage = pipeline.Stage("accounting", accounting_step, inbox=decisions_queue, outbox=render_queue)
+    stages = [inference_stage, accounting_stage]
+
+
+def current_pipeline_stats():
+    stats = pipeline.pipeline_stats(stages, [decisions_queue, render_queue])
+    stats["capture"] = {"frames": camera.frames_captured, "dropped": camera.frames_dropped}
+    if ADAPTIVE_INFERENCE and not MULTI_FACE:
+        stats["scheduler"] = scheduler.stats()
+    if SHOW_UI:
+        stats["render"] = {"rendered": renderer.rendered, "skipped": renderer.skipped}
+    if landmark_module.use_tracking:
+        stats["tracking"] = {
+            "tracked_frames": landmark_module.tracker.tracked_frames,
+            "fallbacks": landmark_module.tracker.fallbacks,
+        }
+    if ASYNC_INFERENCE:
+        stats["async"] = {
+            "presence": face_prescence_module.live_results.stats(),
+            "landmarks": landmark_module.live_results.stats(),
+        }
+    if metrics.ENABLED:
+        stats["metrics"] = metrics.status_summary()
+    return stats
+
+
+def collect_metrics():
+    # numbers kept by the camera / scheduler, copied in right before every export
+    metrics.set_counter("frames_captured", camera.frames_captured)
+    metrics.set_counter("frames_dropped", camera.frames_dropped)
+    metrics.set_gauge("decisions_per_second", decisions_per_second)
+    metrics.set_gauge("inference_rate", scheduler.effective_rate() if ADAPTIVE_INFERENCE and not MULTI_FACE else decisions_per_second)
+
+
+# model input sizes picked on a reference recording (python inference_size.py clip.mp4),
+# the defaults of face_prescence_module / landmark_module if it was never run
+inference_size.apply()
+
+# -----------------------------
+# WARM START
+# -----------------------------
+# the backend is a daemon: app.py starts it once and it keeps running across sessions, END_SESSION
+# writes the summary and goes back to IDLE, SHUTDOWN exits. the models are built on a background
+# thread while the camera opens, so START_SESSION only starts the pipeline threads.
+models_ready = threading.Event()
+model_load_error = None
+start_pending = False   # START_SESSION came in while the models were still loading
+
+
+def load_models():
+    global people, model_load_error
+    t0 = time.perf_counter()
+    try:
+        startup_timing["models_s"] = {name: round(seconds, 3) for name, seconds in detectors.load().items()}
+        if MULTI_FACE:
+            people = multi_face.MultiFaceTracker()
+        if ASYNC_INFERENCE:
+            face_prescence_module.start_live_stream()
+            landmark_module.start_live_stream()
+    except Exception as e:
+        model_load_error = e
+        debug_log.error("Model loading failed: %r", e)
+    startup_timing["model_load_s"] = round(time.perf_counter() - t0, 3)
+    models_ready.set()
+
+
+def open_camera():
+    # grabs on its own thread and only keeps the newest frame (see capture_module)
+    global camera
+    t0 = time.perf_counter()
+    # paused until a session starts, nothing is grabbed or decoded while the daemon is idle
+    camera = capture_module.LatestFrameCapture(frame_sources.open_source(FRAME_SOURCE, realtime=True)).start(paused=True)
+    startup_timing["camera_open_s"] = round(time.perf_counter() - t0, 3)
+    return camera
+
+
+def begin_session():
+    global session_started, session_ended, session_start
+
+    if model_load_error is not None:
+        return write_status("ERROR", f"Model loading failed: {model_load_error!r}")
+
+    if camera.failed:
+        # camera lost / recording over during the last session, the daemon opens it again
+        camera.stop()
+        open_camera()
+
+    new_session()
+    # capture counters start at zero, telemetry / pipeline stats / metrics are per session
+    camera.resume()
+    session_started = True
+    session_ended = False
+    session_start = datetime.now()
+    session.start(session_start)
+
+    for stage in stages:
+        stage.start()
+
+    debug_log.info("Session started from Streamlit.")
+    return write_status("RUNNING", "Session started ✅")
 
-    with open(SUMMARY_FILE, "w") as f:
-        json.dump(summary, f, indent=2)
 
-    print("\n========== FocusOS SESSION SUMMARY ==========")
-    print(f"Session Start : {summary['session_start']}")
-    print(f"Session End   : {summary['session_end']}")
-    print(f"Total Time    : {format_time(total_seconds)}")
+def finish_session(final_status=("DONE", "Summary written ✅")):
+    global session_started, session_ended
 
-    print("\n--- Breakdown ---")
-    print(f"✅ Attentive   : {format_time(attentive_seconds)}")
-    print(f"❌ Distracted  : {format_time(distracted_seconds)}")
-    print(f"🚫 Away        : {format_time(away_seconds)}")
+    # stop the source and let the decisions already queued reach the accounting stage
+    inference_stage.stop()
+    inference_stage.join(timeout=2.0)
+    accounting_stage.join(timeout=5.0)
+    debug_log.info("Pipeline stats at session end: %s", current_pipeline_stats())
+    if metrics.ENABLED:
+        metrics.write_file()
+    camera.pause()
 
-    print("\n--- Score ---")
-    print(f"🎯 Focus %     : {focus_percent:.1f}%")
+    session.close(session_end)
+    session.write_summary()
+    if MULTI_FACE:
+        people.write_summary()
+    if SHOW_UI:
+        renderer.close()
 
-    print("\nDashboard saved to: dashboard.csv")
-    print("============================================\n")
+    session_started = False
+    session_ended = False
+    write_status(*final_status)
 
 
+threading.Thread(target=load_models, name="model-loader", daemon=True).start()
+
 # -----------------------------
 # CAMERA INIT
 # -----------------------------
-capture = cv.VideoCapture(0)
+open_camera()
 
-write_status("IDLE", "Waiting for Streamlit commands...")
+control = control_channel.ControlServer().start()
 
-last_cmd = None
+# live counters for the dashboard (shared memory, see telemetry)
+live_telemetry = telemetry.TelemetryWriter()
 
-while True:
-    cmd = read_command()
+if metrics.ENABLED:
+    metrics.register_collector(collect_metrics)
+    if METRICS_HTTP:
+        metrics.start_server()
 
-    # Only react when command changes
-    if cmd is not None and cmd != last_cmd:
-        last_cmd = cmd
+write_status("IDLE", "Loading models, waiting for Streamlit commands...")
 
-        # START SESSION
-        if cmd == "START_SESSION":
-            if not session_started:
-                session_started = True
-                session_start = datetime.now()
+last_stats_time = time.monotonic()
+announced_ready = False
+shutdown_requested = False
 
-                attentive_seconds = 0.0
-                distracted_seconds = 0.0
-                away_seconds = 0.0
-                last_frame_time = None
+# the main thread only handles commands and the OpenCV window, the stages do the work
+while True:
+    if not announced_ready and models_ready.is_set():
+        announced_ready = True
+        startup_timing["ready_s"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+        debug_log.info("Backend warm: %s", dict(startup_timing))
+        if not session_started and not start_pending:
+            write_status("IDLE", "Backend ready ✅ Waiting for Streamlit commands...")
+
+    if start_pending and models_ready.is_set():
+        start_pending = False
+        begin_session()
+
+    # wait on the channel instead of sleeping so a command is handled the moment it arrives,
+    # with the window open the render queue does the waiting
+    if not session_started:
+        command = control.poll(timeout=0.1)
+    else:
+        command = control.poll(timeout=0 if SHOW_UI else 0.05)
+    end_requested = False
+
+    if command is not None:
+        control_started = time.perf_counter()
+        cmd = command.command
 
-                start_csv()
-                write_status("RUNNING", "Session started ✅")
-                debug_log.info("Session started from Streamlit.")
+        # every branch decides the answer to this command: (state, message) it wrote and whether it was done
+        ok = False
 
+        # START SESSION
+        if cmd == "START_SESSION":
+            if session_started or start_pending:
+                reply = write_status("STARTING" if start_pending else "RUNNING", "Session already running 💀")
+            elif not models_ready.is_set():
+                # answered right away, the session starts the moment the models are there
+                start_pending = True
+                reply = write_status("STARTING", "Loading models, the session starts when they're ready ⏳")
+                ok = True
             else:
-                write_status("RUNNING", "Session already running 💀")
+                reply = begin_session()
+                ok = session_started
 
         # CALIBRATE
         elif cmd == "CALIBRATE":
             if session_started and not session_ended:
-                write_status("CALIBRATING", "Calibration requested 🎯")
+                reply = write_status("CALIBRATING", "Calibration requested 🎯")
                 debug_log.info("Calibration requested from Streamlit.")
                 # You already use key='c' in modules, so we simulate that:
-                # We'll send key=ord('c') for one cycle
+                # the inference stage sends key=ord('c') for one frame
+                calibrate_requested.set()
+                ok = True
             else:
-                write_status("IDLE", "Cannot calibrate. Start session first.")
+                reply = write_status("IDLE", "Cannot calibrate. Start session first.")
 
         # END SESSION
         elif cmd == "END_SESSION":
             if session_started and not session_ended:
                 session_ended = True
                 session_end = datetime.now()
-                write_status("ENDED", "Session ended. Writing summary... 🏁")
+                reply = write_status("ENDED", "Session ended. Writing summary... 🏁")
                 debug_log.info("Session ended from Streamlit.")
-                break
+                end_requested = True
+                ok = True
+            elif start_pending:
+                start_pending = False
+                reply = write_status("IDLE", "Pending session start cancelled.")
+                ok = True
             else:
-                write_status("IDLE", "No session running to end.")
-
-    # If session hasn't started, just chill and keep window alive
-    if not session_started:
-        time.sleep(0.1)
-        continue
-
-    # -----------------------------
-    # READ FRAME
-    # -----------------------------
-    ret, frame = capture.read()
-    now = datetime.now()
-
-    if not ret:
-        write_status("ERROR", "Camera read failed.")
-        break
-
-    # Fake key input for calibration
-    key = 0
-    if last_cmd == "CALIBRATE":
-        key = ord("c")  # one-shot calibration trigger
-        # reset so it doesn't keep calibrating forever
-        last_cmd = "RUNNING_AFTER_CALIBRATE"
-        write_status("RUNNING", "Calibration triggered ✅")
+                reply = write_status("IDLE", "No session running to end.")
 
-    flipped_frame = cv.flip(frame, 1)
+        # PING (is the daemon there, and in which state), changes nothing
+        elif cmd == "PING":
+            reply = last_status
+            ok = True
 
-    # -----------------------------
-    # DEFAULT STATES
-    # -----------------------------
-    presence_label = "AWAY"
-    head_pose_label = "NO_FACE"
-    eye_gaze_label = "NOT_CALIBRATED"
-    final_state = "AWAY"
+        # SHUTDOWN (Kill Backend), ends a running session first
+        elif cmd == "SHUTDOWN":
+            if session_started and not session_ended:
+                session_ended = True
+                session_end = datetime.now()
+                end_requested = True
+            shutdown_requested = True
+            reply = write_status("ENDED", "Backend shutting down...")
+            debug_log.info("Shutdown requested from Streamlit.")
+            ok = True
 
-    # -----------------------------
-    # 1) FACE PRESENCE
-    # -----------------------------
-    presence_label = face_prescence_module.update(frame, now)
-
-    if presence_label == "PRESENT":
-        # -----------------------------
-        # 2) HEAD POSE
-        # -----------------------------
-        head_pose_label = head_pose_module.update(frame, now, key)
-
-        if "ATTENTIVE" in head_pose_label:
-            # -----------------------------
-            # 3) EYE GAZE
-            # -----------------------------
-            eye_gaze_label = eye_gaze_module.update(frame, key, now)
-
-            if "attentive" in eye_gaze_label.lower():
-                final_state = "ATTENTIVE"
-            else:
-                final_state = "DISTRACTED"
         else:
-            final_state = "DISTRACTED"
-    else:
-        final_state = "AWAY"
+            reply = (last_status[0], f"Unknown command {cmd!r}")
+            debug_log.info("Unknown command from Streamlit: %r", cmd)
 
-    # -----------------------------
-    # TIME COUNTING
-    # -----------------------------
-    if last_frame_time is None:
-        last_frame_time = now
+        control.ack(command, *reply, ok=ok)
+        metrics.observe("control", time.perf_counter() - control_started)
 
-    dt = (now - last_frame_time).total_seconds()
-    last_frame_time = now
+        if end_requested:
+            finish_session()
+        if shutdown_requested:
+            break
 
-    if final_state == "ATTENTIVE":
-        attentive_seconds += dt
-    elif final_state == "DISTRACTED":
-        distracted_seconds += dt
-    else:
-        away_seconds += dt
+    # If session hasn't started, just keep waiting for commands
+    if not session_started:
+        continue
 
-    # -----------------------------
-    # DEBUG LOG
-    # -----------------------------
-    debug_log.info(
-        f"[{final_state}] presence={presence_label} head={head_pose_label} eyes={eye_gaze_label} "
-        f"t_att={attentive_seconds:.1f}s t_dis={distracted_seconds:.1f}s t_away={away_seconds:.1f}s"
-    )
+    # camera failed or a stage crashed, the session ends with what it has
+    if not inference_stage.is_alive() or not accounting_stage.is_alive():
+        for stage in stages:
+            if stage.error is not None:
+                debug_log.error("Pipeline stage %s crashed: %r", stage.name, stage.error)
+                write_status("ERROR", f"Pipeline stage {stage.name} crashed: {stage.error!r}")
+        session_end = datetime.now()
+        finish_session(last_status)
+        continue
 
-    # -----------------------------
-    # CSV LOGGING (1 row/sec)
-    # -----------------------------
-    if csv_writer is not None:
-        if last_csv_write_time is None:
-            last_csv_write_time = now
-
-        elapsed = (now - last_csv_write_time).total_seconds()
-
-        if elapsed >= 1.0:
-            csv_writer.writerow([
-                now.strftime("%Y-%m-%d %H:%M:%S"),
-                presence_label,
-                head_pose_label,
-                eye_gaze_label,
-                final_state,
-                round(attentive_seconds, 2),
-                round(distracted_seconds, 2),
-                round(away_seconds, 2)
-            ])
-            csv_file.flush()
-            last_csv_write_time = now
+    if time.monotonic() - last_stats_time >= PIPELINE_STATS_INTERVAL:
+        last_stats_time = time.monotonic()
+        stats = current_pipeline_stats()
+        debug_log.info("Pipeline stats: %s" , stats)
+        write_status(*last_status, pipeline_stats=stats)
+        if metrics.ENABLED:
+            metrics.write_file()
 
     # -----------------------------
     # OPENCV UI (optional)
     # -----------------------------
-    cv.putText(flipped_frame, f"Presence: {presence_label}", (20, 40),
-               cv.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-    cv.putText(flipped_frame, f"Head: {head_pose_label}", (20, 70),
-               cv.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-    cv.putText(flipped_frame, f"Eyes: {eye_gaze_label}", (20, 100),
-               cv.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-    cv.putText(flipped_frame, f"FINAL: {final_state}", (20, 140),
-               cv.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-
-    cv.putText(flipped_frame, f"Attentive: {attentive_seconds:.1f}s", (20, 180),
-               cv.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-    cv.putText(flipped_frame, f"Distracted: {distracted_seconds:.1f}s", (20, 210),
-               cv.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    if not SHOW_UI:
+        continue
 
-    cv.putText(flipped_frame, f"Away: {away_seconds:.1f}s", (20, 240),
-               cv.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    rendered = render_queue.get(timeout=0.05)
+    if rendered is not None and rendered is not pipeline.STOP:
+        render(*rendered)
 
-    cv.putText(flipped_frame, "Controlled by Streamlit (Start/Calibrate/End)", (20, 280),
-               cv.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+    # the event loop keeps running between (throttled) renders so the window stays responsive
 
-    cv.imshow("FocusOS V1", flipped_frame)
+    with metrics.span("wait_key"):
+        key = cv.waitKey(1) & 0xFF
 
-    # Optional emergency quit (still keep this because you're clumsy)
-    if cv.waitKey(1) & 0xFF == ord("q"):
+    # Optional emergency quit (still keep this because you're clumsy), ends the session, not the daemon
+    if key == ord("q"):
         write_status("ENDED", "Ended from OpenCV window (q).")
         session_ended = True
         session_end = datetime.now()
-        break
+        finish_session()
 
 
 # -----------------------------
 # CLEANUP
 # -----------------------------
-capture.release()
-close_csv()
-
-if session_start is None:
-    session_start = datetime.now()
-if session_end is None:
-    session_end = datetime.now()
+if metrics.ENABLED:
+    metrics.write_file()
 
-write_summary()
-cv.destroyAllWindows()
-write_status("DONE", "Summary written ✅")
+camera.stop()
+control.stop()
+write_status("STOPPED", "Backend shut down.")
+live_telemetry.close()
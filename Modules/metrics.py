@@ -0,0 +1,239 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import log_config
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# HOT PATH INSTRUMENTATION
+# -----------------------------
+# with metrics.span("head_pose"): ...   -> fixed bucket latency histogram per stage
+# metrics.inc("frames_processed")         -> counters, metrics.set_gauge() for gauges
+#
+# ENABLED = False turns span() into a shared no-op context and inc() / observe() into an
+# early return, nothing is timed, locked or allocated. enabled, a span is two perf_counter()
+# calls, a bisect over the buckets and a short lock: about 1us, against ~30ms per frame.
+ENABLED = os.environ.get("FOCUSOS_METRICS" , "1") != "0"
+
+PREFIX = "focusos_"
+METRICS_FILE = "metrics.prom"
+METRICS_ADDRESS = ("127.0.0.1" , 9464)
+
+# seconds, upper bounds. capture waits and the mesh land in the ms range, the eye math well below
+LATENCY_BUCKETS = (0.0001 , 0.00025 , 0.0005 , 0.001 , 0.0025 , 0.005 , 0.01 , 0.025 , 0.05 , 0.1 , 0.25 , 0.5 , 1.0)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class Histogram:
+    def __init__(self , buckets = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self , value):
+        i = bisect.bisect_left(self.buckets , value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self , q):
+        # upper bound of the bucket the q-th observation falls in (None without observations)
+        with self._lock:
+            counts , count = list(self.counts) , self.count
+        if count == 0:
+            return None
+        rank = q * count
+        seen = 0
+        for bound , n in zip(self.buckets + (float("inf") ,) , counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Span:
+    __slots__ = ("name" , "t0")
+
+    def __init__(self , name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self , *exc):
+        observe(self.name , time.perf_counter() - self.t0)
+        return False
+
+
+_NULL_SPAN = nullcontext()
+
+stages = {}         # stage name -> Histogram of its latency in seconds
+counters = {}       # (name, labels tuple) -> value
+gauges = {}         # (name, labels tuple) -> value
+collectors = []     # callables run before every export, to copy in numbers kept elsewhere
+_lock = threading.Lock()
+
+
+def span(name):
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def observe(name , seconds):
+    if not ENABLED:
+        return
+    histogram = stages.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = stages.setdefault(name , Histogram())
+    histogram.observe(seconds)
+
+
+def inc(name , amount = 1 , **labels):
+    if not ENABLED:
+        return
+    key = (name , tuple(sorted(labels.items())))
+    with _lock:
+        counters[key] = counters.get(key , 0) + amount
+
+
+def set_counter(name , value , **labels):
+    # for counts that are already kept somewhere else (camera frames), still monotonic
+    if not ENABLED:
+        return
+    with _lock:
+        counters[(name , tuple(sorted(labels.items())))] = value
+
+
+def set_gauge(name , value , **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        gauges[(name , tuple(sorted(labels.items())))] = value
+
+
+def register_collector(collect):
+    collectors.append(collect)
+
+
+def _collect():
+    for collect in collectors:
+        try:
+            collect()
+        except Exception as e:
+            debug_log.info("Metrics collector failed: %r" , e)
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k , v in pairs) + "}"
+
+
+def render():
+    # OpenMetrics text exposition of everything collected so far
+    _collect()
+    lines = []
+
+    family = PREFIX + "stage_latency_seconds"
+    lines.append(f"# TYPE {family} histogram")
+    lines.append(f"# UNIT {family} seconds")
+    lines.append(f"# HELP {family} Time spent in one stage of the backend loop per call.")
+    for name , histogram in sorted(stages.items()):
+        with histogram._lock:
+            counts , total , count = list(histogram.counts) , histogram.sum , histogram.count
+        cumulative = 0
+        for bound , n in zip(histogram.buckets , counts):
+            cumulative += n
+            lines.append(f'{family}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{family}_bucket{{stage="{name}",le="+Inf"}} {count}')
+        lines.append(f'{family}_sum{{stage="{name}"}} {total}')
+        lines.append(f'{family}_count{{stage="{name}"}} {count}')
+
+    with _lock:
+        counter_items = sorted(counters.items())
+        gauge_items = sorted(gauges.items())
+
+    typed = set()
+    for (name , labels) , value in counter_items:
+        if name not in typed:
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            typed.add(name)
+        lines.append(f"{PREFIX}{name}_total{_labels(labels)} {value}")
+
+    for (name , labels) , value in gauge_items:
+        if name not in typed:
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            typed.add(name)
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path = METRICS_FILE):
+    # for node_exporter's textfile collector / anything that reads files, replaced atomically
+    tmp = f"{path}.tmp"
+    with open(tmp , "w") as f:
+        f.write(render())
+    os.replace(tmp , path)
+
+
+def status_summary():
+    # compact version for status.json: per stage p50 / p95 in ms from the buckets, counters by name
+    _collect()
+    summary = {"stages": {} , "counters": {}}
+    for name , histogram in sorted(stages.items()):
+        p50 , p95 = histogram.quantile(0.5) , histogram.quantile(0.95)
+        summary["stages"][name] = {
+            "count": histogram.count,
+            "p50_ms_le": None if p50 is None else round(p50 * 1000 , 3),
+            "p95_ms_le": None if p95 is None else round(p95 * 1000 , 3),
+        }
+    with _lock:
+        for (name , labels) , value in counters.items():
+            key = name + _labels(labels)
+            summary["counters"][key] = value
+    return summary
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type" , OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length" , str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self , format , *args):
+        pass  # one line per scrape would flood the debug log
+
+
+def start_server(address = METRICS_ADDRESS):
+    # GET http://127.0.0.1:9464/metrics, serves on a daemon thread. None if the port is taken
+    try:
+        server = ThreadingHTTPServer(address , _Handler)
+    except OSError as e:
+        debug_log.info("Metrics endpoint not started on %s: %r" , address , e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever , name="metrics" , daemon=True).start()
+    debug_log.info("Metrics endpoint on http://%s:%d/metrics" , *address)
+    return server
@@ -0,0 +1,255 @@
+import json
+import logging
+import math
+
+import cv2 as cv
+import numpy as np
+
+import log_config
+import detectors
+import timeline
+import face_prescence_module
+import landmark_module
+import head_pose_module
+import eye_gaze_module
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# MULTI-FACE TRACKING
+# -----------------------------
+# shared desks / meeting rooms: every BlazeFace box is matched to a person from the previous
+# frames by IoU, and every person gets their own hysteresis, calibration and attentive /
+# distracted / away accounting (the detector state is swapped in per person, like StreamTracker
+# does per camera).
+#
+# landmarks for all faces come from ONE FaceMesh call: the square face crops are resized to
+# TILE_SIZE tiles of a mosaic image, the mesh runs once on the mosaic (max_num_faces = MAX_PEOPLE)
+# and every face it finds is assigned to the tile it sits in and mapped back to the frame.
+# one BlazeFace pass, one mesh call and one set of conversions per frame however many people
+# there are, only the per-face landmark model inside the mesh grows with the head count.
+MAX_PEOPLE = 6
+MIN_IOU = 0.3                 # below this a box is a new person, not a moved one
+MAX_MISSING_SECONDS = 10.0    # a person that wasn't seen for this long is dropped (their time stays in the summary)
+CALIBRATE_AFTER = 2.0         # seconds after a person first shows up their calibration key is sent (once, when attentive)
+TILE_SIZE = 256               # FaceMesh's landmark model works at 192, a bit of margin around the face
+PEOPLE_SUMMARY_FILE = "people_summary.json"
+
+
+def iou(a , b):
+    # boxes as (x0, y0, x1, y1)
+    ix0 , iy0 = max(a[0] , b[0]) , max(a[1] , b[1])
+    ix1 , iy1 = min(a[2] , b[2]) , min(a[3] , b[3])
+    inter = max(0 , ix1 - ix0) * max(0 , iy1 - iy0)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def square_box(box , frame_width , frame_height):
+    # the tiles are square, grow the shorter side so the face isn't squashed (clipped at the frame edges)
+    x0 , y0 , x1 , y1 = box
+    side = max(x1 - x0 , y1 - y0)
+    cx , cy = (x0 + x1) // 2 , (y0 + y1) // 2
+    x0 , y0 = max(0 , cx - side // 2) , max(0 , cy - side // 2)
+    return (x0 , y0 , min(frame_width , x0 + side) , min(frame_height , y0 + side))
+
+
+class Person:
+    def __init__(self , person_id , box , now):
+        self.id = person_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.state = dict(detectors.INITIAL_STATE)
+        self.timeline = timeline.Timeline()
+        self.calibrated = False
+        self.labels = ("AWAY" , "NO_FACE" , "NOT_CALIBRATED")
+        self.final_state = "AWAY"
+
+    def summary(self):
+        totals = self.timeline.totals()
+        return {
+            "first_seen": self.first_seen.strftime("%Y-%m-%d %H:%M:%S"),
+            "last_seen": self.last_seen.strftime("%Y-%m-%d %H:%M:%S"),
+            "attentive_seconds": int(totals["ATTENTIVE"]),
+            "distracted_seconds": int(totals["DISTRACTED"]),
+            "away_seconds": int(totals["AWAY"]),
+            "focus_percent": round(self.timeline.focus_percent() , 2),
+            "calibrated": self.calibrated,
+        }
+
+
+class MultiFaceTracker:
+    '''
+    update(ctx, now, key) -> {person id: (presence, head pose, eye gaze, final state)}
+
+    Uses the module level detectors, so it can't run in the same process
+    as the single person path (maintwo picks one or the other).
+    '''
+
+    def __init__(self , max_people = MAX_PEOPLE , min_iou = MIN_IOU , max_missing = MAX_MISSING_SECONDS ,
+                 calibrate_after = CALIBRATE_AFTER):
+        self.max_people = max_people
+        self.min_iou = min_iou
+        self.max_missing = max_missing
+        self.calibrate_after = calibrate_after
+
+        # static image mode: the mosaic's layout changes whenever someone comes or goes, tracking
+        # faces from one mosaic to the next would follow the wrong tile
+        self.mesh = landmark_module.new_face_mesh(max_people , static_image_mode = True)
+        self.reset()
+
+    def reset(self):
+        # nobody seen yet (a new session), the mesh stays
+        self.people = {}
+        self.departed = []
+        self.next_id = 1
+
+    def associate(self , boxes , now):
+        # greedy IoU matching, best overlaps first. returns {person id: box} of the people seen this frame
+        pairs = sorted(((iou(person.box , box) , person_id , i)
+                        for person_id , person in self.people.items() for i , box in enumerate(boxes)) , reverse=True)
+
+        matched = {}
+        used = set()
+        for overlap , person_id , i in pairs:
+            if overlap < self.min_iou:
+                break
+            if person_id in matched or i in used:
+                continue
+            matched[person_id] = boxes[i]
+            used.add(i)
+
+        for i , box in enumerate(boxes):
+            if i in used or len(self.people) >= self.max_people:
+                continue
+            person = Person(self.next_id , box , now)
+            self.people[person.id] = person
+            matched[person.id] = box
+            debug_log.info("Person %d appeared at %s" , person.id , now)
+            self.next_id += 1
+
+        for person_id , box in matched.items():
+            self.people[person_id].box = box
+            self.people[person_id].last_seen = now
+        return matched
+
+    def batch_landmarks(self , ctx , matched):
+        # {person id: (N, 3) landmarks in frame coordinates} from one mesh call over a mosaic of the face crops
+        ids = sorted(matched)
+        if not ids:
+            return {}
+
+        cols = math.ceil(math.sqrt(len(ids)))
+        rows = math.ceil(len(ids) / cols)
+        mosaic = np.zeros((rows * TILE_SIZE , cols * TILE_SIZE , 3) , dtype=np.uint8)
+
+        tiles = {}
+        for slot , person_id in enumerate(ids):
+            box = square_box(matched[person_id] , ctx.width , ctx.height)
+            x0 , y0 , x1 , y1 = box
+            if x1 <= x0 or y1 <= y0:
+                continue
+            row , col = divmod(slot , cols)
+            # shrunk before the colour conversion, the full frame is never converted
+            mosaic[row * TILE_SIZE:(row + 1) * TILE_SIZE , col * TILE_SIZE:(col + 1) * TILE_SIZE] = cv.resize(
+                ctx.rgb_crop(box , TILE_SIZE) , (TILE_SIZE , TILE_SIZE) , interpolation=cv.INTER_AREA)
+            tiles[(row , col)] = (person_id , box)
+
+        result = self.mesh.process(mosaic)
+
+        landmarks = {}
+        for face in result.multi_face_landmarks or []:
+            face_landmarks = landmark_module.to_array(face.landmark)
+            col = int(face_landmarks[: , 0].mean() * cols)
+            row = int(face_landmarks[: , 1].mean() * rows)
+            tile = tiles.get((row , col))
+            if tile is None or tile[0] in landmarks:
+                continue
+
+            person_id , box = tile
+            # mosaic normalized -> tile (= crop) normalized -> frame normalized
+            face_landmarks[: , 0] = face_landmarks[: , 0] * cols - col
+            face_landmarks[: , 1] = face_landmarks[: , 1] * rows - row
+            face_landmarks[: , 2] *= cols
+            landmark_module.map_to_frame(face_landmarks , box , ctx.width , ctx.height)
+            landmarks[person_id] = face_landmarks
+        return landmarks
+
+    def update(self , ctx , now , key = 0):
+        detect_width = face_prescence_module.detect_width
+        result = face_prescence_module.load().detect(ctx.mp_image_at(detect_width))
+        boxes = [box for box in (face_prescence_module.padded_box(b , ctx.width , ctx.height)
+                                 for b in face_prescence_module.detection_boxes(result , ctx.scale_at(detect_width)))
+                 if box is not None]
+
+        matched = self.associate(boxes , now)
+        landmarks = self.batch_landmarks(ctx , matched)
+
+        results = {}
+        for person_id , person in sorted(self.people.items()):
+            detectors.restore(person.state)
+
+            presence_label = face_prescence_module.debounce(person_id in matched , now)
+            head_pose_label = "NO_FACE"
+            eye_gaze_label = "NOT_CALIBRATED"
+            if presence_label == "PRESENT":
+                face_landmarks = landmarks.get(person_id)
+
+                # C once per person, after calibrate_after, on the first frame the mesh has their face
+                # and their previous labels were PRESENT / ATTENTIVE (eye gaze only takes it then).
+                # a C pressed by hand goes to everyone
+                person_key = key
+                if (not person.calibrated and face_landmarks is not None
+                        and detectors.calibration_ready(person.labels)
+                        and (now - person.first_seen).total_seconds() >= self.calibrate_after):
+                    person_key = ord("c")
+
+                head_pose_label = head_pose_module.update(ctx , now , person_key , face_landmarks)
+                if "ATTENTIVE" in head_pose_label:
+                    eye_gaze_label = eye_gaze_module.update(ctx , person_key , now , face_landmarks)
+
+                if person_key and eye_gaze_label != "NOT_CALIBRATED":
+                    person.calibrated = True
+
+            person.state = detectors.snapshot()
+
+            final_state = detectors.final_state_for(presence_label , head_pose_label , eye_gaze_label)
+            person.labels = (presence_label , head_pose_label , eye_gaze_label)
+            person.final_state = final_state
+            person.timeline.add(now , presence_label , head_pose_label , eye_gaze_label , final_state)
+            results[person_id] = (presence_label , head_pose_label , eye_gaze_label , final_state)
+
+        for person_id , person in list(self.people.items()):
+            if (now - person.last_seen).total_seconds() > self.max_missing:
+                debug_log.info("Person %d left at %s" , person_id , person.last_seen)
+                self.departed.append(person)
+                del self.people[person_id]
+
+        return results
+
+    def primary(self):
+        # the biggest face in view (closest to the camera), None when nobody is there
+        present = [p for p in self.people.values() if p.labels[0] == "PRESENT"]
+        if not present:
+            return None
+        return max(present , key=lambda p: (p.box[2] - p.box[0]) * (p.box[3] - p.box[1]))
+
+    def marks(self):
+        import overlay
+        return overlay.Marks([(x0 , y0 , x1 - x0 , y1 - y0) for x0 , y0 , x1 , y1 in
+                              (p.box for p in self.people.values() if p.labels[0] == "PRESENT")] , None)
+
+    def summary(self):
+        people = self.departed + list(self.people.values())
+        return {str(person.id): person.summary() for person in sorted(people , key=lambda p: p.id)}
+
+    def write_summary(self , path = PEOPLE_SUMMARY_FILE):
+        summary = self.summary()
+        with open(path , "w") as f:
+            json.dump(summary , f , indent=2)
+        return summary
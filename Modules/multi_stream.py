@@ -0,0 +1,279 @@
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import time
+from datetime import datetime
+
+import log_config
+import frame_sources
+import session_accounting
+import telemetry
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# MULTI-STREAM BACKEND
+# -----------------------------
+# several cameras (or recordings) at once for shared rooms. the supervisor spreads the
+# streams over a pool of worker processes, one per core at most. inside a worker every
+# stream has its own capture thread (newest frame only), StreamTracker (detector state),
+# SessionAccounting and telemetry block, and the worker goes round robin over the streams
+# that have a new frame. per stream files end up in streams/<name>/, every worker logs to
+# microscope-<pid>.log (log_config.PER_PROCESS_FILES).
+STREAMS_DIR = "streams"
+STATUS_FILE = "streams_status.json"
+CALIBRATE_AFTER = 2.0    # seconds after a stream starts its calibration key is sent once a face looks at the screen (nobody is there to press C)
+STATUS_INTERVAL = 2.0    # how often workers report per stream numbers to the supervisor
+
+
+def stream_dir(name , streams_dir = STREAMS_DIR):
+    return os.path.join(streams_dir , name)
+
+
+def telemetry_name(name):
+    # dashboards open the block of one stream with telemetry.try_open_reader(telemetry_name(name))
+    return f"{telemetry.TELEMETRY_NAME}_{name}"
+
+
+class _Stream:
+    # worker side state of one stream
+
+    def __init__(self , name , spec , streams_dir , store_sessions , calibrate_after):
+        import capture_module
+        from stream_tracker import StreamTracker
+
+        self.name = name
+        self.calibrate_after = calibrate_after
+        self.capture = capture_module.LatestFrameCapture(frame_sources.open_source(spec , realtime=True)).start()
+        self.tracker = StreamTracker(name)
+
+        path = stream_dir(name , streams_dir)
+        os.makedirs(path , exist_ok=True)
+        self.accounting = session_accounting.SessionAccounting(
+            os.path.join(path , session_accounting.DASHBOARD_CSV) ,
+            os.path.join(path , session_accounting.SUMMARY_FILE) ,
+            os.path.join(path , "timeline.csv") ,
+            store_sessions=store_sessions ,
+            store_dir=os.path.join(path , "sessions")
+        )
+        self.telemetry = telemetry.TelemetryWriter(telemetry_name(name))
+
+        self.started_at = datetime.now()
+        self.accounting.start(self.started_at)
+        self.telemetry.publish(session_state="RUNNING")
+
+        self.calibrated = False
+        self.labels = ("AWAY" , "NO_FACE" , "NOT_CALIBRATED")
+        self.frames = 0
+        self.fps = 0.0
+        self.final_state = None
+
+    def process(self , captured):
+        import capture_module
+        import detectors
+        from frame_context import FrameContext
+
+        now = captured.wall_time
+        # C once, on the first frame after calibrate_after that follows one with a face looking
+        # at the screen (eye gaze can only take it then), same trigger as replay
+        key = 0
+        if (not self.calibrated and detectors.calibration_ready(self.labels)
+                and (now - self.started_at).total_seconds() >= self.calibrate_after):
+            key = ord("c")
+
+        labels = self.labels = self.tracker.update(FrameContext(captured.frame , now) , now , key)
+        if key and labels[2] != "NOT_CALIBRATED":
+            self.calibrated = True
+
+        final_state = detectors.final_state_for(*labels)
+        dt = self.accounting.add(now , *labels , final_state)
+        self.frames += 1
+        if dt > 0:
+            self.fps = 0.9 * self.fps + 0.1 * (1.0 / dt)
+
+        transition = {}
+        if final_state != self.final_state:
+            transition = {
+                "last_transition_ts": time.time(),
+                "last_transition_from": self.final_state or "",
+                "last_transition_to": final_state,
+            }
+            self.final_state = final_state
+
+        self.telemetry.publish(
+            final_state=final_state,
+            presence_label=labels[0],
+            head_pose_label=labels[1],
+            eye_gaze_label=labels[2],
+            attentive_seconds=self.accounting.attentive_seconds,
+            distracted_seconds=self.accounting.distracted_seconds,
+            away_seconds=self.accounting.away_seconds,
+            fps=self.fps,
+            latency_ms=capture_module.latency_ms(captured),
+            frames=self.capture.frames_captured,
+            dropped=self.capture.frames_dropped,
+            **transition
+        )
+
+    def status(self):
+        return {
+            "final_state": self.final_state,
+            "frames": self.frames,
+            "fps": round(self.fps , 1),
+            "captured": self.capture.frames_captured,
+            "dropped": self.capture.frames_dropped,
+            "calibrated": self.calibrated,
+            "attentive_seconds": round(self.accounting.attentive_seconds , 1),
+            "distracted_seconds": round(self.accounting.distracted_seconds , 1),
+            "away_seconds": round(self.accounting.away_seconds , 1),
+        }
+
+    def finish(self):
+        self.capture.stop()
+        self.accounting.close()
+        summary = self.accounting.write_summary(show=False)
+        self.telemetry.publish(session_state="DONE")
+        self.telemetry.close()
+        self.tracker.close()
+        return summary
+
+
+def _worker(streams , streams_dir , store_sessions , calibrate_after , stop_event , reports):
+    # one process, a few streams, all on this thread (StreamTracker swaps module state)
+    import inference_size
+    inference_size.apply()    # same model input sizes as the live backend
+
+    running = [_Stream(name , spec , streams_dir , store_sessions , calibrate_after) for name , spec in streams]
+    debug_log.info("Worker %d runs streams %s" , os.getpid() , [stream.name for stream in running])
+    last_report = time.monotonic()
+
+    try:
+        while running and not stop_event.is_set():
+            got_frame = False
+            for stream in list(running):
+                captured = stream.capture.read(timeout=0)
+                if captured is None:
+                    if stream.capture.failed:
+                        # camera lost / recording over, that stream's session ends here
+                        reports.put(("summary" , stream.name , stream.finish()))
+                        running.remove(stream)
+                    continue
+                got_frame = True
+                stream.process(captured)
+
+            if not got_frame:
+                time.sleep(0.002)
+
+            if time.monotonic() - last_report >= STATUS_INTERVAL:
+                last_report = time.monotonic()
+                for stream in running:
+                    reports.put(("status" , stream.name , stream.status()))
+    finally:
+        for stream in running:
+            reports.put(("summary" , stream.name , stream.finish()))
+
+
+class MultiStreamSupervisor:
+    '''
+    streams: {name: frame_sources spec}. start() spreads them round robin over
+    min(workers, len(streams)) spawn processes; poll() collects their status
+    reports (also written to status_path) and the summaries of ended streams;
+    stop() ends every session and waits for the summaries.
+    '''
+
+    def __init__(self , streams , workers = None , streams_dir = STREAMS_DIR , store_sessions = True ,
+                 calibrate_after = CALIBRATE_AFTER , status_path = STATUS_FILE):
+        self.streams = dict(streams)
+        self.workers = max(1 , min(workers or os.cpu_count() or 1 , len(self.streams)))
+        self.streams_dir = streams_dir
+        self.store_sessions = store_sessions
+        self.calibrate_after = calibrate_after
+        self.status_path = status_path
+
+        self.status = {}
+        self.summaries = {}
+        self.processes = []
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._reports = self._context.Queue()
+
+    def assignment(self):
+        # [[(name, spec), ...] per worker]
+        groups = [[] for _ in range(self.workers)]
+        for i , item in enumerate(self.streams.items()):
+            groups[i % self.workers].append(item)
+        return groups
+
+    def start(self):
+        for i , group in enumerate(self.assignment()):
+            process = self._context.Process(
+                target=_worker , name=f"streams-{i}" , daemon=True ,
+                args=(group , self.streams_dir , self.store_sessions , self.calibrate_after , self._stop , self._reports)
+            )
+            process.start()
+            self.processes.append(process)
+        debug_log.info("Started %d streams on %d workers" , len(self.streams) , len(self.processes))
+        return self
+
+    def poll(self , timeout = 0.5):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                kind , name , payload = self._reports.get(timeout=max(0.0 , deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if kind == "summary":
+                self.summaries[name] = payload
+                self.status.setdefault(name , {})["ended"] = True
+            else:
+                self.status[name] = payload
+
+        with open(self.status_path , "w") as f:
+            json.dump({"ts": time.time() , "streams": self.status} , f , indent=2)
+
+    def alive(self):
+        return any(process.is_alive() for process in self.processes) and len(self.summaries) < len(self.streams)
+
+    def stop(self , timeout = 10.0):
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        # keep draining while the workers shut down, a full queue would keep them from exiting
+        while len(self.summaries) < len(self.streams) and time.monotonic() < deadline:
+            self.poll(0.2)
+        for process in self.processes:
+            process.join(timeout=max(0.0 , deadline - time.monotonic()))
+        return self.summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track several cameras / recordings at once.")
+    parser.add_argument("streams" , nargs="+" , help="name=source, e.g. desk=0 door=1 room=clip.mp4")
+    parser.add_argument("--workers" , type=int , help="worker processes (default: one per core)")
+    parser.add_argument("--duration" , type=float , help="seconds to run (default: until Ctrl+C / all sources end)")
+    parser.add_argument("--no-store" , action="store_true" , help="don't write the Parquet session store")
+    args = parser.parse_args()
+
+    streams = {}
+    for item in args.streams:
+        name , _ , spec = item.partition("=")
+        streams[name] = spec if spec else name
+
+    supervisor = MultiStreamSupervisor(streams , args.workers , store_sessions=not args.no_store).start()
+    deadline = time.monotonic() + args.duration if args.duration else math.inf
+    try:
+        while supervisor.alive() and time.monotonic() < deadline:
+            supervisor.poll(1.0)
+    except KeyboardInterrupt:
+        pass
+
+    for name , summary in sorted(supervisor.stop().items()):
+        print(f"{name:<12} focus {summary['focus_percent']:>5.1f}%  total {session_accounting.format_time(summary['total_seconds'])}")
+
+
+if __name__ == "__main__":
+    main()
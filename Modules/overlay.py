@@ -0,0 +1,84 @@
+import time
+from collections import namedtuple
+
+import cv2 as cv
+
+
+# -----------------------------
+# OVERLAY RENDERER
+# -----------------------------
+# the detectors only return labels / numbers (detectors.marks() for the boxes and PnP points),
+# all drawing happens here, on a mirrored copy made only when a frame is actually shown.
+# headless backends never import a window or draw anything.
+RENDER_FPS = 15          # the window doesn't need every decision, 15 fps looks live enough
+WINDOW_NAME = "FocusOS V1"
+
+WHITE = (255 , 255 , 255)
+YELLOW = (0 , 255 , 255)
+GREEN = (0 , 255 , 0)
+RED = (0 , 0 , 255)
+
+# face_boxes: [(x, y, w, h), ...] of the presence detector, pose_points: (6, 2) pixels or None
+Marks = namedtuple("Marks" , ["face_boxes" , "pose_points"])
+NO_MARKS = Marks([] , None)
+
+
+def draw(frame , labels , seconds , marks = NO_MARKS , mirror = True):
+    '''
+    labels  (presence, head pose, eye gaze, final state)
+    seconds (attentive, distracted, away)
+    Returns the image to show, frame itself is never written to.
+    '''
+    presence_label , head_pose_label , eye_gaze_label , final_state = labels
+    att_seconds , dis_seconds , away_secs = seconds
+
+    width = frame.shape[1]
+    image = cv.flip(frame , 1) if mirror else frame.copy()
+
+    def x_of(x , w = 0):
+        return width - x - w if mirror else x
+
+    for x , y , w , h in marks.face_boxes:
+        x = x_of(x , w)
+        cv.rectangle(image , (x , y) , (x + w , y + h) , GREEN , 2)
+
+    if marks.pose_points is not None:
+        for x , y in marks.pose_points.astype(int):
+            cv.circle(image , (int(x_of(x)) , int(y)) , 2 , RED , -1)
+
+    cv.putText(image , f"Presence: {presence_label}" , (20 , 40) , cv.FONT_HERSHEY_SIMPLEX , 0.7 , WHITE , 2)
+    cv.putText(image , f"Head: {head_pose_label}" , (20 , 70) , cv.FONT_HERSHEY_SIMPLEX , 0.7 , WHITE , 2)
+    cv.putText(image , f"Eyes: {eye_gaze_label}" , (20 , 100) , cv.FONT_HERSHEY_SIMPLEX , 0.7 , WHITE , 2)
+    cv.putText(image , f"FINAL: {final_state}" , (20 , 140) , cv.FONT_HERSHEY_SIMPLEX , 0.9 , YELLOW , 2)
+    cv.putText(image , f"Attentive: {att_seconds:.1f}s" , (20 , 180) , cv.FONT_HERSHEY_SIMPLEX , 0.7 , WHITE , 2)
+    cv.putText(image , f"Distracted: {dis_seconds:.1f}s" , (20 , 210) , cv.FONT_HERSHEY_SIMPLEX , 0.7 , WHITE , 2)
+    cv.putText(image , f"Away: {away_secs:.1f}s" , (20 , 240) , cv.FONT_HERSHEY_SIMPLEX , 0.7 , WHITE , 2)
+    cv.putText(image , "Controlled by Streamlit (Start/Calibrate/End)" , (20 , 280) ,
+               cv.FONT_HERSHEY_SIMPLEX , 0.6 , YELLOW , 2)
+    return image
+
+
+class OverlayRenderer:
+    # throttles drawing to max_fps, due() is what the pipeline asks before handing a frame over
+
+    def __init__(self , max_fps = RENDER_FPS , window = WINDOW_NAME):
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.window = window
+        self.rendered = 0
+        self.skipped = 0
+        self._last = 0.0
+
+    def due(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        self.skipped += 1
+        return False
+
+    def show(self , image):
+        cv.imshow(self.window , image)
+        self.rendered += 1
+
+    def close(self):
+        cv.destroyAllWindows()
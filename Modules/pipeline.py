@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+
+
+# end-of-stream marker, every stage forwards it downstream and then exits
+STOP = object()
+
+
+class BoundedQueue:
+    '''
+    Fixed size queue between two pipeline stages.
+
+    drop_oldest = True  -> put() never blocks, a full queue throws away its
+                           oldest item (live frames, renders: only the newest matters)
+    drop_oldest = False -> put() blocks until the consumer makes room
+                           (decisions: every one of them has to be counted)
+
+    close() is called by the consumer when it exits: from then on put()
+    never blocks and drops the item (returns False), so a producer can't
+    hang on a full queue nobody reads any more.
+    '''
+
+    def __init__(self , name , maxsize , drop_oldest = False):
+        self.name = name
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.max_depth = 0
+        self.closed = False
+
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self , item):
+        # False when the item was thrown away because the consumer is gone
+        with self._cond:
+            if self.drop_oldest:
+                while len(self._items) >= self.maxsize:
+                    self._items.popleft()
+                    self.dropped += 1
+            else:
+                self._cond.wait_for(lambda: self.closed or len(self._items) < self.maxsize)
+
+            if self.closed:
+                self.dropped += 1
+                return False
+
+            self._items.append(item)
+            self.max_depth = max(self.max_depth , len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def get(self , timeout = None):
+        # returns None when nothing arrived within timeout
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0 , timeout=timeout):
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def depth(self):
+        with self._cond:
+            return len(self._items)
+
+
+class Stage:
+    '''
+    One worker thread of the pipeline.
+
+    A source stage (inbox = None) calls work() in a loop until stop() is called,
+    every other stage calls work(item) for each item it gets from its inbox.
+    Whatever work returns (if not None) goes to the outbox.
+    '''
+
+    def __init__(self , name , work , inbox = None , outbox = None):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.error = None
+
+        self._running = False
+        self._thread = None
+        self._started_at = None
+
+    def start(self):
+        self._running = True
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run , name=self.name , daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while self._running:
+                if self.inbox is not None:
+                    item = self.inbox.get(timeout=0.1)
+                    if item is None:
+                        continue
+                    if item is STOP:
+                        break
+
+                t0 = time.perf_counter()
+                out = self.work(item) if self.inbox is not None else self.work()
+                self.busy_seconds += time.perf_counter() - t0
+                self.processed += 1
+
+                if out is STOP:
+                    break
+                if out is not None and self.outbox is not None and not self.outbox.put(out):
+                    break   # the next stage is gone, nothing would ever read what this one makes
+        except Exception as e:
+            self.error = e
+        finally:
+            self._running = False
+            if self.inbox is not None:
+                self.inbox.close()
+            if self.outbox is not None:
+                self.outbox.put(STOP)
+
+    def stop(self):
+        # only needed for the source stage, the others stop when STOP reaches them
+        self._running = False
+
+    def join(self , timeout = None):
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "processed": self.processed,
+            "per_second": round(self.processed / elapsed , 1) if elapsed > 0 else 0.0,
+            "busy_ms": round(self.busy_seconds / self.processed * 1000 , 2) if self.processed else 0.0,
+        }
+
+
+def pipeline_stats(stages , queues):
+    return {
+        "stages": {stage.name: stage.stats() for stage in stages},
+        "queues": {
+            q.name: {"depth": q.depth(), "max_depth": q.max_depth, "dropped": q.dropped}
+            for q in queues
+        },
+    }
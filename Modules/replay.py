@@ -0,0 +1,114 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+import log_config
+import frame_sources
+import session_accounting
+import detectors
+import inference_size
+from frame_context import FrameContext
+
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# HEADLESS REPLAY
+# -----------------------------
+# pushes a recording through presence -> head pose -> eye gaze -> accounting as fast as the
+# CPU allows. the debounce / smoothing logic sees the recorded time of every frame (not the
+# wall clock), so a session replays to the same labels, dashboard.csv rows and summary.json
+# it would have produced live, only faster. every frame is processed, nothing is dropped.
+
+def replay(source , started_at = None , calibrate_at = 0.0 , accounting = None , realtime = False ,
+           show_summary = True):
+    '''
+    source       frame_sources spec (path, "synthetic:N", ...) or a FrameSource
+    started_at   datetime of the first frame (default: now), recorded times are added to it
+    calibrate_at seconds into the recording from which the calibration key is sent, on the
+                 first frame it can take effect (None = never, the same as a live
+                 session nobody calibrates)
+    accounting   session_accounting.SessionAccounting to write into (default: dashboard.csv / summary.json)
+    Returns (summary dict, stats dict).
+    '''
+    if not isinstance(source , (frame_sources.FrameSource , frame_sources.WebcamSource)):
+        source = frame_sources.open_source(source , realtime=realtime)
+    if started_at is None:
+        started_at = datetime.now()
+    if accounting is None:
+        accounting = session_accounting.SessionAccounting()
+
+    # same model input sizes as the live backend and batch
+    inference_size.apply()
+
+    accounting.start(started_at)
+    calibrated = calibrate_at is None
+    labels = ("AWAY" , "NO_FACE" , "NOT_CALIBRATED")
+    frames = 0
+    now = started_at
+    t0 = time.perf_counter()
+
+    try:
+        for frame , position_ms in source:
+            now = started_at + timedelta(milliseconds=position_ms) if position_ms is not None else datetime.now()
+
+            # C once, from calibrate_at on, on the first frame eye gaze will take it: a press while
+            # presence / head pose are still debouncing would be lost and leave the eyes uncalibrated
+            key = 0
+            if (not calibrated and detectors.calibration_ready(labels)
+                    and (now - started_at).total_seconds() >= calibrate_at):
+                key = ord("c")
+
+            ctx = FrameContext(frame , now)
+            labels = presence_label , head_pose_label , eye_gaze_label = detectors.run(ctx , now , key)
+            final_state = detectors.final_state_for(presence_label , head_pose_label , eye_gaze_label)
+            if key and eye_gaze_label != "NOT_CALIBRATED":
+                calibrated = True
+
+            accounting.add(now , presence_label , head_pose_label , eye_gaze_label , final_state)
+            frames += 1
+    finally:
+        source.release()
+        accounting.close(now)
+
+    elapsed = time.perf_counter() - t0
+    recorded = (now - started_at).total_seconds()
+    stats = {
+        "frames": frames,
+        "seconds": round(elapsed , 3),
+        "fps": round(frames / elapsed , 1) if elapsed > 0 else 0.0,
+        "recorded_seconds": round(recorded , 3),
+        "speedup": round(recorded / elapsed , 2) if elapsed > 0 else 0.0,
+    }
+    debug_log.info("Replayed %d frames in %.1fs (%.1f fps, %.1fx real time)" ,
+                   frames , elapsed , stats["fps"] , stats["speedup"])
+
+    return accounting.write_summary(show=show_summary) , stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recording through the FocusOS pipeline without a camera or window.")
+    parser.add_argument("source" , help="video file, image directory, .npy/.raw memmap or synthetic[:N]")
+    parser.add_argument("--start" , help="wall time of the first frame, YYYY-mm-dd HH:MM:SS (default: now)")
+    parser.add_argument("--calibrate-at" , type=float , default=0.0 ,
+                        help="seconds into the recording to calibrate at, negative = never (default 0)")
+    parser.add_argument("--csv" , default=session_accounting.DASHBOARD_CSV)
+    parser.add_argument("--summary" , default=session_accounting.SUMMARY_FILE)
+    parser.add_argument("--per-second-rows" , action="store_true" , help="also write the 1 row/sec dashboard.csv")
+    parser.add_argument("--no-store" , action="store_true" , help="don't write the Parquet session store")
+    parser.add_argument("--realtime" , action="store_true" , help="play at the recorded rate instead of flat out")
+    args = parser.parse_args()
+
+    started_at = datetime.strptime(args.start , "%Y-%m-%d %H:%M:%S") if args.start else None
+    accounting = session_accounting.SessionAccounting(args.csv , args.summary , store_sessions=not args.no_store ,
+                                                      per_second_rows=args.per_second_rows)
+
+    _ , stats = replay(args.source , started_at , None if args.calibrate_at < 0 else args.calibrate_at ,
+                       accounting , realtime=args.realtime)
+    print(f"{stats['frames']} frames in {stats['seconds']}s ({stats['fps']} fps, {stats['speedup']}x real time)")
+
+
+if __name__ == "__main__":
+    main()
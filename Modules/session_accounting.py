@@ -0,0 +1,217 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+import metrics
+import session_store
+import timeline
+
+
+DASHBOARD_CSV = "dashboard.csv"
+SUMMARY_FILE = "summary.json"
+
+CSV_COLUMNS = [
+    "timestamp",
+    "presence_label",
+    "head_pose_label",
+    "eye_gaze_label",
+    "final_state",
+    "attentive_seconds",
+    "distracted_seconds",
+    "away_seconds"
+]
+
+
+# the segment timeline (timeline.csv) is the record of a session. the old 1 row/sec dashboard.csv is
+# only written when asked for (per_second_rows = True). the Parquet session store gets its 1 row/sec
+# rows whenever store_sessions is on (and pyarrow is there), with or without the CSV
+PER_SECOND_ROWS = False
+
+
+def format_time(seconds: float) -> str:
+    seconds = int(seconds)
+    h = seconds // 3600
+    m = (seconds % 3600) // 60
+    s = seconds % 60
+    return f"{h}h {m}m {s}s"
+
+
+class SessionAccounting:
+    '''
+    Everything one session produces from its decisions: the attentive /
+    distracted / away counters, the state timeline, summary.json, the 1 row/sec
+    session store rows (store_sessions) and dashboard.csv rows (per_second_rows).
+
+    The live backend feeds it decisions with wall clock times, replay with
+    the recorded times of the frames, both end up with the same files.
+    '''
+
+    def __init__(self , csv_path = DASHBOARD_CSV , summary_path = SUMMARY_FILE ,
+                 timeline_path = timeline.TIMELINE_FILE , store_sessions = True ,
+                 store_dir = session_store.STORE_DIR , per_second_rows = PER_SECOND_ROWS):
+        self.csv_path = csv_path
+        self.per_second_rows = per_second_rows
+        self.summary_path = summary_path
+        self.timeline_path = timeline_path
+        self.store_sessions = store_sessions
+        self.store_dir = store_dir
+
+        self.session_start = None
+        self.session_end = None
+        self.session_id = None
+        self.store_path = None
+
+        self.attentive_seconds = 0.0
+        self.distracted_seconds = 0.0
+        self.away_seconds = 0.0
+        self.last_frame_time = None
+        self.last_csv_write_time = None
+        self.timeline = timeline.Timeline()
+
+        self._csv_file = None
+        self._csv_writer = None
+        self._store_writer = None
+
+    def start(self , started_at):
+        self.session_start = started_at
+        self.session_end = None
+
+        self.attentive_seconds = 0.0
+        self.distracted_seconds = 0.0
+        self.away_seconds = 0.0
+        self.last_frame_time = None
+        self.last_csv_write_time = None
+        self.timeline = timeline.Timeline()
+
+        self.session_id = session_store.new_session_id(started_at)
+        self.store_path = None
+
+        if self.store_sessions and session_store.available():
+            self._store_writer = session_store.SessionWriter(self.session_id , started_at , self.store_dir)
+            self.store_path = self._store_writer.path
+
+        if not self.per_second_rows:
+            return
+
+        csv_exists = os.path.exists(self.csv_path)
+        self._csv_file = open(self.csv_path , mode="a" , newline="")
+        self._csv_writer = csv.writer(self._csv_file)
+        if not csv_exists:
+            self._csv_writer.writerow(CSV_COLUMNS)
+
+    def add(self , now , presence_label , head_pose_label , eye_gaze_label , final_state):
+        # counts the time since the previous decision towards this one's state, returns that dt
+        if self.last_frame_time is None:
+            self.last_frame_time = now
+
+        dt = (now - self.last_frame_time).total_seconds()
+        self.last_frame_time = now
+
+        if final_state == "ATTENTIVE":
+            self.attentive_seconds += dt
+        elif final_state == "DISTRACTED":
+            self.distracted_seconds += dt
+        else:
+            self.away_seconds += dt
+
+        self.timeline.add(now , presence_label , head_pose_label , eye_gaze_label , final_state)
+
+        # -----------------------------
+        # CSV / SESSION STORE ROWS (1 row/sec)
+        # -----------------------------
+        if self._csv_writer is not None or self._store_writer is not None:
+            if self.last_csv_write_time is None:
+                self.last_csv_write_time = now
+
+            if (now - self.last_csv_write_time).total_seconds() >= 1.0:
+                with metrics.span("csv_write"):
+                    if self._csv_writer is not None:
+                        self._csv_writer.writerow([
+                            now.strftime("%Y-%m-%d %H:%M:%S"),
+                            presence_label,
+                            head_pose_label,
+                            eye_gaze_label,
+                            final_state,
+                            round(self.attentive_seconds , 2),
+                            round(self.distracted_seconds , 2),
+                            round(self.away_seconds , 2)
+                        ])
+                        self._csv_file.flush()
+                    self.last_csv_write_time = now
+
+                    if self._store_writer is not None:
+                        self._store_writer.add_row(
+                            now , presence_label , head_pose_label , eye_gaze_label ,
+                            final_state , self.attentive_seconds , self.distracted_seconds , self.away_seconds
+                        )
+
+        return dt
+
+    def close(self , ended_at = None):
+        if self.session_start is None:
+            self.session_start = ended_at or datetime.now()
+        if self.session_end is None:
+            self.session_end = ended_at or datetime.now()
+
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
+        if self._store_writer is not None:
+            self._store_writer.close()
+            self._store_writer = None
+
+        if self.timeline.segments:
+            self.timeline.save(self.session_id , self.timeline_path)
+
+    def summary(self):
+        # totals come from the segment timeline (O(transitions)), they match the frame counters
+        totals = self.timeline.totals()
+        attentive = totals["ATTENTIVE"]
+        distracted = totals["DISTRACTED"]
+        away = totals["AWAY"]
+        total_seconds = attentive + distracted + away
+
+        return {
+            "session_start": self.session_start.strftime("%Y-%m-%d %H:%M:%S") if self.session_start else "N/A",
+            "session_end": self.session_end.strftime("%Y-%m-%d %H:%M:%S") if self.session_end else "N/A",
+            "total_seconds": int(total_seconds),
+            "attentive_seconds": int(attentive),
+            "distracted_seconds": int(distracted),
+            "away_seconds": int(away),
+            "focus_percent": round(self.timeline.focus_percent() , 2),
+            "csv_path": self.csv_path if self.per_second_rows else None,
+            "session_id": self.session_id,
+            "store_path": self.store_path,
+            "timeline_path": self.timeline_path,
+            "timeline_segments": len(self.timeline.segments)
+        }
+
+    def write_summary(self , show = True):
+        summary = self.summary()
+
+        with open(self.summary_path , "w") as f:
+            json.dump(summary , f , indent=2)
+
+        if show:
+            print_summary(summary)
+        return summary
+
+
+def print_summary(summary):
+    print("\n========== FocusOS SESSION SUMMARY ==========")
+    print(f"Session Start : {summary['session_start']}")
+    print(f"Session End   : {summary['session_end']}")
+    print(f"Total Time    : {format_time(summary['total_seconds'])}")
+
+    print("\n--- Breakdown ---")
+    print(f"✅ Attentive   : {format_time(summary['attentive_seconds'])}")
+    print(f"❌ Distracted  : {format_time(summary['distracted_seconds'])}")
+    print(f"🚫 Away        : {format_time(summary['away_seconds'])}")
+
+    print("\n--- Score ---")
+    print(f"🎯 Focus %     : {summary['focus_percent']:.1f}%")
+
+    print(f"\nDashboard saved to: {summary['csv_path'] or summary['timeline_path']}")
+    print("============================================\n")
@@ -0,0 +1,193 @@
+import csv
+import glob
+import logging
+import os
+from datetime import datetime, timedelta
+
+import log_config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, the backend keeps writing dashboard.csv without it
+    pa = None
+    pq = None
+
+debug_log = log_config.setup_logger('microscope.log' , logging.INFO)
+
+
+# -----------------------------
+# COLUMNAR SESSION STORE
+# -----------------------------
+# sessions/date=YYYY-MM-DD/session=<session id>/part-00000.parquet, part-00001.parquet, ...
+# one directory per session, one per day above it, so loading a session or a date range only
+# opens the files it needs no matter how much history there is.
+STORE_DIR = "sessions"
+BATCH_ROWS = 300          # rows per part file (5 minutes at 1 row/sec)
+CSV_SESSION_GAP = 60      # seconds without rows that split dashboard.csv history into sessions on import
+
+LABEL_COLUMNS = ["presence_label" , "head_pose_label" , "eye_gaze_label" , "final_state"]
+SECONDS_COLUMNS = ["attentive_seconds" , "distracted_seconds" , "away_seconds"]
+COLUMNS = ["timestamp"] + LABEL_COLUMNS + SECONDS_COLUMNS
+
+
+def available():
+    return pa is not None
+
+
+def schema():
+    # labels are dictionary encoded, a handful of distinct strings stored as small ints
+    return pa.schema(
+        [pa.field("timestamp" , pa.timestamp("s"))]
+        + [pa.field(c , pa.dictionary(pa.int8() , pa.string())) for c in LABEL_COLUMNS]
+        + [pa.field(c , pa.float32()) for c in SECONDS_COLUMNS]
+    )
+
+
+def new_session_id(started_at):
+    return started_at.strftime("%Y%m%d-%H%M%S")
+
+
+def session_dir(session_id , day , store_dir = STORE_DIR):
+    return os.path.join(store_dir , f"date={day.strftime('%Y-%m-%d')}" , f"session={session_id}")
+
+
+class SessionWriter:
+    '''
+    Buffers the per-second rows of one session and writes them as Parquet part
+    files of BATCH_ROWS rows. Every part is a complete file, so a crashed
+    backend loses at most the rows of the unfinished batch.
+    '''
+
+    def __init__(self , session_id , started_at , store_dir = STORE_DIR , batch_rows = BATCH_ROWS):
+        self.session_id = session_id
+        self.path = session_dir(session_id , started_at , store_dir)
+        self.batch_rows = batch_rows
+        self.parts = len(glob.glob(os.path.join(self.path , "part-*.parquet")))
+        self._columns = {c: [] for c in COLUMNS}
+        os.makedirs(self.path , exist_ok=True)
+
+    def add_row(self , timestamp , presence_label , head_pose_label , eye_gaze_label , final_state ,
+                attentive_seconds , distracted_seconds , away_seconds):
+        values = (timestamp , presence_label , head_pose_label , eye_gaze_label , final_state ,
+                  attentive_seconds , distracted_seconds , away_seconds)
+        for column , value in zip(COLUMNS , values):
+            self._columns[column].append(value)
+
+        if len(self._columns["timestamp"]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._columns["timestamp"]:
+            return
+
+        table = pa.table(
+            {c: pa.array(self._columns[c] , type=pa.string()).dictionary_encode() if c in LABEL_COLUMNS else self._columns[c]
+             for c in COLUMNS}
+        ).cast(schema() , safe=False)  # safe=False: drop the sub-second part of the timestamps
+        pq.write_table(table , os.path.join(self.path , f"part-{self.parts:05d}.parquet") , compression="zstd")
+
+        self.parts += 1
+        self._columns = {c: [] for c in COLUMNS}
+
+    def close(self):
+        self.flush()
+
+
+def _read(files):
+    if not files:
+        return None
+    return pq.read_table(files , schema=schema()).to_pandas()
+
+
+def list_sessions(store_dir = STORE_DIR):
+    # [(date string, session id), ...] straight from the directory names, no file is opened
+    sessions = []
+    for path in sorted(glob.glob(os.path.join(store_dir , "date=*" , "session=*"))):
+        day = os.path.basename(os.path.dirname(path))[len("date="):]
+        sessions.append((day , os.path.basename(path)[len("session="):]))
+    return sessions
+
+
+def load_session(session_id , store_dir = STORE_DIR):
+    files = sorted(glob.glob(os.path.join(store_dir , "date=*" , f"session={session_id}" , "part-*.parquet")))
+    frame = _read(files)
+    if frame is not None:
+        frame["session_id"] = session_id
+    return frame
+
+
+def load_range(start_day , end_day , store_dir = STORE_DIR):
+    # every session that started between start_day and end_day (dates, inclusive)
+    frames = []
+    day = start_day
+    while day <= end_day:
+        day_dir = os.path.join(store_dir , f"date={day.strftime('%Y-%m-%d')}")
+        for path in sorted(glob.glob(os.path.join(day_dir , "session=*"))):
+            session_id = os.path.basename(path)[len("session="):]
+            frame = _read(sorted(glob.glob(os.path.join(path , "part-*.parquet"))))
+            if frame is not None:
+                frame["session_id"] = session_id
+                frames.append(frame)
+        day += timedelta(days=1)
+
+    if not frames:
+        return None
+    import pandas as pd
+    return pd.concat(frames , ignore_index=True)
+
+
+def import_csv(csv_path , store_dir = STORE_DIR , session_gap = CSV_SESSION_GAP):
+    '''
+    Moves existing dashboard.csv history into the store. The CSV has no session id,
+    so a gap of more than session_gap seconds between rows starts a new session.
+    Older rows without the *_seconds columns get them as empty values.
+    Sessions that are already in the store are skipped, so importing twice is harmless.
+    Returns the imported session ids.
+    '''
+    writer = None
+    skipping = False
+    last_ts = None
+    imported = []
+
+    with open(csv_path , newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                ts = datetime.strptime(row["timestamp"] , "%Y-%m-%d %H:%M:%S")
+            except (KeyError , TypeError , ValueError):
+                continue
+
+            if last_ts is None or (ts - last_ts).total_seconds() > session_gap:
+                if writer is not None:
+                    writer.close()
+                session_id = new_session_id(ts)
+                writer = SessionWriter(session_id , ts , store_dir)
+                skipping = writer.parts > 0
+                if not skipping:
+                    imported.append(session_id)
+            last_ts = ts
+
+            if skipping:
+                continue
+
+            seconds = []
+            for column in SECONDS_COLUMNS:
+                try:
+                    seconds.append(float(row.get(column)))
+                except (TypeError , ValueError):
+                    seconds.append(None)
+
+            writer.add_row(ts , *(row.get(column) for column in LABEL_COLUMNS) , *seconds)
+
+    if writer is not None:
+        writer.close()
+
+    debug_log.info("Imported %d sessions from %s into %s" , len(imported) , csv_path , store_dir)
+    return imported
+
+
+if __name__ == "__main__":
+    import sys
+    # python session_store.py dashboard.csv  -> import old CSV history
+    for session_id in import_csv(sys.argv[1] if len(sys.argv) > 1 else "dashboard.csv"):
+        print(session_id)
@@ -0,0 +1,39 @@
+import detectors
+import landmark_module
+from landmark_tracker import LandmarkTracker
+
+
+class StreamTracker:
+    '''
+    Detector state of one camera stream.
+
+    The detector modules keep their state in module globals (debounce,
+    calibration, eye_smooth, PnP warm start), which is one camera per
+    process. A StreamTracker owns a copy of that state plus the parts of
+    landmark_module that follow one face over time (the FaceMesh instance
+    and the optical flow tracker) and swaps them in around every frame, so
+    one process can run the unchanged update logic for several cameras.
+    BlazeFace (IMAGE mode) keeps nothing between calls and is shared.
+
+    Not thread safe: all trackers of a process have to run on one thread.
+    '''
+
+    def __init__(self , name):
+        self.name = name
+        self.state = dict(detectors.INITIAL_STATE)
+        self.face_mesh = landmark_module.new_face_mesh()
+        self.tracker = LandmarkTracker()
+
+    def update(self , ctx , now , key = 0):
+        # (presence, head pose, eye gaze) for this stream's frame
+        detectors.restore(self.state)
+        landmark_module.face_mesh = self.face_mesh
+        landmark_module.tracker = self.tracker
+
+        labels = detectors.run(ctx , now , key)
+
+        self.state = detectors.snapshot()
+        return labels
+
+    def close(self):
+        self.face_mesh.close()
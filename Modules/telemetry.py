@@ -0,0 +1,134 @@
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+# -----------------------------
+# LIVE TELEMETRY BLOCK
+# -----------------------------
+# fixed layout shared memory block the backend overwrites on every decision,
+# any number of dashboards can read it without touching the disk.
+#
+# seqlock: the writer bumps seq to an odd number, writes the body, bumps it to the next even number.
+# a reader copies the body between two reads of seq and only trusts it if both are the same even number.
+# that only holds for one writer at a time: the backend publishes from several threads (main loop,
+# inference, accounting), so the writer serializes them with a lock.
+TELEMETRY_NAME = "focusos_telemetry"
+
+SEQ_FORMAT = "<Q"
+BODY_FORMAT = (
+    "<"
+    "d"      # ts (time.time() of the update)
+    "16s"    # session state (IDLE / RUNNING / ...)
+    "16s"    # final state of the last frame
+    "16s"    # presence label
+    "16s"    # head pose label
+    "24s"    # eye gaze label
+    "d"      # attentive seconds
+    "d"      # distracted seconds
+    "d"      # away seconds
+    "d"      # decisions per second
+    "d"      # glass-to-decision latency ms
+    "d"      # inference stage ms per frame
+    "d"      # accounting stage ms per frame
+    "d"      # effective heavy inference rate
+    "Q"      # frames captured
+    "Q"      # frames dropped
+    "d"      # last transition ts
+    "16s"    # last transition from
+    "16s"    # last transition to
+)
+FIELDS = [
+    "ts", "session_state", "final_state", "presence_label", "head_pose_label", "eye_gaze_label",
+    "attentive_seconds", "distracted_seconds", "away_seconds", "fps", "latency_ms",
+    "inference_ms", "accounting_ms", "inference_rate", "frames", "dropped",
+    "last_transition_ts", "last_transition_from", "last_transition_to",
+]
+TEXT_FIELDS = {"session_state", "final_state", "presence_label", "head_pose_label", "eye_gaze_label",
+               "last_transition_from", "last_transition_to"}
+
+SEQ_SIZE = struct.calcsize(SEQ_FORMAT)
+BODY_SIZE = struct.calcsize(BODY_FORMAT)
+BLOCK_SIZE = SEQ_SIZE + BODY_SIZE
+
+
+class TelemetryWriter:
+    # backend side, exactly one per running backend, publish() is safe from any thread
+
+    def __init__(self , name = TELEMETRY_NAME):
+        try:
+            # left over from a backend that crashed
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+        except FileNotFoundError:
+            pass
+
+        self.shm = shared_memory.SharedMemory(name=name , create=True , size=BLOCK_SIZE)
+        self.seq = 0
+        self.values = {field: (b"" if field in TEXT_FIELDS else 0) for field in FIELDS}
+        self._lock = threading.Lock()
+        with self._lock:
+            self._write()
+
+    def publish(self , **values):
+        with self._lock:
+            for field , value in values.items():
+                self.values[field] = value.encode() if field in TEXT_FIELDS else value
+            self.values["ts"] = time.time()
+            self._write()
+
+    def _write(self):
+        # caller holds self._lock
+        body = struct.pack(BODY_FORMAT , *(self.values[field] for field in FIELDS))
+
+        self.seq += 1   # odd: write in progress
+        struct.pack_into(SEQ_FORMAT , self.shm.buf , 0 , self.seq)
+        self.shm.buf[SEQ_SIZE:BLOCK_SIZE] = body
+        self.seq += 1   # even: consistent again
+        struct.pack_into(SEQ_FORMAT , self.shm.buf , 0 , self.seq)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class TelemetryReader:
+    # dashboard side, cheap enough to read many times a second
+
+    def __init__(self , name = TELEMETRY_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        try:
+            # the reader doesn't own the block, keep python's resource tracker from unlinking it on exit
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name , "shared_memory")
+        except Exception:
+            pass
+
+    def read(self , retries = 100):
+        # consistent snapshot as a dict, None if the writer kept us out for too long
+        buf = self.shm.buf
+        for _ in range(retries):
+            seq_before = struct.unpack_from(SEQ_FORMAT , buf , 0)[0]
+            if seq_before % 2:
+                continue
+            body = bytes(buf[SEQ_SIZE:BLOCK_SIZE])
+            seq_after = struct.unpack_from(SEQ_FORMAT , buf , 0)[0]
+            if seq_before == seq_after:
+                values = dict(zip(FIELDS , struct.unpack(BODY_FORMAT , body)))
+                for field in TEXT_FIELDS:
+                    values[field] = values[field].rstrip(b"\0").decode(errors="replace")
+                values["seq"] = seq_before
+                return values
+        return None
+
+    def close(self):
+        self.shm.close()
+
+
+def try_open_reader(name = TELEMETRY_NAME):
+    # None while no backend is publishing
+    try:
+        return TelemetryReader(name)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,128 @@
+import bisect
+import csv
+import os
+from datetime import datetime
+
+# -----------------------------
+# RUN-LENGTH ENCODED STATE TIMELINE
+# -----------------------------
+# one segment per run of identical (presence, head pose, eye gaze, final) labels instead of one row per second.
+# totals, focus % and time range queries only walk the segments.
+TIMELINE_FILE = "timeline.csv"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class Segment:
+    __slots__ = ("start" , "end" , "presence_label" , "head_pose_label" , "eye_gaze_label" , "final_state")
+
+    def __init__(self , start , end , presence_label , head_pose_label , eye_gaze_label , final_state):
+        self.start = start
+        self.end = end
+        self.presence_label = presence_label
+        self.head_pose_label = head_pose_label
+        self.eye_gaze_label = eye_gaze_label
+        self.final_state = final_state
+
+    @property
+    def labels(self):
+        return (self.presence_label , self.head_pose_label , self.eye_gaze_label , self.final_state)
+
+    @property
+    def seconds(self):
+        return (self.end - self.start).total_seconds()
+
+
+class Timeline:
+    '''
+    add() is called once per decision. Like the frame counters in maintwo, the
+    time since the previous decision belongs to the state of the new one, so a
+    new segment starts at the previous decision's time and totals() matches
+    the attentive / distracted / away counters exactly.
+    '''
+
+    def __init__(self):
+        self.segments = []
+        self._last_ts = None
+        # segment starts / ends kept next to the segments for the binary searches
+        self._starts = []
+        self._ends = []
+
+    def add(self , ts , presence_label , head_pose_label , eye_gaze_label , final_state):
+        labels = (presence_label , head_pose_label , eye_gaze_label , final_state)
+
+        if self.segments and self.segments[-1].labels == labels:
+            self.segments[-1].end = ts
+            self._ends[-1] = ts
+        else:
+            start = self._last_ts if self._last_ts is not None else ts
+            self._append(Segment(start , ts , *labels))
+
+        self._last_ts = ts
+
+    def _append(self , segment):
+        self.segments.append(segment)
+        self._starts.append(segment.start)
+        self._ends.append(segment.end)
+
+    def totals(self , start = None , end = None):
+        # seconds per final state, optionally clipped to [start, end]
+        totals = {"ATTENTIVE": 0.0 , "DISTRACTED": 0.0 , "AWAY": 0.0}
+        for segment in self._segments_between(start , end):
+            seg_start = max(segment.start , start) if start is not None else segment.start
+            seg_end = min(segment.end , end) if end is not None else segment.end
+            if seg_end > seg_start:
+                totals[segment.final_state] = totals.get(segment.final_state , 0.0) + (seg_end - seg_start).total_seconds()
+        return totals
+
+    def focus_percent(self , start = None , end = None):
+        totals = self.totals(start , end)
+        total_seconds = sum(totals.values())
+        return (totals["ATTENTIVE"] / total_seconds * 100) if total_seconds > 0 else 0.0
+
+    def _segments_between(self , start , end):
+        # segments are sorted and don't overlap, binary search the first one that can touch start
+        first = 0
+        if start is not None:
+            first = bisect.bisect_left(self._ends , start)
+
+        for segment in self.segments[first:]:
+            if end is not None and segment.start >= end:
+                break
+            yield segment
+
+    def state_at(self , ts):
+        i = bisect.bisect_right(self._starts , ts) - 1
+        if i >= 0 and self.segments[i].start <= ts <= self.segments[i].end:
+            return self.segments[i].labels
+        return None
+
+    def save(self , session_id , path = TIMELINE_FILE):
+        # appends this session's segments, a few hundred rows for a full work day
+        exists = os.path.exists(path)
+        with open(path , "a" , newline="") as f:
+            writer = csv.writer(f)
+            if not exists:
+                writer.writerow(["session_id" , "start" , "end" , "presence_label" , "head_pose_label" ,
+                                 "eye_gaze_label" , "final_state"])
+            for segment in self.segments:
+                writer.writerow([session_id , segment.start.strftime(TIME_FORMAT) , segment.end.strftime(TIME_FORMAT) ,
+                                 *segment.labels])
+
+
+def load(session_id , path = TIMELINE_FILE):
+    timeline = Timeline()
+    if not os.path.exists(path):
+        return timeline
+
+    with open(path , newline="") as f:
+        for row in csv.DictReader(f):
+            if row["session_id"] != session_id:
+                continue
+            timeline._append(Segment(
+                datetime.strptime(row["start"] , TIME_FORMAT) , datetime.strptime(row["end"] , TIME_FORMAT) ,
+                row["presence_label"] , row["head_pose_label"] , row["eye_gaze_label"] , row["final_state"]
+            ))
+
+    if timeline.segments:
+        timeline._last_ts = timeline.segments[-1].end
+    return timeline
@@ -0,0 +1,115 @@
+'''
+Head pose solver benchmark: latency and angle stability of the solvePnP options
+in head_pose_module (iterative, iterative_warm, sqpnp, epnp).
+
+Recorded landmarks: an .npy file of landmark arrays saved from landmark_module.update()
+(shape (frames, 478, 3), normalized) taken at --width x --height.
+Without --landmarks a synthetic head motion is projected through the face model with
+pixel noise, then the angle error against the true pose is reported too.
+
+    python benchmarks/bench_head_pose.py [--landmarks rec.npy] [--frames 3000]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0 , os.path.join(os.path.dirname(os.path.abspath(__file__)) , ".." , "Modules"))
+
+import cv2 as cv
+import numpy as np
+
+import head_pose_module
+
+SOLVERS = ["iterative" , "iterative_warm" , "sqpnp" , "epnp"]
+
+
+def synthetic_image_points(frames , width , height , noise_px , seed = 0):
+    # slow yaw / pitch sweep with a bit of roll, like someone reading and glancing around
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / 30.0
+    pitch = 8 * np.sin(t * 0.7)
+    yaw = 25 * np.sin(t * 0.4)
+    roll = 3 * np.sin(t * 1.3)
+
+    camera_matrix = head_pose_module.camera_matrix_for(width , height)
+    tvec = np.array([[0.0] , [0.0] , [2500.0]])
+
+    points = []
+    truth = []
+    for p , y , r in zip(pitch , yaw , roll):
+        rmat = euler_to_rmat(p , y , r)
+        rvec , _ = cv.Rodrigues(rmat)
+        projected , _ = cv.projectPoints(head_pose_module.model_points , rvec , tvec , camera_matrix , head_pose_module.dist_coeffs)
+        projected = projected.reshape(-1 , 2) + rng.normal(0 , noise_px , (len(head_pose_module.model_points) , 2))
+        points.append(projected)
+        # ground truth angles go through the same RQ decomposition the module uses
+        truth.append(head_pose_module.angles_from_rvec(rvec)[:2])
+
+    return np.array(points , dtype=np.float64) , np.array(truth)
+
+
+def euler_to_rmat(pitch , yaw , roll):
+    p , y , r = np.radians([pitch , yaw , roll])
+    rx = np.array([[1 , 0 , 0] , [0 , np.cos(p) , -np.sin(p)] , [0 , np.sin(p) , np.cos(p)]])
+    ry = np.array([[np.cos(y) , 0 , np.sin(y)] , [0 , 1 , 0] , [-np.sin(y) , 0 , np.cos(y)]])
+    rz = np.array([[np.cos(r) , -np.sin(r) , 0] , [np.sin(r) , np.cos(r) , 0] , [0 , 0 , 1]])
+    return rz @ ry @ rx
+
+
+def recorded_image_points(path , width , height):
+    landmarks = np.load(path)
+    return (landmarks[: , head_pose_module.landmark_points , :2] * (width , height)).astype(np.float64)
+
+
+def run_solver(solver , image_points , width , height):
+    head_pose_module.last_rvec = None
+    head_pose_module.last_tvec = None
+
+    latencies = []
+    angles = []
+    for pts in image_points:
+        t0 = time.perf_counter()
+        success , rvec , tvec = head_pose_module.solve_pose(pts , width , height , solver)
+        latencies.append(time.perf_counter() - t0)
+        angles.append(head_pose_module.angles_from_rvec(rvec)[:2] if success else (np.nan , np.nan))
+
+    return np.array(latencies) * 1e6 , np.array(angles)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--landmarks" , help=".npy of landmark arrays (frames, 478, 3)")
+    parser.add_argument("--frames" , type=int , default=3000)
+    parser.add_argument("--width" , type=int , default=1280)
+    parser.add_argument("--height" , type=int , default=720)
+    parser.add_argument("--noise" , type=float , default=1.0 , help="pixel noise for the synthetic run")
+    args = parser.parse_args()
+
+    if args.landmarks:
+        image_points = recorded_image_points(args.landmarks , args.width , args.height)
+        truth = None
+    else:
+        image_points , truth = synthetic_image_points(args.frames , args.width , args.height , args.noise)
+
+    print(f"{len(image_points)} frames at {args.width}x{args.height}")
+    print(f"{'solver':<16}{'mean us':>10}{'p95 us':>10}{'jitter deg':>12}{'yaw err':>10}{'pitch err':>11}{'failed':>8}")
+
+    for solver in SOLVERS:
+        latencies , angles = run_solver(solver , image_points , args.width , args.height)
+        failed = int(np.isnan(angles[: , 0]).sum())
+
+        # frame to frame change of pitch / yaw, lower = steadier angles
+        jitter = np.nanmean(np.abs(np.diff(angles , axis=0)))
+
+        line = f"{solver:<16}{latencies.mean():>10.1f}{np.percentile(latencies , 95):>10.1f}{jitter:>12.3f}"
+        if truth is not None:
+            err = np.nanmean(np.abs(angles - truth) , axis=0)
+            line += f"{err[1]:>10.2f}{err[0]:>11.2f}"
+        else:
+            line += f"{'-':>10}{'-':>11}"
+        print(line + f"{failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
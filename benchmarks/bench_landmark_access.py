@@ -0,0 +1,126 @@
+'''
+Microbenchmark: per-point protobuf landmark access vs. one (N, 3) numpy array per frame.
+
+Runs the whole per-frame head pose + eye gaze computation both ways on a synthetic
+478 point face: iris centres, eye down scores with the calibration recompute,
+the PnP inputs, solvePnP and the angles. Both paths do the same work, the new one
+includes building the array from all 478 points, so the difference is the real
+per-frame saving. The array build is also timed on its own.
+
+    python benchmarks/bench_landmark_access.py [--frames 20000]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0 , os.path.join(os.path.dirname(os.path.abspath(__file__)) , ".." , "Modules"))
+
+import numpy as np
+
+import eye_gaze_module
+import head_pose_module
+import landmark_module
+
+WIDTH , HEIGHT = 1280 , 720
+
+
+def fake_face(seed = 0):
+    # same shape as result.multi_face_landmarks[0].landmark: 478 objects with .x .y .z
+    rng = random.Random(seed)
+    return [SimpleNamespace(x = rng.uniform(0.3 , 0.7) , y = rng.uniform(0.2 , 0.8) , z = rng.uniform(-0.1 , 0.1))
+            for _ in range(478)]
+
+
+# -----------------------------
+# OLD: per point python loops (what the modules did before)
+# -----------------------------
+def old_center_eye_avg(face , iris_points):
+    sum_y = 0
+    for i in iris_points:
+        sum_y += face[i].y
+    return sum_y / 4
+
+
+def old_calc_eye_down_score(face , height , top_eye , bottom_eye , centre_eye):
+    pt_top_eye = face[int(top_eye)]
+    pt_bottom_eye = face[int(bottom_eye)]
+    iris_offset = (centre_eye * height) - (pt_top_eye.y * height)
+    eye_height = (pt_bottom_eye.y * height) - (pt_top_eye.y * height)
+    if eye_height != 0:
+        return iris_offset / eye_height
+
+
+def old_frame(face , calibrate):
+    left = old_center_eye_avg(face , eye_gaze_module.iris_points_left_eye)
+    right = old_center_eye_avg(face , eye_gaze_module.iris_points_right_eye)
+    left_score = old_calc_eye_down_score(face , HEIGHT , 159 , 145 , left)
+    right_score = old_calc_eye_down_score(face , HEIGHT , 386 , 374 , right)
+    if calibrate:
+        # calibration computed both scores a second time
+        ref = (old_calc_eye_down_score(face , HEIGHT , 159 , 145 , left) + old_calc_eye_down_score(face , HEIGHT , 386 , 374 , right)) / 2
+
+    image_points = []
+    for i in head_pose_module.landmark_points:
+        pt_i = face[i]
+        image_points.append((int(pt_i.x * WIDTH) , int(pt_i.y * HEIGHT)))
+    return head_pose(np.array(image_points , dtype=np.float64)) , left_score , right_score
+
+
+# -----------------------------
+# NEW: one array per frame + fancy indexing (what the modules do now)
+# -----------------------------
+def new_frame(face , calibrate):
+    landmarks = landmark_module.to_array(face)
+    eye_gaze_module.landmarks = landmarks
+    eye_scores = eye_gaze_module.calc_eye_down_scores(eye_gaze_module.center_eye_avg())
+    if calibrate:
+        ref = float(eye_scores.mean())
+
+    image_points = (landmarks[head_pose_module.landmark_points , :2] * (WIDTH , HEIGHT)).astype(np.float64)
+    return head_pose(image_points) , eye_scores
+
+
+def head_pose(image_points):
+    # the same solver and angle math for both paths
+    success , rvec , _ = head_pose_module.solve_pose(image_points , WIDTH , HEIGHT)
+    return head_pose_module.angles_from_rvec(rvec) if success else None
+
+
+def to_array_only(face , calibrate):
+    return landmark_module.to_array(face)
+
+
+def bench(fn , faces , frames , calibrate_every = 30):
+    # PnP warm start from the previous frame, the same starting point for every run
+    head_pose_module.last_rvec = head_pose_module.last_tvec = None
+    start = time.perf_counter()
+    for n in range(frames):
+        fn(faces[n % len(faces)] , n % calibrate_every == 0)
+    return (time.perf_counter() - start) / frames * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames" , type=int , default=20000)
+    args = parser.parse_args()
+
+    faces = [fake_face(seed) for seed in range(16)]
+
+    # warm up both paths
+    bench(old_frame , faces , 1000)
+    bench(new_frame , faces , 1000)
+
+    old_us = bench(old_frame , faces , args.frames)
+    new_us = bench(new_frame , faces , args.frames)
+    array_us = bench(to_array_only , faces , args.frames)
+
+    print(f"per-point access : {old_us:8.2f} us/frame (head pose + eye gaze)")
+    print(f"numpy array      : {new_us:8.2f} us/frame (head pose + eye gaze, {array_us:.2f} of it building the array)")
+    print(f"saving           : {old_us - new_us:8.2f} us/frame ({(1 - new_us / old_us) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
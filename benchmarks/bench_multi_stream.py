@@ -0,0 +1,91 @@
+'''
+Scaling benchmark of the multi-stream backend: the same fixture as 1, 2, 4 ...
+streams at once, each played at its recorded rate like a camera.
+
+For every stream count the supervisor runs for --seconds, and the frames every
+stream processed between its first and its last status report (model loading
+and capture start-up left out) give its processed fps. Prints per stream count
+the total and per stream fps, the share of the captured frames that were dropped
+(newest frame only, so dropped = the workers couldn't keep up) and the worker
+count. The synthetic frames have no face, only BlazeFace runs on them; use a
+recorded clip with a face for numbers that include the mesh.
+
+    python benchmarks/bench_multi_stream.py [--source clip.mp4] [--streams 1,2,4,8] [--seconds 20] [--workers N]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0 , os.path.join(os.path.dirname(os.path.abspath(__file__)) , ".." , "Modules"))
+
+import multi_stream
+
+
+def run(source_spec , count , seconds , workers , out_dir):
+    streams = {f"bench{count}_{i}": source_spec for i in range(count)}
+    supervisor = multi_stream.MultiStreamSupervisor(streams , workers ,
+                                                    streams_dir=os.path.join(out_dir , multi_stream.STREAMS_DIR) ,
+                                                    store_sessions=False ,
+                                                    status_path=os.path.join(out_dir , multi_stream.STATUS_FILE)).start()
+
+    # {name: ((time, first report), (time, last report))}, a report is multi_stream._Stream.status()
+    reports = {}
+    deadline = time.monotonic() + seconds
+    try:
+        while supervisor.alive() and time.monotonic() < deadline:
+            supervisor.poll(0.5)
+            for name , status in supervisor.status.items():
+                if "frames" not in status:
+                    continue
+                first , last = reports.get(name , (None , None))
+                if last is not None and last[1] is status:
+                    continue
+                seen = (time.monotonic() , status)
+                reports[name] = (first or seen , seen)
+    finally:
+        supervisor.stop()
+
+    fps = []
+    captured = dropped = 0
+    for (t0 , first) , (t1 , last) in reports.values():
+        if t1 > t0:
+            fps.append((last["frames"] - first["frames"]) / (t1 - t0))
+        captured += last["captured"] - first["captured"]
+        dropped += last["dropped"] - first["dropped"]
+
+    return {
+        "streams": count,
+        "workers": supervisor.workers,
+        "measured": len(fps),
+        "total_fps": sum(fps),
+        "stream_fps": sum(fps) / len(fps) if fps else 0.0,
+        "dropped": dropped / captured if captured else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source" , default="synthetic:100000" , help="frame_sources spec every stream plays")
+    parser.add_argument("--streams" , default="1,2,4,8" , help="stream counts to run, comma separated")
+    parser.add_argument("--seconds" , type=float , default=20.0 ,
+                        help="run time per stream count (a few status intervals at least)")
+    parser.add_argument("--workers" , type=int , help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    # the status file and the per stream folders go to a scratch folder, not the repo
+    out_dir = tempfile.mkdtemp(prefix="bench_multi_stream_")
+
+    print(f"{args.source}, {args.seconds:.0f}s per run, {os.cpu_count()} cpus")
+    print(f"{'streams':>8}{'workers':>9}{'total fps':>11}{'fps/stream':>12}{'dropped':>9}")
+    for count in (int(n) for n in args.streams.split(",")):
+        r = run(args.source , count , args.seconds , args.workers , out_dir)
+        if r["measured"] < count:
+            print(f"{count:>8}  only {r['measured']} streams reported twice, run longer (--seconds)")
+            continue
+        print(f"{r['streams']:>8}{r['workers']:>9}{r['total_fps']:>11.1f}{r['stream_fps']:>12.1f}{r['dropped']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+'''
+Per-stage latency benchmark of the backend, no camera needed.
+
+Every frame of the fixture goes through each stage on its own, timed separately:
+colour conversion, BlazeFace detect, FaceMesh process (full frame tracking mesh
+and the static crop mesh on the BlazeFace box), landmark extraction,
+solvePnP + RQDecomp, the eye score math, accounting and the overlay render,
+plus the whole detector chain end to end. Prints p50 / p95 / p99 (microseconds)
+and frames per second per stage and saves everything as JSON, so two commits
+can be compared with --compare.
+
+Fixtures: anything frame_sources.open_source takes (video file, image directory,
+.npy memmap, synthetic[:N]), with a face in it: without one the mesh, landmark,
+head pose and eye stages never run on real data and the numbers mean nothing, so
+the run stops with an error. The default is the checked in benchmarks/fixtures/face
+clip, a fixture shorter than --frames is played again from the start. synthetic[:N]
+frames have no face; --no-face runs them anyway, the geometry stages then use
+synthetic landmarks.
+
+    python benchmarks/bench_stages.py [--source clip.mp4] [--frames 300] [--json out.json] [--compare old.json]
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0 , os.path.join(os.path.dirname(os.path.abspath(__file__)) , ".." , "Modules"))
+
+import cv2 as cv
+import numpy as np
+
+import frame_sources
+from frame_context import FrameContext
+
+import face_prescence_module
+import landmark_module
+import head_pose_module
+import eye_gaze_module
+import detectors
+import session_accounting
+import overlay
+
+from bench_head_pose import synthetic_image_points
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)) , "results")
+FACE_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)) , "fixtures" , "face")
+STAGES = ["color" , "blazeface" , "facemesh" , "facemesh_crop" , "landmarks" , "pnp" , "eye_math" , "accounting" , "overlay" , "pipeline"]
+
+# a stage this much slower (p50) than in the --compare file is flagged
+REGRESSION_RATIO = 1.10
+
+
+def synthetic_landmarks(frames , seed = 0):
+    # eye geometry only cares about the shapes, not where the points are
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(0.3 , 0.7 , (frames , 478 , 3)).astype(np.float32)
+    landmarks[: , eye_gaze_module.eyelid_top_points , 1] = 0.40
+    landmarks[: , eye_gaze_module.eyelid_bottom_points , 1] = 0.44
+    return landmarks
+
+
+def summarize(samples_us):
+    samples = np.asarray(samples_us)
+    if len(samples) == 0:
+        return None
+    return {
+        "n": int(len(samples)),
+        "mean_us": float(samples.mean()),
+        "p50_us": float(np.percentile(samples , 50)),
+        "p95_us": float(np.percentile(samples , 95)),
+        "p99_us": float(np.percentile(samples , 99)),
+        "fps": float(1e6 / samples.mean()) if samples.mean() > 0 else 0.0,
+    }
+
+
+def looped(source_spec , count):
+    # (frame, position_ms) for count frames, the source is opened again whenever it runs out
+    # (recorded times keep increasing across the loops)
+    offset_ms = 0.0
+    while count > 0:
+        source = frame_sources.open_source(source_spec)
+        last_ms = None
+        try:
+            for frame , position_ms in source:
+                if count <= 0:
+                    return
+                last_ms = position_ms if position_ms is not None else (last_ms or 0.0) + 1000.0 / source.fps
+                yield frame , offset_ms + last_ms
+                count -= 1
+        finally:
+            source.release()
+        if last_ms is None:
+            return   # empty source
+        offset_ms += last_ms + 1000.0 / source.fps
+
+
+def run(source_spec , frames , warmup , allow_no_face = False):
+    samples = {stage: [] for stage in STAGES}
+    width = height = None
+    mesh_landmarks = []
+
+    workdir = tempfile.mkdtemp(prefix="bench_stages_")
+    accounting = session_accounting.SessionAccounting(os.path.join(workdir , "dashboard.csv") ,
+                                                      os.path.join(workdir , "summary.json") ,
+                                                      os.path.join(workdir , "timeline.csv") , store_sessions=False)
+    started_at = datetime(2026 , 1 , 1)
+    accounting.start(started_at)
+    detectors.load()
+
+    def timed(stage , fn , *args):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        if index >= warmup:
+            samples[stage].append((time.perf_counter() - t0) * 1e6)
+        return out
+
+    for index , (frame , position_ms) in enumerate(looped(source_spec , frames + warmup)):
+        height , width = frame.shape[:2]
+        now = started_at + timedelta(milliseconds=position_ms)
+
+        ctx = FrameContext(frame , now)
+        # the model inputs at the configured inference sizes, not the camera's
+        mp_image = timed("color" , lambda: ctx.mp_image_at(face_prescence_module.detect_width))
+        detection = timed("blazeface" , face_prescence_module.detector.detect , mp_image)
+        # the two mesh paths: tracking mesh on the whole frame (its face detector only runs on track loss)
+        # vs the static crop mesh on the BlazeFace box (detector on every call, but on a small crop)
+        result = timed("facemesh" , landmark_module.face_mesh.process , ctx.rgb_at(landmark_module.mesh_width))
+        boxes = [box for box in (face_prescence_module.padded_box(b , ctx.width , ctx.height) for b in
+                                 face_prescence_module.detection_boxes(detection , ctx.scale_at(face_prescence_module.detect_width)))
+                 if box is not None]
+        if boxes:
+            timed("facemesh_crop" , lambda: landmark_module.crop_mesh.process(ctx.rgb_crop(boxes[0] , landmark_module.mesh_crop_size)))
+        if result.multi_face_landmarks:
+            lm = timed("landmarks" , landmark_module.to_array , result.multi_face_landmarks[0].landmark)
+            mesh_landmarks.append(lm)
+
+        # end to end on a fresh context, the same work the inference stage does per frame
+        ctx = FrameContext(frame , now)
+        labels = timed("pipeline" , detectors.run , ctx , now)
+        final_state = detectors.final_state_for(*labels)
+        timed("accounting" , accounting.add , now , *labels , final_state)
+        timed("overlay" , overlay.draw , frame , (*labels , final_state) ,
+              (accounting.attentive_seconds , accounting.distracted_seconds , accounting.away_seconds) ,
+              detectors.marks())
+
+    accounting.close()
+
+    if not mesh_landmarks and not allow_no_face:
+        raise SystemExit(f"No face found by the mesh in {source_spec}, the landmark stages weren't measured. "
+                         f"Use a fixture with a face (or --no-face to time the face-less path anyway).")
+
+    # geometry stages: on the mesh output if the fixture had a face, synthetic otherwise
+    landmarks = np.array(mesh_landmarks) if mesh_landmarks else synthetic_landmarks(frames)
+    if mesh_landmarks:
+        # C order: the fancy index comes out strided and solvePnP rejects non contiguous point rows
+        image_points = np.ascontiguousarray(landmarks[: , head_pose_module.landmark_points , :2] * (width , height) ,
+                                            dtype=np.float64)
+    else:
+        image_points , _ = synthetic_image_points(frames , width , height , 1.0)
+
+    head_pose_module.last_rvec = head_pose_module.last_tvec = None
+    for pts in image_points:
+        t0 = time.perf_counter()
+        success , rvec , _ = head_pose_module.solve_pose(pts , width , height)
+        if success:
+            head_pose_module.angles_from_rvec(rvec)
+        samples["pnp"].append((time.perf_counter() - t0) * 1e6)
+
+    for lm in landmarks:
+        t0 = time.perf_counter()
+        eye_gaze_module.landmarks = lm
+        eye_gaze_module.calc_eye_down_scores(eye_gaze_module.center_eye_avg())
+        samples["eye_math"].append((time.perf_counter() - t0) * 1e6)
+
+    meta = {
+        "source": str(source_spec),
+        "resolution": [width , height],
+        "frames": frames,
+        "mesh_faces": len(mesh_landmarks),
+        "landmarks": "mesh" if mesh_landmarks else "synthetic",
+        "detect_width": face_prescence_module.detect_width,
+        "mesh_width": landmark_module.mesh_width,
+        "mesh_crop_size": landmark_module.mesh_crop_size,
+    }
+    return {stage: summarize(values) for stage , values in samples.items()} , meta
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git" , "rev-parse" , "--short" , "HEAD"] , capture_output=True , text=True ,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "opencv": cv.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_table(stages , baseline = None):
+    header = f"{'stage':<12}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'fps':>10}"
+    print(header + (f"{'vs base':>10}" if baseline else ""))
+    for stage in STAGES:
+        s = stages.get(stage)
+        if s is None:
+            print(f"{stage:<12}{'-':>10}{'-':>10}{'-':>10}{'-':>10}")
+            continue
+        line = f"{stage:<12}{s['p50_us']:>10.1f}{s['p95_us']:>10.1f}{s['p99_us']:>10.1f}{s['fps']:>10.0f}"
+        old = (baseline or {}).get(stage)
+        if old:
+            ratio = s["p50_us"] / old["p50_us"]
+            line += f"{ratio:>9.2f}x" + ("  REGRESSION" if ratio > REGRESSION_RATIO else "")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source" , default=FACE_FIXTURE , help="frame_sources spec of the fixture, with a face in it")
+    parser.add_argument("--no-face" , action="store_true" ,
+                        help="don't stop when the fixture has no face (synthetic landmarks for the geometry stages)")
+    parser.add_argument("--frames" , type=int , default=300 , help="timed frames")
+    parser.add_argument("--warmup" , type=int , default=10 , help="untimed frames first (model init, caches)")
+    parser.add_argument("--json" , help="where to save the results (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare" , help="results JSON of an earlier run to compare p50s against")
+    args = parser.parse_args()
+
+    stages , meta = run(args.source , args.frames , args.warmup , args.no_face)
+    report = {"environment": environment() , "fixture": meta , "stages": stages}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["stages"]
+
+    print(f"{meta['frames']} frames of {meta['source']} at {meta['resolution'][0]}x{meta['resolution'][1]}, "
+          f"{meta['landmarks']} landmarks")
+    print_table(stages , baseline)
+
+    path = args.json
+    if path is None:
+        os.makedirs(RESULTS_DIR , exist_ok=True)
+        path = os.path.join(RESULTS_DIR , f"{report['environment']['commit'] or 'latest'}.json")
+    with open(path , "w") as f:
+        json.dump(report , f , indent=2)
+    print(f"\nsaved to {path}")
+
+
+if __name__ == "__main__":
+    main()
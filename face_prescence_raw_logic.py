@@ -88,8 +88,8 @@ while True:
                 if elapsed >= threshold:
                     current_state = candidate_state
                     log_label = "PRESENT" if current_state else "AWAY"
-                    debug_log.info(f"Person's state changed to {log_label} at time {now}")
-                    stats_log.info(f"Person's state changed to {log_label} at time {now}")
+                    debug_log.info("Person's state changed to %s at time %s" , log_label , now)
+                    stats_log.info("Person's state changed to %s at time %s" , log_label , now)
                     
                     candidate_state = None
                     candidate_since = None
@@ -1,6 +1,7 @@
 import cv2
 import mediapipe as mp
 import time
+import sys
 
 MODEL_PATH = "models/face_landmarker.task"
 
@@ -62,7 +63,8 @@ def draw_important_points(frame_bgr, face_landmarks, color=(0, 255, 0)):
 prev_time = time.time()
 fps = 0.0
 
-cap = cv2.VideoCapture(0)
+# python mesh_draw.py [video file], webcam without an argument
+cap = cv2.VideoCapture(sys.argv[1] if len(sys.argv) > 1 else 0)
 
 while True:
     ok, frame = cap.read()
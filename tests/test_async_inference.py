@@ -0,0 +1,50 @@
+from async_inference import AsyncResults
+
+
+def test_latest_result_and_frame_info():
+    results = AsyncResults("test")
+    results.submit(10 , "frame 10")
+    results.on_result("r10" , None , 10)
+    assert results.latest() == ("r10" , "frame 10" , 10)
+    assert results.completed == 1
+
+
+def test_older_pending_frames_are_skipped():
+    results = AsyncResults("test")
+    for ts in (1 , 2 , 3):
+        results.submit(ts , ts)
+    results.on_result("r3" , None , 3)
+    assert results.skipped == 2
+    assert results.latest()[2] == 3
+
+
+def test_result_older_than_the_latest_is_late():
+    results = AsyncResults("test")
+    results.submit(1 , 1)
+    results.submit(2 , 2)
+    results.on_result("r2" , None , 2)
+    results.on_result("r1" , None , 1)   # its frame was dropped as skipped by r2
+    assert results.late == 1
+    assert results.latest()[0] == "r2"
+
+
+def test_evicted_frames_are_not_published():
+    results = AsyncResults("test" , max_pending = 2)
+    for ts in (1 , 2 , 3):
+        results.submit(ts , ts)
+    assert results.skipped == 1
+
+    results.on_result("r1" , None , 1)
+    assert results.late == 1
+    assert results.latest() == (None , None , -1)
+
+
+def test_reset_forgets_the_session_but_keeps_timestamps_increasing():
+    results = AsyncResults("test")
+    first = results.next_timestamp_ms(5.0)
+    results.submit(first , "old")
+    results.reset()
+
+    results.on_result("old" , None , first)
+    assert results.latest() == (None , None , -1)
+    assert results.next_timestamp_ms(1.0) > first
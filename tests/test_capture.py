@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("cv2")
+
+import capture_module
+
+
+class CountingSource:
+    # read() -> (ok, frame) like cv.VideoCapture, counts how often it was asked
+    def __init__(self):
+        self.reads = 0
+        self.resyncs = 0
+        self.lock = threading.Lock()
+
+    def read(self):
+        with self.lock:
+            self.reads += 1
+            return True , self.reads
+
+    def resync(self):
+        self.resyncs += 1
+
+    def release(self):
+        pass
+
+
+def test_paused_capture_grabs_nothing():
+    source = CountingSource()
+    camera = capture_module.LatestFrameCapture(source).start(paused=True)
+    try:
+        assert camera.read(timeout=0.2) is None
+        assert source.reads == 0
+        assert not camera.failed
+    finally:
+        camera.stop()
+
+
+def test_resume_counts_from_zero():
+    source = CountingSource()
+    camera = capture_module.LatestFrameCapture(source).start()
+    try:
+        assert camera.read() is not None
+        camera.pause()
+        time.sleep(0.1)
+        reads_before = source.reads
+        assert camera.frames_captured > 0
+
+        camera.resume()
+        frame = camera.read()
+        assert frame is not None and frame.frame > reads_before
+        # only what came after the resume is counted
+        assert camera.frames_captured <= source.reads - reads_before
+        assert source.resyncs == 1
+    finally:
+        camera.stop()
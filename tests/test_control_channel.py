@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+import control_channel
+
+
+AUTHKEY = b"test-key"
+
+
+@pytest.fixture
+def server():
+    server = control_channel.ControlServer(("127.0.0.1" , 0) , authkey=AUTHKEY).start()
+    server.address = server._listener.address
+    yield server
+    server.stop()
+
+
+def answer(server , handled):
+    # a stand-in for maintwo's main loop: acks every command it polls
+    def loop():
+        while True:
+            command = server.poll(timeout=0.05)
+            if command is None:
+                continue
+            if command.command == "QUIT":
+                server.ack(command , "DONE")
+                return
+            handled.append(command.command)
+            server.ack(command , "RUNNING" , command.command)
+    thread = threading.Thread(target=loop , daemon=True)
+    thread.start()
+    return thread
+
+
+def send(server , command , seq , client = "tab"):
+    return control_channel.send_command(command , client , seq , address=server.address , authkey=AUTHKEY)
+
+
+def test_retried_seq_is_not_run_twice(server):
+    handled = []
+    answer(server , handled)
+
+    first = send(server , "START_SESSION" , 1)
+    again = send(server , "START_SESSION" , 1)
+    send(server , "QUIT" , 2)
+
+    assert first["ok"] and first["message"] == "START_SESSION"
+    assert again == first
+    assert handled == ["START_SESSION"]
+
+
+def test_new_seq_runs_again_and_old_one_is_stale(server):
+    handled = []
+    answer(server , handled)
+
+    send(server , "CALIBRATE" , 1)
+    send(server , "CALIBRATE" , 2)
+    stale = send(server , "CALIBRATE" , 1)
+    send(server , "QUIT" , 3)
+
+    assert handled == ["CALIBRATE" , "CALIBRATE"]
+    assert stale["ok"] is False
+
+
+def test_clients_have_their_own_seqs(server):
+    handled = []
+    answer(server , handled)
+
+    send(server , "PING" , 1 , client="a")
+    send(server , "PING" , 1 , client="b")
+    send(server , "QUIT" , 2 , client="a")
+
+    assert handled == ["PING" , "PING"]
+
+
+def test_wrong_key_is_refused(server):
+    reply = control_channel.send_command("PING" , "tab" , 1 , address=server.address , authkey=b"guess")
+    assert reply["ok"] is False
+    assert server.poll() is None
+
+
+def test_malformed_message_gets_an_error_and_the_connection_survives(server):
+    from multiprocessing.connection import Client
+
+    with Client(server.address , authkey=AUTHKEY) as conn:
+        conn.send(["not" , "a" , "dict"])
+        assert conn.recv()["ok"] is False
+        conn.send({"client": "tab" , "seq": "1" , "command": "PING"})
+        assert conn.recv()["ok"] is False
+
+
+def test_unanswered_command_is_cancelled(server , monkeypatch):
+    monkeypatch.setattr(control_channel , "ACK_TIMEOUT" , 0.1)
+    reply = send(server , "START_SESSION" , 1)
+    assert reply["ok"] is False
+    # the main loop comes back later, the command must not run behind the client's back
+    assert server.poll() is None
+
+
+def test_slow_command_is_pending_then_answered(server , monkeypatch):
+    monkeypatch.setattr(control_channel , "ACK_TIMEOUT" , 0.2)
+    taken = []
+
+    def slow_loop():
+        command = server.poll(timeout=1.0)
+        taken.append(command)
+
+    thread = threading.Thread(target=slow_loop , daemon=True)
+    thread.start()
+    reply = send(server , "START_SESSION" , 1)
+    thread.join(1.0)
+    assert reply["ok"] and reply["pending"]
+
+    server.ack(taken[0] , "RUNNING" , "Session started")
+    assert send(server , "START_SESSION" , 1)["message"] == "Session started"
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from csv_tail import CsvTail
+
+
+def write(path , text , mode = "a"):
+    with open(path , mode) as f:
+        f.write(text)
+
+
+def test_reads_only_complete_appended_rows(tmp_path):
+    path = tmp_path / "dashboard.csv"
+    write(path , "timestamp,attentive_seconds\n1,1\n2,2\n3," , "w")
+    tail = CsvTail(path)
+
+    assert list(tail.refresh()["attentive_seconds"]) == [1 , 2]
+    write(path , "3\n4,4\n")
+    assert list(tail.refresh()["attentive_seconds"]) == [1 , 2 , 3 , 4]
+    assert tail.rows_read == 4
+
+
+def test_keeps_the_last_max_rows(tmp_path):
+    path = tmp_path / "dashboard.csv"
+    write(path , "timestamp,attentive_seconds\n" + "".join(f"{i},{i}\n" for i in range(10)) , "w")
+    frame = CsvTail(path , max_rows = 3).refresh()
+    assert list(frame["attentive_seconds"]) == [7 , 8 , 9]
+
+
+def test_truncated_file_starts_over(tmp_path):
+    path = tmp_path / "dashboard.csv"
+    write(path , "timestamp,attentive_seconds\n1,1\n2,2\n" , "w")
+    tail = CsvTail(path)
+    tail.refresh()
+
+    write(path , "timestamp,attentive_seconds\n9,9\n" , "w")
+    assert list(tail.refresh()["attentive_seconds"]) == [9]
+
+
+def test_replaced_file_starts_over(tmp_path):
+    path = tmp_path / "dashboard.csv"
+    write(path , "timestamp,attentive_seconds\n1,1\n" , "w")
+    tail = CsvTail(path)
+    tail.refresh()
+
+    # rotated: a new file (new inode) bigger than the offset read so far
+    replacement = tmp_path / "new.csv"
+    write(replacement , "timestamp,attentive_seconds\n5,5\n6,6\n7,7\n" , "w")
+    os.replace(replacement , path)
+    assert list(tail.refresh()["attentive_seconds"]) == [5 , 6 , 7]
+
+
+def test_missing_file(tmp_path):
+    assert CsvTail(tmp_path / "nope.csv").refresh() is None
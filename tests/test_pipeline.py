@@ -0,0 +1,47 @@
+import threading
+
+import pipeline
+
+
+def test_drop_oldest_keeps_the_newest():
+    q = pipeline.BoundedQueue("render" , maxsize = 2 , drop_oldest = True)
+    for i in range(5):
+        assert q.put(i)
+    assert q.dropped == 3
+    assert [q.get(0) , q.get(0) , q.get(0)] == [3 , 4 , None]
+
+
+def test_blocking_put_waits_for_room():
+    q = pipeline.BoundedQueue("decisions" , maxsize = 1)
+    q.put(1)
+    done = threading.Event()
+    threading.Thread(target=lambda: (q.put(2) , done.set()) , daemon=True).start()
+    assert not done.wait(0.1)
+    assert q.get(0) == 1
+    assert done.wait(1.0)
+    assert q.get(0) == 2
+
+
+def test_closed_queue_drops_instead_of_blocking():
+    q = pipeline.BoundedQueue("decisions" , maxsize = 1)
+    q.put(1)
+    q.close()
+    assert q.put(2) is False
+    assert q.dropped == 1
+
+
+def test_producer_stops_when_its_consumer_dies():
+    decisions = pipeline.BoundedQueue("decisions" , maxsize = 2)
+    renders = pipeline.BoundedQueue("render" , maxsize = 1 , drop_oldest = True)
+    counter = iter(range(10 ** 9))
+
+    def broken(item):
+        raise RuntimeError("accounting died")
+
+    source = pipeline.Stage("inference" , lambda: next(counter) , outbox=decisions).start()
+    sink = pipeline.Stage("accounting" , broken , inbox=decisions , outbox=renders).start()
+    sink.join(2.0)
+    source.join(2.0)
+    assert not sink.is_alive() and not source.is_alive()
+    assert isinstance(sink.error , RuntimeError)
+    assert renders.get(0) is pipeline.STOP
@@ -0,0 +1,35 @@
+import logging
+
+import log_config
+
+
+def record(msg , *args):
+    return logging.LogRecord("test" , logging.INFO , __file__ , 0 , msg , args , None)
+
+
+def test_burst_then_suppressed_count(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(log_config.time , "monotonic" , lambda: now[0])
+    limiter = log_config.RateLimitFilter(per_second = 1.0 , burst = 2)
+
+    passed = [limiter.filter(record("Attentive Eyes at %s" , i)) for i in range(5)]
+    assert passed == [True , True , False , False , False]
+
+    now[0] += 1.0
+    r = record("Attentive Eyes at %s" , 5)
+    assert limiter.filter(r)
+    assert r.msg.endswith("[3 similar suppressed]")
+
+
+def test_templates_are_limited_separately():
+    limiter = log_config.RateLimitFilter(per_second = 0.0 , burst = 1)
+    assert limiter.filter(record("a %s" , 1))
+    assert not limiter.filter(record("a %s" , 2))
+    assert limiter.filter(record("b %s" , 1))
+
+
+def test_template_count_is_bounded():
+    limiter = log_config.RateLimitFilter(max_templates = 3)
+    for i in range(10):
+        limiter.filter(record(f"message {i}"))
+    assert list(limiter._buckets) == ["message 7" , "message 8" , "message 9"]
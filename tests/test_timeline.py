@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import timeline
+
+T0 = datetime(2026 , 1 , 1 , 9 , 0 , 0)
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def build(states):
+    # one decision per second, states[i] is the final state of second i
+    tl = timeline.Timeline()
+    for i , state in enumerate(states):
+        tl.add(at(i) , "PRESENT" , "ATTENTIVE" , "attentive Eyes" , state)
+    return tl
+
+
+def test_runs_collapse_into_segments():
+    tl = build(["ATTENTIVE"] * 5 + ["DISTRACTED"] * 3 + ["ATTENTIVE"] * 2)
+    assert [s.final_state for s in tl.segments] == ["ATTENTIVE" , "DISTRACTED" , "ATTENTIVE"]
+
+
+def test_totals_match_per_decision_counting():
+    # the time since the previous decision belongs to the new decision's state
+    tl = build(["ATTENTIVE"] * 5 + ["DISTRACTED"] * 3 + ["AWAY"] * 2)
+    assert tl.totals() == {"ATTENTIVE": 4.0 , "DISTRACTED": 3.0 , "AWAY": 2.0}
+    assert round(tl.focus_percent() , 2) == round(4 / 9 * 100 , 2)
+
+
+def test_totals_clipped_to_a_range():
+    tl = build(["ATTENTIVE"] * 10 + ["DISTRACTED"] * 10)
+    assert tl.totals(at(5) , at(15)) == {"ATTENTIVE": 4.0 , "DISTRACTED": 6.0 , "AWAY": 0.0}
+    assert tl.totals(at(100) , at(200)) == {"ATTENTIVE": 0.0 , "DISTRACTED": 0.0 , "AWAY": 0.0}
+
+
+def test_state_at():
+    tl = build(["ATTENTIVE"] * 10 + ["AWAY"] * 10)
+    assert tl.state_at(at(3.5))[3] == "ATTENTIVE"
+    assert tl.state_at(at(12))[3] == "AWAY"
+    assert tl.state_at(at(-1)) is None
+    assert tl.state_at(at(50)) is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "timeline.csv")
+    build(["ATTENTIVE"] * 3 + ["AWAY"] * 3).save("a" , path)
+    build(["DISTRACTED"] * 4).save("b" , path)
+
+    loaded = timeline.load("a" , path)
+    assert [s.final_state for s in loaded.segments] == ["ATTENTIVE" , "AWAY"]
+    assert loaded.totals() == {"ATTENTIVE": 2.0 , "DISTRACTED": 0.0 , "AWAY": 3.0}
+    assert loaded.state_at(at(4))[3] == "AWAY"
+    assert timeline.load("missing" , path).segments == []